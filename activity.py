@@ -0,0 +1,192 @@
+import functools
+import threading
+
+import numpy as np
+import pandas as pd
+
+import hotspots
+import metrics
+import storage
+
+# When species are active where: per species + grid square hour-of-day and month
+# histograms, precomputed from the sightings history (hotspots.aggregate_activity) and
+# kept current as new sightings are saved. Queries only touch one species' arrays.
+
+ALL_HOURS = tuple(range(24))
+ALL_MONTHS = tuple(range(1, 13))
+# The only sightings columns the index reads
+ACTIVITY_COLUMNS = ['date_observed', 'time_observed', 'latitude', 'longitude', 'common_name']
+
+
+# One sighting at a time, with the full build's parser, so an update counts exactly what
+# a rebuild would (memoised: the same times and dates come up again and again)
+@functools.lru_cache(maxsize=4096)
+def parse_hour(time):
+    hour = hotspots.parse_field([time], hotspots.TIME_FORMAT, 'hour')[0]
+    return int(hour) if hour >= 0 else None
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_month(date):
+    month = hotspots.parse_field([date], hotspots.DATE_FORMAT, 'month')[0]
+    return int(month) if month >= 1 else None
+
+
+def sum_bins(histograms, bins):
+    # Per-square total over the selected bins; a run of consecutive bins is one slice
+    if len(bins) == 1:
+        return histograms[bins[0]]
+    if bins == list(range(bins[0], bins[0] + len(bins))):
+        return histograms[bins[0]:bins[0] + len(bins)].sum(axis=0)
+    return histograms[bins].sum(axis=0)
+
+
+class SpeciesActivity:
+    # One species' grid squares as parallel arrays. Histograms are stored bin-major
+    # (hours[h] is every square's count at hour h) so a query reads contiguous rows, and
+    # verified squares (>= MIN_SIGHTINGS) come first so the default query is a prefix.
+    def __init__(self, coords, totals, hours, months):
+        order = np.argsort(totals < hotspots.MIN_SIGHTINGS, kind='stable')
+        self.coords, self.totals = coords[order], totals[order]
+        self.hours = np.ascontiguousarray(hours[:, order])
+        self.months = np.ascontiguousarray(months[:, order])
+        self.verified = int((totals >= hotspots.MIN_SIGHTINGS).sum())
+        self.row = {(lat, lon): i for i, (lat, lon) in enumerate(self.coords.tolist())}
+
+    def __len__(self):
+        return len(self.totals)
+
+    def add_cell(self, lat, lon):
+        self.row[(lat, lon)] = len(self)
+        self.coords = np.vstack([self.coords, [[lat, lon]]])
+        self.totals = np.append(self.totals, 0)
+        self.hours = np.hstack([self.hours, np.zeros((24, 1), dtype=self.hours.dtype)])
+        self.months = np.hstack([self.months, np.zeros((12, 1), dtype=self.months.dtype)])
+        return self.row[(lat, lon)]
+
+    def promote(self, i):
+        # Square i just became verified: swap it to the end of the verified prefix
+        j = self.verified
+        if i != j:
+            for a in (self.coords, self.totals):
+                a[[i, j]] = a[[j, i]]
+            for a in (self.hours, self.months):
+                a[:, [i, j]] = a[:, [j, i]]
+            self.row[tuple(self.coords[i].tolist())] = i
+            self.row[tuple(self.coords[j].tolist())] = j
+        self.verified += 1
+        return j
+
+
+class ActivityIndex:
+    """
+    Answers "where is <species> seen at <hours> in <months>" from precomputed
+    histograms: a few vectorized sums over that species' rows, no date parsing.
+    """
+
+    def __init__(self, sightings=None):
+        self.species = {}
+        self.lock = threading.Lock()
+        if sightings is not None:
+            self.load(sightings)
+
+    @metrics.timed('index_build', index='activity')
+    def load(self, sightings):
+        cells, hours, months = hotspots.aggregate_activity(sightings)
+        species = {}
+        # aggregate_activity groups with sort=True: cells are sorted by species, so each is a contiguous block
+        names = cells['common_name'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, names[1:] != names[:-1]]) if len(names) else []
+        ends = list(starts[1:]) + [len(names)]
+        coords = cells[['lat_grid', 'lon_grid']].to_numpy(dtype=np.float64)
+        totals = cells['sighting_count'].to_numpy(dtype=np.int64)
+        hours, months = hours.T.astype(np.int32), months.T.astype(np.int32)
+        for a, b in zip(starts, ends):
+            species[names[a]] = SpeciesActivity(coords[a:b], totals[a:b], hours[:, a:b], months[:, a:b])
+        with self.lock:
+            self.species = species
+
+    def update(self, common_name, lat, lon, date, time):
+        # Storage sighting listener: count one new sighting
+        _, lat, lon = hotspots.grid_key(common_name, lat, lon)
+        lat, lon = float(lat), float(lon)
+        hour, month = parse_hour(time), parse_month(date)
+        with self.lock:
+            activity = self.species.get(common_name)
+            if activity is None:
+                activity = self.species[common_name] = SpeciesActivity(
+                    np.zeros((0, 2)), np.zeros(0, dtype=np.int64),
+                    np.zeros((24, 0), dtype=np.int32), np.zeros((12, 0), dtype=np.int32))
+            i = activity.row.get((lat, lon))
+            if i is None:
+                i = activity.add_cell(lat, lon)
+            activity.totals[i] += 1
+            if activity.totals[i] == hotspots.MIN_SIGHTINGS:
+                i = activity.promote(i)
+            if hour is not None:
+                activity.hours[hour, i] += 1
+            if month is not None and 1 <= month <= 12:
+                activity.months[month - 1, i] += 1
+
+    # --- QUERIES ---
+    def query(self, species, hours=None, months=None, min_count=1, verified_only=True):
+        """
+        Grid squares where `species` has at least min_count sightings in the given hours
+        (0-23) and months (1-12); None means any. With both, a square must match both
+        (the histograms are separate, so not necessarily in the same sightings).
+        Returns (lats, lons, counts) arrays; counts are sightings in the time window.
+        """
+        with self.lock:
+            activity = self.species.get(species)
+            if activity is None:
+                return np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int64)
+            n = activity.verified if verified_only else len(activity)
+            counts = activity.totals[:n]
+            if hours is not None:
+                counts = sum_bins(activity.hours[:, :n], list(hours))
+            if months is not None:
+                in_months = sum_bins(activity.months[:, :n], [m - 1 for m in months])
+                counts = in_months if hours is None else np.minimum(counts, in_months)
+            keep = np.flatnonzero(counts >= min_count)
+            coords, counts = activity.coords[keep], counts[keep].astype(np.int64)
+        return coords[:, 0], coords[:, 1], counts
+
+    def active_hotspots(self, hours=None, months=None, species=None, min_count=1):
+        # Same columns as store.load_hotspots(), with sighting_count counted in the window
+        frames = []
+        for name in ([species] if species else sorted(self.species)):
+            lats, lons, counts = self.query(name, hours, months, min_count)
+            frames.append(pd.DataFrame({'common_name': name, 'lat': lats, 'lon': lons, 'sighting_count': counts}))
+        if not frames:
+            return pd.DataFrame(columns=storage.HOTSPOT_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def profile(self, species, lat_grid, lon_grid):
+        # (hour histogram, month histogram) of one grid square, e.g. for a popup chart
+        with self.lock:
+            activity = self.species.get(species)
+            i = activity.row.get((lat_grid, lon_grid)) if activity else None
+            if i is None:
+                return np.zeros(24, dtype=np.int64), np.zeros(12, dtype=np.int64)
+            return activity.hours[:, i].astype(np.int64), activity.months[:, i].astype(np.int64)
+
+
+# One index per process, built from the store's sightings and kept current from the
+# store's change log (sightings saved by this process and the others alike)
+_index = None
+_index_version = None
+_index_after_id = 0
+_index_lock = threading.Lock()
+
+def build_index():
+    sightings = storage.get_store().load_sightings(['id'] + ACTIVITY_COLUMNS)
+    return ActivityIndex(sightings), storage.last_id(sightings)
+
+def get_index():
+    global _index, _index_version, _index_after_id
+    with _index_lock:
+        if _index is not None:
+            _index_version = storage.follow(_index_version, _index_after_id, sighting_listener=_index.update)
+        if _index_version is None:
+            _index, _index_version, _index_after_id = storage.build_current(build_index, sighting_listener='update')
+        return _index
@@ -0,0 +1,174 @@
+import argparse
+import glob
+import os
+import re
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+import pandas as pd
+
+import audio_processor
+
+# --- CONFIG ---
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.mp3', '.ogg')
+DEFAULT_USERNAME = 'acoustic-monitor'
+
+# Detections are written with the sightings.csv columns (minus id, which the store assigns)
+# plus where in which recording each call was heard.
+OUTPUT_COLUMNS = ['date_observed', 'time_observed', 'latitude', 'longitude', 'common_name', 'username',
+                  'score', 'start_s', 'end_s', 'file']
+
+# AudioMoth-style names carry the start time, e.g. 20250114_053000.WAV
+FILENAME_TIME = re.compile(r'(\d{8})[_-](\d{6})')
+
+
+# --- 1. FILES ---
+def find_recordings(directory):
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths += [os.path.join(root, f) for f in files if f.lower().endswith(AUDIO_EXTENSIONS)]
+    return sorted(paths)
+
+
+def recording_start(path):
+    match = FILENAME_TIME.search(os.path.basename(path))
+    if match:
+        try:
+            return datetime.strptime(''.join(match.groups()), "%Y%m%d%H%M%S")
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(path))
+
+
+# --- 2. WORKERS ---
+# Each worker process loads the analyzer once, instead of per file (or per Streamlit process)
+_worker = {}
+
+def init_worker(analyzer_factory, lat, lon, min_conf, username):
+    _worker.update(analyzer=analyzer_factory(), lat=lat, lon=lon, min_conf=min_conf, username=username)
+
+
+def score_file(path):
+    try:
+        started = recording_start(path)
+        rows = []
+        for call in audio_processor.stream_bird_sound(
+                path, lat=_worker['lat'], lon=_worker['lon'], date=started,
+                min_conf=_worker['min_conf'], analyzer=_worker['analyzer']):
+            heard_at = started + timedelta(seconds=call['start'])
+            rows.append({
+                'date_observed': heard_at.strftime("%d/%m/%Y"), 'time_observed': heard_at.strftime("%H:%M:%S"),
+                'latitude': _worker['lat'], 'longitude': _worker['lon'], 'common_name': call['name'],
+                'username': _worker['username'], 'score': round(call['score'], 2),
+                'start_s': round(call['start'], 2), 'end_s': round(call['end'], 2), 'file': path,
+            })
+        return path, rows, None
+    except Exception as e:
+        return path, [], str(e)
+
+
+# --- 3. OUTPUT + PROGRESS MANIFEST ---
+def manifest_path(output):
+    return output.rstrip('/\\') + '.done'
+
+
+def read_manifest(output):
+    # {recording: size of the CSV output once its detections were in it (None for parquet)}
+    done = {}
+    try:
+        with open(manifest_path(output)) as f:
+            for line in f:
+                path, _, size = line.rstrip('\n').rpartition('\t')
+                if not path:
+                    path, size = size, ''   # written before sizes were recorded
+                if path:
+                    done[path] = int(size) if size.isdigit() else None
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def discard_unrecorded(output, done):
+    # Detections written by a run that died before it could add their recording to the
+    # manifest: that recording is scored again, so they would be written twice
+    if output.endswith('.parquet'):
+        for part in glob.glob(os.path.join(output, 'part-*.parquet')):
+            if int(os.path.basename(part)[5:-8]) >= len(done):
+                os.remove(part)
+        return
+    sizes = [size for size in done.values() if size is not None]
+    if not os.path.exists(output) or (done and not sizes):
+        return   # nothing written yet, or an old manifest without sizes: leave it as it is
+    size = max(sizes, default=0)
+    if size == 0:
+        os.remove(output)   # so the next write starts with the header again
+    elif os.path.getsize(output) > size:
+        with open(output, 'r+b') as f:
+            f.truncate(size)
+
+
+def write_detections(output, rows, part):
+    df = pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+    if output.endswith('.parquet'):
+        # A folder of parquet parts (one per recording) so finished work never needs rewriting
+        os.makedirs(output, exist_ok=True)
+        df.to_parquet(os.path.join(output, f"part-{part:06d}.parquet"), index=False)
+    else:
+        df.to_csv(output, mode='a', header=not os.path.exists(output), index=False)
+
+
+def record_done(manifest, output, path):
+    # For CSV output the manifest also records how far the file had got, see discard_unrecorded
+    size = '' if output.endswith('.parquet') else f"\t{os.path.getsize(output)}"
+    manifest.write(path + size + '\n')
+    manifest.flush()
+
+
+def score_folder(directory, output, workers=None, lat=1.3521, lon=103.8198, min_conf=0.5,
+                 username=DEFAULT_USERNAME, analyzer_factory=None):
+    """
+    Runs BirdNET over every recording in a folder on a process pool. A file is added to
+    the progress manifest (<output>.done) only after its detections are written, so an
+    interrupted run picks up where it stopped when started again; detections written after
+    the last file in the manifest are dropped first, so a resume never repeats them.
+    """
+    done = read_manifest(output)
+    discard_unrecorded(output, done)
+    todo = [p for p in find_recordings(directory) if p not in done]
+    print(f"🔍 {len(todo)} recordings to score ({len(done)} already done).")
+
+    summary = {'files': 0, 'detections': 0, 'errors': 0}
+    initargs = (analyzer_factory or audio_processor.Analyzer, lat, lon, min_conf, username)
+    with Pool(workers, initializer=init_worker, initargs=initargs) as pool, \
+            open(manifest_path(output), 'a') as manifest:
+        for path, rows, error in pool.imap_unordered(score_file, todo):
+            if error:
+                print(f"   Skipped {path}: {error}")
+                summary['errors'] += 1
+                continue
+            write_detections(output, rows, len(done) + summary['files'])
+            record_done(manifest, output, path)
+            summary['files'] += 1
+            summary['detections'] += len(rows)
+            if summary['files'] % 10 == 0:
+                print(f"   Scored {summary['files']} recordings...")
+    return summary
+
+
+# Score a folder of acoustic monitor recordings:
+#   python audio_batch.py path/to/recordings --output detections.csv --workers 4
+#   (use --output detections.parquet for parquet parts; re-run the same command to resume)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Identify bird calls in every recording in a folder.")
+    parser.add_argument("directory")
+    parser.add_argument("--output", default="detections.csv")
+    parser.add_argument("--workers", type=int, default=None, help="default: one per CPU core")
+    parser.add_argument("--lat", type=float, default=1.3521)
+    parser.add_argument("--lon", type=float, default=103.8198)
+    parser.add_argument("--min-conf", type=float, default=0.5)
+    parser.add_argument("--username", default=DEFAULT_USERNAME)
+    args = parser.parse_args()
+
+    result = score_folder(args.directory, args.output, args.workers, args.lat, args.lon, args.min_conf, args.username)
+    print(f"✅ {result['files']} recordings scored, {result['detections']} detections saved to {args.output}"
+          f" ({result['errors']} errors)")
@@ -1,9 +1,40 @@
+import io
+import subprocess
+from collections import deque
+
 import numpy as np
+import soundfile as sf
+import soxr
 import streamlit as st
-from birdnetlib import Recording
-from birdnetlib.analyzer import Analyzer
+# triton's native library (imported with torch by transformers' pipelines) segfaults if it
+# is loaded after birdnetlib's TensorFlow, so it is loaded first: a fraction of a second,
+# and it doesn't import torch. Not installed (CPU-only torch builds) means no clash.
+try:
+    import triton._C.libtriton  # noqa: F401
+except ImportError:
+    pass
+from birdnetlib import RecordingBuffer
+from birdnetlib.analyzer import MODEL_VERSION, Analyzer
 from datetime import datetime
 
+import metrics
+import species_prior
+from inference_cache import get_cache, read_bytes
+
+SAMPLE_RATE = 48000   # BirdNET works on 48kHz mono
+WINDOW_SECS = 3.0     # BirdNET's chunk length
+OVERLAP_SECS = 1.0    # so calls that straddle a window edge are still heard whole once
+PIECE_SECS = 30.0     # audio analyzed between turns when the inference service interleaves recordings
+AUDIO_MODEL_ID = f"BirdNET-Analyzer:{MODEL_VERSION}:unfiltered"   # inference cache key
+
+# Silence skipping: a cheap energy pass decides which stretches reach the model
+FRAME_SECS = 0.05         # energy is measured per 50ms frame
+ACTIVITY_DB = 6.0         # a frame this much louder than the background is activity...
+LOUD_DB = -30.0           # ...and so is any frame this loud (dBFS), whatever the background
+SILENCE_DB = -70.0        # never activity below this (digital silence, muted mic)
+PAD_SECS = 0.5            # kept either side of activity, for quiet call onsets and tails
+BACKGROUND_WINDOWS = 20   # streaming: background = quietest of the last 20 windows (~40s)
+
 # 1. CACHED MODEL LOADING
 # We use st.cache_resource so we don't download the 500MB AI model every time you click record
 @st.cache_resource(show_spinner=False)
@@ -12,39 +43,233 @@ def load_audio_model():
     analyzer = Analyzer()
     return analyzer
 
-# 2. IDENTIFY SPECIES (BirdNET)
-def identify_bird_sound(audio_file):
+# 2. PREPROCESSING (decode, resample, silence skipping)
+def decode_audio(source):
+    # Uploaded bytes / file-like / path -> 48kHz mono float32, resampled once, in memory.
+    # soundfile reads WAV/FLAC/OGG (what st.audio_input records); anything else (MP3,
+    # M4A from phones) is decoded by ffmpeg over pipes.
+    data = read_bytes(source)
+    try:
+        samples, rate = sf.read(io.BytesIO(data), dtype='float32', always_2d=True)
+    except sf.LibsndfileError:
+        return decode_with_ffmpeg(data)
+    samples = samples.mean(axis=1)
+    if rate != SAMPLE_RATE:
+        samples = soxr.resample(samples, rate, SAMPLE_RATE)
+    return np.ascontiguousarray(samples, dtype=np.float32)
+
+def decode_with_ffmpeg(data):
+    try:
+        result = subprocess.run(
+            ['ffmpeg', '-nostdin', '-loglevel', 'error', '-i', 'pipe:0',
+             '-f', 'f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1'],
+            input=data, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise ValueError("This audio format needs ffmpeg, which is not installed.")
+    except subprocess.CalledProcessError as e:
+        raise ValueError(f"Could not decode the recording: {e.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def frame_levels(samples):
+    # Level (dBFS) of each FRAME_SECS frame, in one vectorized pass
+    frame = int(FRAME_SECS * SAMPLE_RATE)
+    n = len(samples) // frame
+    power = np.square(samples[:n * frame].reshape(n, frame), dtype=np.float64).mean(axis=1)
+    return 10 * np.log10(power + 1e-12)
+
+def background_level(levels):
+    # Most of a recording is background: its quieter frames tell how loud that is
+    return float(np.percentile(levels, 20)) if len(levels) else SILENCE_DB
+
+def active_frames(levels, background):
+    return (levels > SILENCE_DB) & ((levels > background + ACTIVITY_DB) | (levels > LOUD_DB))
+
+def active_segments(samples):
+    """
+    (start, end) sample ranges worth analyzing: runs of active frames, padded by
+    PAD_SECS, at least one BirdNET window long, overlapping ranges merged.
+    """
+    levels = frame_levels(samples)
+    active = np.flatnonzero(active_frames(levels, background_level(levels)))
+    if not len(active):
+        return []
+    frame, pad, window = int(FRAME_SECS * SAMPLE_RATE), int(PAD_SECS * SAMPLE_RATE), int(WINDOW_SECS * SAMPLE_RATE)
+    breaks = np.flatnonzero(np.diff(active) > 1)
+    starts = active[np.r_[0, breaks + 1]] * frame - pad
+    ends = (active[np.r_[breaks, len(active) - 1]] + 1) * frame + pad
+    # A short call gets a whole window around it (BirdNET drops chunks under 1.5s)
+    short = ends - starts < window
+    starts = np.clip(np.where(short, (starts + ends - window) // 2, starts), 0, None)
+    ends = np.clip(np.maximum(ends, starts + window), None, len(samples))
+
+    segments = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if segments and start <= segments[-1][1]:
+            segments[-1] = (segments[-1][0], max(segments[-1][1], end))
+        else:
+            segments.append((start, end))
+    return segments
+
+def audio_pieces(segments, piece_secs=PIECE_SECS):
+    # Segments split into pieces of at most piece_secs, cut on BirdNET window boundaries
+    # so the pieces are chunked exactly as the whole segments would be
+    piece = int(max(1, piece_secs // WINDOW_SECS) * WINDOW_SECS * SAMPLE_RATE)
+    for start, end in segments:
+        for piece_start in range(start, end, piece):
+            yield piece_start, min(piece_start + piece, end)
+
+# 3. IDENTIFY SPECIES (BirdNET)
+def get_priors():
+    # Location/season priors from BirdNET's own location model, per grid cell and week
+    return species_prior.get_priors(lambda: load_audio_model().species_class, MODEL_VERSION)
+
+@metrics.timed('identify', kind='audio')
+def identify_bird_sound(audio_file, lat=1.3521, lon=103.8198, date=None, min_conf=0.5):
+    # Streamlit reruns the page on every click: the same clip comes from the cache, model
+    # untouched. What the model hears doesn't depend on where or when, so the cached
+    # detections are shared by every location; the priors then filter and re-rank them.
+    matches = get_cache().get_or_compute(
+        audio_file, AUDIO_MODEL_ID,
+        lambda: analyze_bird_sound(audio_file, min_conf=min_conf),
+        min_conf=min_conf,
+    )
+    return apply_priors(matches, lat, lon, date)
+
+def apply_priors(matches, lat, lon, date=None):
+    try:
+        return get_priors().rerank(matches, lat, lon, date or datetime.now())
+    except Exception as e:
+        print(f"⚠️ Species priors unavailable, matches not filtered by location: {e}")
+        metrics.error('species_prior', e)
+        return matches
+
+@metrics.timed('inference', kind='audio')
+def analyze_bird_sound(audio_file, min_conf=0.5, skip_silence=True):
+    steps = analyze_steps(audio_file, min_conf, skip_silence)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
+
+def analyze_steps(audio_file, min_conf=0.5, skip_silence=True):
+    """
+    analyze_bird_sound as a generator that yields after every piece of PIECE_SECS of
+    audio and returns the matches, so one thread can take turns between recordings
+    (see inference_service.Interleaver).
+    """
     # Retrieve the cached analyzer
     analyzer = load_audio_model()
     
-    # This is BirdNET's "Superpower": It filters out non-native birds automatically.
-    recording = Recording(
-        analyzer,
-        audio_file,
-        lat=1.3521,       # Singapore Latitude
-        lon=103.8198,     # Singapore Longitude
-        date=datetime.now(), # Helps filter migratory birds based on season
-        min_conf=0.5,     # Sensitivity (0.5 is a good balance)
-    )
-    
-    # Run the analysis
-    recording.analyze()
+    # Decoded and resampled in memory (no temp file, no second resample in BirdNET);
+    # only the stretches with sound in them are analyzed
+    samples = decode_audio(audio_file)
+    segments = active_segments(samples) if skip_silence else [(0, len(samples))]
     
     # Format results for the App
     # Convert BirdNET's format to our standard list: [{'name': 'Koel', 'score': 95.0}, ...]
-    valid_matches = []
+    # keeping each species' best detection
+    best = {}
     
-    if recording.detections:
+    for start, end in audio_pieces(segments):
+        # No lat/lon: BirdNET would work out its location filter again for every new GPS
+        # fix. Every detection is returned and species_prior does the filtering instead.
+        recording = RecordingBuffer(
+            analyzer,
+            samples[start:end],
+            SAMPLE_RATE,
+            min_conf=min_conf, # Sensitivity (0.5 is a good balance)
+            return_all_detections=True,
+        )
+        recording.analyze()
+        
         for d in recording.detections:
             # BirdNET returns confidence as 0.0-1.0
             score_pct = d['confidence'] * 100
-            
-            valid_matches.append({
-                'name': d['common_name'],
-                'score': score_pct
-            })
+            if score_pct > best.get(d['common_name'], 0):
+                best[d['common_name']] = score_pct
+        yield
             
     # Sort by highest confidence first
+    valid_matches = [{'name': name, 'score': score} for name, score in best.items()]
     valid_matches.sort(key=lambda x: x['score'], reverse=True)
             
-    return valid_matches
\ No newline at end of file
+    return valid_matches
+
+# 4. STREAMING ANALYSIS (long field recordings)
+def read_windows(audio_source, window_secs=WINDOW_SECS, overlap_secs=OVERLAP_SECS):
+    # Yields (start_sec, samples) windows of 48kHz mono audio from a file path or a
+    # file-like byte stream. Only about one window is held in memory at a time.
+    window = int(window_secs * SAMPLE_RATE)
+    hop = int((window_secs - overlap_secs) * SAMPLE_RATE)
+
+    with sf.SoundFile(audio_source) as f:
+        resampler = soxr.ResampleStream(f.samplerate, SAMPLE_RATE, 1) if f.samplerate != SAMPLE_RATE else None
+        block_frames = int(f.samplerate * (window_secs - overlap_secs))
+
+        buffer = np.zeros(0, dtype=np.float32)
+        start = 0
+        for block in f.blocks(blocksize=block_frames, dtype='float32', always_2d=True):
+            mono = block.mean(axis=1)
+            if resampler:
+                mono = resampler.resample_chunk(mono)
+            buffer = np.concatenate([buffer, mono])
+            while len(buffer) >= window:
+                yield start / SAMPLE_RATE, buffer[:window]
+                buffer = buffer[hop:]
+                start += hop
+
+        if resampler:
+            buffer = np.concatenate([buffer, resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)])
+        # Whatever is left past the overlap is new audio (BirdNET pads it, or skips it if < 1.5s)
+        if len(buffer) > window - hop:
+            yield start / SAMPLE_RATE, buffer
+
+def analyze_window(analyzer, samples, lat, lon, date, min_conf):
+    # The analyzer caches its location/season species list, so this is only worked out once
+    recording = RecordingBuffer(analyzer, samples, SAMPLE_RATE, lat=lat, lon=lon, date=date, min_conf=min_conf)
+    recording.analyze()
+    return recording.detections
+
+def stream_bird_sound(audio_source, lat=1.3521, lon=103.8198, date=None, min_conf=0.5,
+                      window_secs=WINDOW_SECS, overlap_secs=OVERLAP_SECS, analyzer=None, skip_silence=True):
+    """
+    Streaming version of identify_bird_sound for long recordings.
+
+    Analyzes the audio window by window and yields detections as soon as they are
+    final: {'name', 'score', 'start', 'end'} with times in seconds. Back-to-back (or
+    overlapping) detections of the same species are merged into one, keeping the
+    best score. Windows with nothing above the background are skipped.
+    """
+    analyzer = analyzer or load_audio_model()
+    date = date or datetime.now()
+    open_calls = {}
+    backgrounds = deque(maxlen=BACKGROUND_WINDOWS)
+
+    for start, samples in read_windows(audio_source, window_secs, overlap_secs):
+        active = True
+        if skip_silence:
+            levels = frame_levels(samples)
+            # A window filled by one long call has no background of its own: the recent past's is used
+            backgrounds.append(background_level(levels))
+            active = bool(active_frames(levels, min(backgrounds)).any())
+        for d in (analyze_window(analyzer, samples, lat, lon, date, min_conf) if active else []):
+            name = d['common_name']
+            d_start, d_end = start + d['start_time'], start + d['end_time']
+            score_pct = d['confidence'] * 100
+
+            current = open_calls.get(name)
+            if current and d_start <= current['end']:
+                current['end'] = max(current['end'], d_end)
+                current['score'] = max(current['score'], score_pct)
+            else:
+                if current:
+                    yield current
+                open_calls[name] = {'name': name, 'score': score_pct, 'start': d_start, 'end': d_end}
+
+        # Later windows start at or after this one, so calls ending before it are complete
+        for name in [n for n, call in open_calls.items() if call['end'] < start]:
+            yield open_calls.pop(name)
+
+    for call in sorted(open_calls.values(), key=lambda c: c['start']):
+        yield call
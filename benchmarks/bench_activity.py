@@ -0,0 +1,102 @@
+# Benchmark: time-of-day / month hotspot queries (activity.py) on a synthetic history of
+# millions of sightings. Compares building the histograms with vectorized parsing against
+# a per-row strptime loop, and "where is Red Junglefowl active at 8 AM" against filtering
+# the raw sightings table on every request.
+#
+#   python benchmarks/bench_activity.py
+#   python benchmarks/bench_activity.py --rows 5000000 --queries 2000
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import activity
+import hotspots
+from bench_save_sighting import make_sightings
+
+
+def with_times(df, seed=0):
+    # Birds are busiest in the morning; dates spread over a few years
+    rng = np.random.default_rng(seed)
+    n = len(df)
+    hour = np.clip(rng.normal(9, 3, n), 0, 23).astype(int)
+    day = pd.to_datetime('2018-01-01') + pd.to_timedelta(rng.integers(0, 6 * 365, n), unit='D')
+    df['date_observed'] = day.strftime('%d/%m/%Y')
+    df['time_observed'] = [f"{h:02d}:{m:02d}:00" for h, m in zip(hour, rng.integers(0, 60, n))]
+    return df
+
+
+def strptime_histograms(df):
+    # Per-row parsing, for comparison
+    hours, months = {}, {}
+    for name, lat, lon, d, t in zip(df['common_name'], df['latitude'], df['longitude'],
+                                    df['date_observed'], df['time_observed']):
+        key = hotspots.grid_key(name, lat, lon)
+        hours.setdefault(key, [0] * 24)[datetime.strptime(t, "%H:%M:%S").hour] += 1
+        months.setdefault(key, [0] * 12)[datetime.strptime(d, "%d/%m/%Y").month - 1] += 1
+    return hours, months
+
+
+def raw_query(df, species, hour):
+    # What a query has to do without precomputation
+    rows = df[(df['common_name'] == species) & (df['time_observed'].str.slice(0, 2) == f"{hour:02d}")]
+    cells = hotspots.aggregate_sightings(rows)
+    return cells[cells['sighting_count'] >= 1]
+
+
+def latency(fn, n):
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.percentile(times, 50) * 1000, np.percentile(times, 99) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--sites", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--strptime-rows", type=int, default=200_000, help="per-row baseline is timed on this many")
+    args = parser.parse_args()
+
+    df = with_times(make_sightings(args.rows, n_sites=args.sites))
+    print(f"{args.rows:,} sightings, {args.sites:,} sites\n")
+
+    start = time.perf_counter()
+    index = activity.ActivityIndex(df)
+    build_s = time.perf_counter() - start
+    sample = df.head(args.strptime_rows)
+    start = time.perf_counter()
+    strptime_histograms(sample)
+    strptime_s = (time.perf_counter() - start) * args.rows / len(sample)
+    cells = sum(len(a) for a in index.species.values())
+    print(f"build histograms: vectorized {build_s:.2f}s, per-row strptime ~{strptime_s:.1f}s (extrapolated), "
+          f"{cells:,} grid squares\n")
+
+    species = "Red Junglefowl"
+    print(f"{'query':>36} {'p50':>9} {'p99':>9} {'squares':>8}")
+    for label, fn in [
+        ("8 AM, precomputed", lambda: index.query(species, hours=[8])),
+        ("7-9 AM in Mar-May, precomputed", lambda: index.query(species, hours=[7, 8, 9], months=[3, 4, 5])),
+        ("8 AM, all species (map frame)", lambda: index.active_hotspots(hours=[8])),
+    ]:
+        p50, p99 = latency(fn, args.queries)
+        result = fn()
+        n = len(result[0]) if isinstance(result, tuple) else len(result)
+        print(f"{label:>36} {p50:8.3f}ms {p99:8.3f}ms {n:>8,}")
+    p50, p99 = latency(lambda: raw_query(df, species, 8), 5)
+    print(f"{'8 AM, filtering raw sightings':>36} {p50:8.1f}ms {p99:8.1f}ms {len(raw_query(df, species, 8)):>8,}")
+
+    lats, lons, counts = index.query(species, hours=[8], verified_only=False)
+    expected = raw_query(df, species, 8)
+    assert len(lats) == len(expected) and counts.sum() == expected['sighting_count'].sum()
+
+    p50, p99 = latency(lambda: index.update(species, 1.3, 103.8, "01/03/2025", "08:10:00"), args.queries)
+    print(f"\nlive update per saved sighting: p50 {p50 * 1000:.1f}µs, p99 {p99 * 1000:.1f}µs")
@@ -0,0 +1,80 @@
+# Benchmark: audio_batch.score_folder scaling across 1..N worker processes on a folder of
+# synthetic recordings. BirdNET is replaced by the stub analyzer from bench_audio_stream,
+# padded with a fixed amount of CPU work per 3 s window to stand in for model inference,
+# so this runs offline. Also checks that an interrupted run resumes without rescoring.
+#
+#   python benchmarks/bench_audio_batch.py
+#   python benchmarks/bench_audio_batch.py --files 32 --minutes 5 --workers 1 2 4 8
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import audio_batch
+from bench_audio_stream import StubAnalyzer, make_recording
+
+MODEL_WORK = np.random.default_rng(0).normal(size=(256, 256)).astype(np.float32)
+
+
+class BusyStubAnalyzer(StubAnalyzer):
+    # Roughly BirdNET-on-CPU cost per window, so worker scaling is visible
+    def analyze_recording(self, recording):
+        for _ in recording.chunks:
+            for _ in range(20):
+                MODEL_WORK @ MODEL_WORK
+        super().analyze_recording(recording)
+
+
+def run(folder, output, workers):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = audio_batch.score_folder(folder, output, workers, analyzer_factory=BusyStubAnalyzer)
+    return time.perf_counter() - start, summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--minutes", type=float, default=2)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = os.path.join(tmp, 'recordings')
+        os.makedirs(folder)
+        for i in range(args.files):
+            make_recording(os.path.join(folder, f"20250114_{5 + i // 60:02d}{i % 60:02d}00.wav"), args.minutes / 60, seed=i)
+        audio_hours = args.files * args.minutes / 60
+        print(f"{args.files} recordings, {audio_hours:.1f}h of audio, {os.cpu_count()} CPU cores\n")
+
+        print(f"{'workers':>8} {'time':>8} {'files/s':>8} {'x realtime':>11} {'speed-up':>9} {'detections':>11}")
+        baseline = None
+        for workers in args.workers:
+            output = os.path.join(tmp, f"detections_{workers}.csv")
+            elapsed, summary = run(folder, output, workers)
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:7.1f}s {summary['files'] / elapsed:8.2f} {audio_hours * 3600 / elapsed:10.0f}x "
+                  f"{baseline / elapsed:8.1f}x {summary['detections']:>11}")
+
+        # Resume: pretend the first run stopped halfway by truncating its manifest
+        output = os.path.join(tmp, "detections_resume.parquet")
+        run(folder, output, args.workers[-1])
+        manifest = audio_batch.manifest_path(output)
+        with open(manifest) as f:
+            done = f.readlines()
+        with open(manifest, 'w') as f:
+            f.writelines(done[:len(done) // 2])
+        for part in sorted(os.listdir(output))[len(done) // 2:]:
+            os.remove(os.path.join(output, part))
+        elapsed, summary = run(folder, output, args.workers[-1])
+        total = len(pd.read_parquet(output))
+        expected = len(pd.read_csv(os.path.join(tmp, f"detections_{args.workers[0]}.csv")))
+        print(f"\nresume: rescored {summary['files']} of {args.files} files in {elapsed:.1f}s, "
+              f"{total} detections total ({'matches' if total == expected else 'DIFFERS FROM'} a clean run)")
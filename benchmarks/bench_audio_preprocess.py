@@ -0,0 +1,112 @@
+# Benchmark: audio preprocessing for identify_bird_sound (audio_processor.decode_audio and
+# active_segments) on recordings with a growing share of silence, against birdnetlib's
+# own file path (librosa load + resample of a temp file, every chunk analyzed).
+#
+# The stub analyzer from bench_audio_stream stands in for BirdNET, plus --chunk-ms of
+# simulated model time per 3s chunk, so the saving from skipped chunks shows up as it
+# would with the real model. Checks that skipping silence loses no species.
+#
+#   python benchmarks/bench_audio_preprocess.py
+#   python benchmarks/bench_audio_preprocess.py --seconds 300 --silence 0 0.5 0.9 --chunk-ms 100
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import audio_processor
+from bench_audio_stream import SPECIES_TONES, StubAnalyzer
+from birdnetlib import Recording
+
+SLOT_SECS = 6   # calls fill whole 6s slots, so the silence ratio comes out exact
+
+
+class TimedStubAnalyzer(StubAnalyzer):
+    # The stub, costing chunk_ms per 3s chunk like a real model, and counting chunks
+    def __init__(self, chunk_ms):
+        self.chunk_ms, self.chunks = chunk_ms, 0
+
+    def analyze_recording(self, recording):
+        self.chunks += len(recording.chunks)
+        time.sleep(self.chunk_ms * len(recording.chunks) / 1000)
+        super().analyze_recording(recording)
+
+
+def make_clip(path, seconds, silence, rate, seed=0):
+    # Quiet background noise; a `silence` share of the 6s slots stays empty, the rest
+    # carry one tone call each
+    rng = np.random.default_rng(seed)
+    samples = rng.normal(0, 0.005, int(seconds * rate)).astype(np.float32)
+    slots = seconds // SLOT_SECS
+    t = np.arange(SLOT_SECS * rate) / rate
+    for slot in rng.choice(slots, int(round(slots * (1 - silence))), replace=False):
+        tone = rng.choice(list(SPECIES_TONES))
+        start = slot * SLOT_SECS * rate
+        samples[start:start + len(t)] += 0.3 * np.sin(2 * np.pi * tone * t)
+    sf.write(path, samples, rate, subtype='PCM_16')
+
+
+def birdnet_file(analyzer, path):
+    # What identify_bird_sound did before: the upload written to disk, BirdNET re-reads it
+    recording = Recording(analyzer, path, min_conf=0.5, return_all_detections=True)
+    recording.analyze()
+    return {d['common_name'] for d in recording.detections}
+
+
+def in_memory(data, skip_silence):
+    return {m['name'] for m in audio_processor.analyze_bird_sound(data, skip_silence=skip_silence)}
+
+
+def best_of(fn, analyzer, repeats):
+    times = []
+    for _ in range(repeats):
+        analyzer.chunks = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            species = fn()
+            times.append(time.perf_counter() - start)
+    return min(times), analyzer.chunks, species
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=int, default=120, help="recording length")
+    parser.add_argument("--silence", type=float, nargs="+", default=[0, 0.25, 0.5, 0.75, 0.9])
+    parser.add_argument("--rate", type=int, default=44100, help="recording sample rate")
+    parser.add_argument("--chunk-ms", type=float, default=30, help="simulated model time per 3s chunk")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    analyzer = TimedStubAnalyzer(args.chunk_ms)
+    audio_processor.load_audio_model = lambda: analyzer
+    with tempfile.TemporaryDirectory() as tmp:
+        # librosa's resampler compiles on first use: not part of any one request
+        warmup = os.path.join(tmp, 'warmup.wav')
+        make_clip(warmup, SLOT_SECS, 0, args.rate)
+        with contextlib.redirect_stdout(io.StringIO()):
+            birdnet_file(analyzer, warmup)
+
+        print(f"{args.seconds}s recordings at {args.rate}Hz, {args.chunk_ms:.0f}ms of model time per chunk")
+        print(f"{'silence':>7} {'mode':>22} {'time':>9} {'chunks':>7} {'species':>8} {'speedup':>8}")
+        for silence in args.silence:
+            path = os.path.join(tmp, f"clip_{silence}.wav")
+            make_clip(path, args.seconds, silence, args.rate)
+            with open(path, 'rb') as f:
+                data = f.read()
+            results = {}
+            for mode, fn in [('temp file + librosa', lambda: birdnet_file(analyzer, path)),
+                             ('in memory', lambda: in_memory(data, False)),
+                             ('in memory + skip', lambda: in_memory(data, True))]:
+                results[mode] = best_of(fn, analyzer, args.repeats)
+                elapsed, chunks, species = results[mode]
+                print(f"{silence:>7.0%} {mode:>22} {elapsed * 1000:7.0f}ms {chunks:>7} {len(species):>8} "
+                      f"{results['temp file + librosa'][0] / elapsed:7.1f}x")
+            # (The stub names a chunk by its first 170ms, so a chunk starting just before a
+            # call can add a species; none may go missing)
+            assert results['in memory'][2] <= results['in memory + skip'][2], "skipping silence lost a species"
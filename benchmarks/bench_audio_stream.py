@@ -0,0 +1,118 @@
+# Benchmark: streaming BirdNET analysis (audio_processor.stream_bird_sound) on synthetic
+# multi-hour WAV recordings, against birdnetlib's one-shot Recording(...).analyze().
+# The BirdNET model is replaced by a stub analyzer that "hears" the synthetic tone
+# calls, so this runs offline and measures only the audio plumbing.
+#
+#   python benchmarks/bench_audio_stream.py
+#   python benchmarks/bench_audio_stream.py --hours 0.5 2 4 --one-shot-max 1
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import audio_processor
+from birdnetlib import Recording
+from birdnetlib.analyzer import Detection
+from birdnetlib.species import SpeciesList
+
+# Each fake species calls at its own pitch
+SPECIES_TONES = {1000: "Asian Koel", 2000: "Common Myna", 3000: "Red Junglefowl"}
+
+
+class StubAnalyzer:
+    # Just enough of birdnetlib's Analyzer for Recording/RecordingBuffer: one detection per
+    # loud chunk, named after the dominant tone. The location model (species_class) is
+    # BirdNET's real one: it is small and ships with birdnetlib.
+    custom_species_list = []
+    _species_list = None
+
+    @property
+    def species_class(self):
+        if StubAnalyzer._species_list is None:
+            with contextlib.redirect_stdout(io.StringIO()):
+                StubAnalyzer._species_list = SpeciesList()
+        return StubAnalyzer._species_list
+
+    def analyze_recording(self, recording):
+        detections = []
+        start = 0.0
+        for chunk in recording.chunks:
+            chunk = np.asarray(chunk, dtype=np.float32)
+            rms = float(np.sqrt(np.mean(chunk ** 2)))
+            if rms > 0.05:
+                spectrum = np.abs(np.fft.rfft(chunk[:8192]))
+                peak_hz = np.argmax(spectrum) * audio_processor.SAMPLE_RATE / 8192
+                tone = min(SPECIES_TONES, key=lambda hz: abs(hz - peak_hz))
+                d = Detection(start, start + recording.sample_secs)
+                d.common_name = SPECIES_TONES[tone]
+                d.scientific_name = "Stub stub"
+                d.confidence = min(0.99, 0.5 + rms)
+                d.label = f"{d.scientific_name}_{d.common_name}"
+                detections.append(d)
+            start += recording.sample_secs - recording.overlap
+        recording.detection_list = detections
+
+
+def make_recording(path, hours, rate=22050, seed=0):
+    # Quiet background noise with a 2-8 second tone call roughly once a minute, written in
+    # one-minute blocks so multi-hour files never sit in memory
+    rng = np.random.default_rng(seed)
+    minute = rate * 60
+    t = np.arange(minute) / rate
+    with sf.SoundFile(path, 'w', samplerate=rate, channels=1, subtype='PCM_16') as f:
+        for _ in range(int(hours * 60)):
+            block = rng.normal(0, 0.01, minute).astype(np.float32)
+            start = rng.integers(0, minute - 8 * rate)
+            length = rng.integers(2 * rate, 8 * rate)
+            tone = rng.choice(list(SPECIES_TONES))
+            block[start:start + length] += 0.3 * np.sin(2 * np.pi * tone * t[:length])
+            f.write(block)
+
+
+def run(fn):
+    # birdnetlib prints a line per analysis; keep the table readable
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        detections = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, detections
+
+
+def one_shot(path, analyzer):
+    recording = Recording(analyzer, path, lat=1.3521, lon=103.8198, min_conf=0.5)
+    recording.analyze()
+    return recording.detections
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=float, nargs="+", default=[0.5, 1, 3])
+    parser.add_argument("--one-shot-max", type=float, default=0.5, help="skip the one-shot path above this many hours")
+    args = parser.parse_args()
+
+    analyzer = StubAnalyzer()
+    print(f"{'hours':>6} {'mode':>9} {'time':>9} {'x realtime':>11} {'peak mem':>10} {'detections':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for hours in args.hours:
+            path = os.path.join(tmp, f"field_{hours}h.wav")
+            make_recording(path, hours)
+
+            modes = [('streaming', lambda: list(audio_processor.stream_bird_sound(path, analyzer=analyzer)))]
+            if hours <= args.one_shot_max:
+                modes.append(('one-shot', lambda: one_shot(path, analyzer)))
+            for mode, fn in modes:
+                elapsed, peak_mb, detections = run(fn)
+                print(f"{hours:>6} {mode:>9} {elapsed:8.1f}s {hours * 3600 / elapsed:10.0f}x "
+                      f"{peak_mb:8.1f}MB {len(detections):>11}")
+            os.remove(path)
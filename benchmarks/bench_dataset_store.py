@@ -0,0 +1,103 @@
+# Benchmark: per-epoch load time for the classifier dataset, straight from the scraped JPEG
+# folders (decode + resize every photo, every epoch) vs the packed, memory-mapped store
+# built by dataset_store.py. Also reports how many planted duplicates the build dropped.
+#
+#   python benchmarks/bench_dataset_store.py
+#   python benchmarks/bench_dataset_store.py --images 1000 --epochs 3 --workers 1 4
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dataset_store
+from bench_image_batch import SPECIES
+from image_io import decode_images, find_images
+
+
+def make_dataset(directory, n_images, n_duplicates, size=(1024, 768), seed=0):
+    # Smooth random scenes (distinct perceptual hashes, unlike plain noise) in the
+    # image_scrape.py layout, plus re-encoded/resized copies of some of them: a few under
+    # the same species, one under another species
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(n_images):
+        species = SPECIES[i % len(SPECIES)]
+        os.makedirs(os.path.join(directory, species), exist_ok=True)
+        scene = Image.fromarray(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)).resize(size, Image.BICUBIC)
+        pixels = np.asarray(scene, dtype=np.float32) + rng.normal(0, 12, (size[1], size[0], 3))
+        path = os.path.join(directory, species, f"{species}_{i}.jpg")
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(path, quality=90)
+        paths.append((path, species))
+
+    for j, (path, species) in enumerate(paths[:n_duplicates]):
+        if j == n_duplicates - 1:
+            species = SPECIES[(SPECIES.index(species) + 1) % len(SPECIES)]  # mislabelled copy
+        img = Image.open(path)
+        img.resize((img.width * 3 // 4, img.height * 3 // 4)).save(
+            os.path.join(directory, species, f"{species}_dup{j}.jpg"), quality=75)
+
+
+def raw_epoch(directory, size, workers):
+    # What a loader over the JPEG folders has to do each epoch
+    labels = {s: i for i, s in enumerate(sorted(os.listdir(directory)))}
+    paths = list(find_images(directory))
+    total = 0.0
+    for img, path in zip(decode_images(paths, (size, size), workers), paths):
+        total += np.asarray(img, dtype=np.float32).mean() + labels[os.path.basename(os.path.dirname(path))]
+    return len(paths)
+
+
+def packed_epoch(store_dir, batch_size=64):
+    dataset = dataset_store.PackedDataset(store_dir)
+    total = 0.0
+    for images, labels in dataset.batches(batch_size):
+        total += images.astype(np.float32).mean() + labels.sum()
+    return len(dataset)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    n = fn()
+    return time.perf_counter() - start, n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=300)
+    parser.add_argument("--duplicates", type=int, default=20)
+    parser.add_argument("--size", type=int, default=dataset_store.IMAGE_SIZE)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir, store_dir = os.path.join(tmp, 'raw'), os.path.join(tmp, 'store')
+        make_dataset(raw_dir, args.images, args.duplicates)
+
+        build_s, summary = timed(lambda: dataset_store.build_store(raw_dir, store_dir, args.size, num_workers=max(args.workers)))
+        print(f"\nbuild: {build_s:.1f}s, packed {summary['packed']} of {args.images + args.duplicates} photos "
+              f"({summary['duplicates']} duplicates, {summary['conflicts']} mislabelled copies dropped)")
+        store_mb = sum(os.path.getsize(os.path.join(store_dir, f)) for f in os.listdir(store_dir)) / 2**20
+        print(f"store: {store_mb:.0f}MB on disk\n")
+
+        print(f"{'source':>16} {'epoch':>6} {'time':>8} {'images/s':>9}")
+        for workers in args.workers:
+            for epoch in range(args.epochs):
+                elapsed, n = timed(lambda: raw_epoch(raw_dir, args.size, workers))
+                print(f"{f'jpeg ({workers} thr)':>16} {epoch + 1:>6} {elapsed:7.2f}s {n / elapsed:9.0f}")
+        for epoch in range(args.epochs):
+            elapsed, n = timed(lambda: packed_epoch(store_dir))
+            print(f"{'packed memmap':>16} {epoch + 1:>6} {elapsed:7.2f}s {n / elapsed:9.0f}")
+
+        # A second scrape: re-running the build only appends what is new
+        shutil.copy(os.path.join(raw_dir, SPECIES[0], f"{SPECIES[0]}_0.jpg"),
+                    os.path.join(raw_dir, SPECIES[0], "rescraped_copy.jpg"))
+        _, again = timed(lambda: dataset_store.build_store(raw_dir, store_dir, args.size))
+        # (photos dropped last time are not in the index, so they are re-checked and dropped again)
+        print(f"\nre-run after adding a re-scraped copy: packed {again['packed']}, {again['duplicates']} duplicates")
@@ -0,0 +1,137 @@
+# Benchmark: Field Guide grid render time and image bytes the browser has to fetch, for
+# a 5- and a 500-species catalog. "inline" is the page as it was (catalog literal in the
+# page, every card pointing at a 640px remote image); "catalog" is the current page
+# (field_guide.json loaded once, local thumbnails from `field_guide.py thumbnails`,
+# one page of cards at a time). Photos come from a local stand-in for Wikimedia.
+#
+#   python benchmarks/bench_field_guide.py
+#   python benchmarks/bench_field_guide.py --species 5 100 500 --runs 5
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import field_guide
+from streamlit.testing.v1 import AppTest
+
+PAGE = os.path.join(ROOT, 'pages', '2_Field_Guide.py')
+
+
+def make_photo(seed, size=(640, 480)):
+    # A smooth scene plus noise compresses about like a real 640px bird photo
+    rng = np.random.default_rng(seed)
+    scene = Image.fromarray(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)).resize(size, Image.BICUBIC)
+    pixels = np.asarray(scene, dtype=np.float32) + rng.normal(0, 10, (size[1], size[0], 3))
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buf, 'JPEG', quality=85)
+    return buf.getvalue()
+
+
+class FakeWikimedia(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    photos = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = self.photos.get(self.path)
+        self.send_response(200 if body else 404)
+        self.send_header("Content-Length", str(len(body or b'')))
+        self.end_headers()
+        self.wfile.write(body or b'')
+
+
+def make_catalog(n_species, host):
+    # The real entries, repeated under new names
+    template, _ = field_guide.load_catalog(os.path.join(ROOT, field_guide.CATALOG_FILE))
+    entries = list(template.values())
+    catalog = {}
+    for i in range(n_species):
+        path = f"/photos/{i}/640px-bird.jpg"
+        FakeWikimedia.photos[path] = make_photo(i)
+        catalog[f"Test Bird {i}"] = dict(entries[i % len(entries)], img=f"{host}{path}")
+    return catalog
+
+
+def inline_page(catalog, path):
+    # The page with the catalog pasted in as a literal and no thumbnails or paging
+    source = open(PAGE, encoding='utf-8').read()
+    for old, new in [
+        ("species_db, _ = field_guide.load_catalog()", f"species_db = {catalog!r}"),
+        ("field_guide.card_image(name, species_db[name])", "species_db[name]['img']"),
+        ("GRID_PAGE_SIZE = 30", "GRID_PAGE_SIZE = 10 ** 9"),
+    ]:
+        assert old in source, old
+        source = source.replace(old, new)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source)
+    return path
+
+
+def render(page, runs):
+    times = []
+    at = AppTest.from_file(page, default_timeout=120)
+    for _ in range(runs):
+        start = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - start)
+        assert not at.exception, at.exception
+    return at, float(np.median(times[1:] or times)), times[0]
+
+
+def card_names(at):
+    return [b.label for b in at.button if b.key and b.key.startswith('btn_')]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--species", type=int, nargs="+", default=[5, 500])
+    parser.add_argument("--runs", type=int, default=4)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeWikimedia)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"http://127.0.0.1:{server.server_port}"
+
+    cwd = os.getcwd()
+    print(f"{'species':>7} {'page':>8} {'first run':>10} {'rerun':>8} {'cards':>6} {'image bytes':>12}")
+    for n in args.species:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            catalog = make_catalog(n, host)
+            with open(field_guide.CATALOG_FILE, 'w', encoding='utf-8') as f:
+                json.dump(catalog, f)
+            start = time.perf_counter()
+            stats = field_guide.build_thumbnails(field_guide.CATALOG_FILE, field_guide.THUMBNAIL_DIR)
+            build_s = time.perf_counter() - start
+
+            for label, page, thumbs in [("inline", inline_page(catalog, os.path.join(tmp, 'inline.py')), None),
+                                        ("catalog", PAGE, field_guide.THUMBNAIL_DIR)]:
+                at, rerun_s, first_s = render(page, args.runs)
+                names = card_names(at)
+                if thumbs:
+                    size = sum(os.path.getsize(field_guide.thumbnail_path(name, thumbs)) for name in names)
+                else:
+                    size = sum(len(FakeWikimedia.photos[catalog[name]['img'][len(host):]]) for name in names)
+                print(f"{n:>7} {label:>8} {first_s * 1000:8.0f}ms {rerun_s * 1000:6.0f}ms {len(names):>6} "
+                      f"{size / 1024:10.0f}KB")
+            print(f"        thumbnails: {stats['built']} built in {build_s:.1f}s")
+            os.chdir(cwd)
+    server.shutdown()
+
+    # Classifier labels and BirdNET names resolve to the same entry
+    os.chdir(ROOT)
+    assert field_guide.find_species("red_junglefowl")[0] == field_guide.find_species("Red Junglefowl")[0] == "Red Junglefowl"
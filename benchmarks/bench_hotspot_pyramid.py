@@ -0,0 +1,95 @@
+# Benchmark: the multi-resolution hotspot pyramid (hotspot_pyramid.py) on a synthetic
+# history of millions of sightings. Build time of all levels in one pass vs one
+# round-and-groupby per level, and per-zoom query time (level picked by
+# map_view.level_for_zoom, viewport from map_view.render_bounds) vs what home.py did
+# before: the fixed 3-decimal table filtered to the viewport on every render.
+#
+#   python benchmarks/bench_hotspot_pyramid.py
+#   python benchmarks/bench_hotspot_pyramid.py --rows 1000000 --zooms 12 18 21
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import hotspot_pyramid
+import hotspots
+import map_view
+from bench_save_sighting import make_sightings
+
+CENTER = [1.3521, 103.8198]
+
+
+def groupby_levels(df, levels):
+    # One aggregate_sightings-style pass per resolution, for comparison
+    tables = {}
+    for decimals in levels:
+        cells = df.groupby([df['common_name'], df['latitude'].round(decimals).rename('lat'),
+                            df['longitude'].round(decimals).rename('lon')]).size()
+        tables[decimals] = cells[cells >= hotspots.MIN_SIGHTINGS].reset_index(name='sighting_count')
+    return tables
+
+
+def latency(fn, n):
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.percentile(times, 50) * 1000, np.percentile(times, 99) * 1000
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--sites", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--zooms", type=int, nargs="+", default=[11, 13, 15, 17, 18, 19, 20, 22])
+    args = parser.parse_args()
+
+    df = make_sightings(args.rows, n_sites=args.sites)
+    print(f"{args.rows:,} sightings, {args.sites:,} sites\n")
+
+    build_s, pyramid = timed(lambda: hotspot_pyramid.HotspotPyramid(df))
+    table_s, _ = timed(lambda: [pyramid.hotspots(d) for d in pyramid.levels])
+    groupby_s, tables = timed(lambda: groupby_levels(df, pyramid.levels))
+    print(f"build: pyramid {build_s:.2f}s (+{table_s:.2f}s first verified tables), "
+          f"groupby per level {groupby_s:.2f}s\n")
+
+    print(f"{'decimals':>8} {'squares':>10} {'verified':>10}")
+    for decimals in pyramid.levels:
+        level = pyramid.level[decimals]
+        verified = pyramid.hotspots(decimals)
+        expected = tables[decimals].sort_values(['common_name', 'lat', 'lon'], ignore_index=True)
+        got = verified.sort_values(['common_name', 'lat', 'lon'], ignore_index=True)
+        assert got.equals(expected[got.columns]), decimals
+        print(f"{decimals:>8} {len(level.keys):>10,} {len(verified):>10,}")
+    # The 110m level is exactly the hotspot table the rest of the app uses
+    cells = hotspots.verified_hotspots(hotspots.aggregate_sightings(df))
+    assert len(cells) == len(pyramid.hotspots(hotspots.GRID_DECIMALS))
+
+    fixed = pyramid.hotspots(hotspots.GRID_DECIMALS)
+    print(f"\n{'zoom':>4} {'level':>5} {'pyramid p50':>12} {'p99':>9} {'rows':>8} {'fixed grid p50':>15} {'rows':>8}")
+    for zoom in args.zooms:
+        bounds = map_view.render_bounds(CENTER, zoom)
+        level = map_view.level_for_zoom(zoom, pyramid.levels)
+        p50, p99 = latency(lambda: pyramid.query(level, bounds), args.queries)
+        fixed_p50, _ = latency(lambda: map_view.in_bounds(fixed, bounds), args.queries)
+        print(f"{zoom:>4} {level:>5} {p50:10.3f}ms {p99:7.3f}ms {len(pyramid.query(level, bounds)):>8,} "
+              f"{fixed_p50:13.3f}ms {len(map_view.in_bounds(fixed, bounds)):>8,}")
+
+    # A new sighting updates every level; the next query rebuilds the tables it touched
+    rng = np.random.default_rng(1)
+    row = df.iloc[int(rng.integers(len(df)))]
+    p50, p99 = latency(lambda: pyramid.update(row['common_name'], row['latitude'], row['longitude']), args.queries)
+    rebuild_s, _ = timed(lambda: [pyramid.hotspots(d) for d in pyramid.levels])
+    print(f"\nlive update per saved sighting: p50 {p50 * 1000:.1f}µs, p99 {p99 * 1000:.1f}µs; "
+          f"next query rebuilds the verified tables in {rebuild_s * 1000:.0f}ms")
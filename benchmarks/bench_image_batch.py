@@ -0,0 +1,81 @@
+# Benchmark: image_processor.identify_bird_images throughput (images/sec) vs batch size
+# and decode threads, on CPU, with a tiny randomly initialised ViT standing in for
+# zhiquanchng/singapore-bird-classifier so it runs offline in seconds.
+#
+#   python benchmarks/bench_image_batch.py
+#   python benchmarks/bench_image_batch.py --images 128 --batch-sizes 1 8 32 --threads 1 4 8
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import image_processor
+
+SPECIES = ["red_junglefowl", "common_myna", "asian_koel", "javan_myna", "asian_glossy_starling"]
+
+
+def tiny_pipeline(image_size=64, hidden_size=32, num_layers=2):
+    from transformers import ViTConfig, ViTForImageClassification, ViTImageProcessor, pipeline
+
+    config = ViTConfig(
+        image_size=image_size, patch_size=16, hidden_size=hidden_size, num_hidden_layers=num_layers,
+        num_attention_heads=2, intermediate_size=hidden_size * 2, num_labels=len(SPECIES),
+        id2label=dict(enumerate(SPECIES)), label2id={s: i for i, s in enumerate(SPECIES)},
+    )
+    model = ViTForImageClassification(config).eval()
+    processor = ViTImageProcessor(size={'height': image_size, 'width': image_size})
+    return pipeline("image-classification", model=model, image_processor=processor, device='cpu')
+
+
+def make_photos(directory, n_images, size=(1024, 768), seed=0):
+    # Noisy gradients: roughly as expensive to decode as real 'large' iNaturalist photos
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 255, size[0], dtype=np.float32)[None, :, None]
+    paths = []
+    for i in range(n_images):
+        species = SPECIES[i % len(SPECIES)]
+        os.makedirs(os.path.join(directory, species), exist_ok=True)
+        pixels = gradient + rng.normal(0, 40, (size[1], size[0], 3))
+        path = os.path.join(directory, species, f"{species}_{i}.jpg")
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def one_at_a_time(pipe, paths):
+    # The pre-existing path: identify_bird_image's body, per photo
+    return [image_processor.format_predictions(pipe(Image.open(p), top_k=3)) for p in paths]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=96)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    pipe = tiny_pipeline()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_photos(tmp, args.images)
+        one_at_a_time(pipe, paths[:4])  # warm up
+
+        start = time.perf_counter()
+        reference = one_at_a_time(pipe, paths)
+        baseline = args.images / (time.perf_counter() - start)
+        print(f"one at a time (identify_bird_image loop): {baseline:.1f} images/sec\n")
+
+        print(f"{'batch':>6} {'threads':>8} {'images/sec':>11} {'speed-up':>9} {'same top-1':>11}")
+        for batch_size in args.batch_sizes:
+            for threads in args.threads:
+                start = time.perf_counter()
+                results = list(image_processor.identify_bird_images(
+                    paths, batch_size=batch_size, num_workers=threads, pipe=pipe))
+                rate = args.images / (time.perf_counter() - start)
+                # Top-1 can differ from the reference on near ties, since images are pre-resized
+                agree = np.mean([r[0]['raw_label'] == ref[0]['raw_label'] for r, ref in zip(results, reference)])
+                print(f"{batch_size:>6} {threads:>8} {rate:11.1f} {rate / baseline:8.1f}x {agree:10.0%}")
@@ -0,0 +1,120 @@
+# Benchmark: image_scrape.download_birds throughput (images/sec) vs concurrency, against a
+# local stand-in for the iNaturalist API and photo CDN. The server adds a fixed latency
+# per photo and fails every Nth request with a 503, so retries are exercised too. Also
+# checks that a second run only fetches what the manifest says is missing.
+#
+#   python benchmarks/bench_image_scrape.py
+#   python benchmarks/bench_image_scrape.py --images 100 --latency-ms 80 --concurrency 1 8 32
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import image_scrape
+
+OBSERVATIONS_PER_SPECIES = 500
+
+
+class FakeINaturalist(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    latency = 0.0
+    fail_every = 0
+    photo = b''
+    requests = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with FakeINaturalist.lock:
+            FakeINaturalist.requests += 1
+            n = FakeINaturalist.requests
+        if self.fail_every and n % self.fail_every == 0:
+            return self.send(503, b'try again', 'text/plain')
+
+        url = urlparse(self.path)
+        if url.path == '/v1/observations':
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            base = image_scrape.BIRDS.index(q['taxon_name']) * 1_000_000
+            below = int(q.get('id_below', base + OBSERVATIONS_PER_SPECIES + 1))
+            ids = range(min(below, base + OBSERVATIONS_PER_SPECIES + 1) - 1, base, -1)[:int(q['per_page'])]
+            host = f"http://{self.headers['Host']}"
+            results = [{'id': i, 'photos': [{'url': f"{host}/photos/{i}/square.jpg"}]} for i in ids]
+            return self.send(200, json.dumps({'results': results}).encode(), 'application/json')
+
+        time.sleep(self.latency)
+        self.send(200, self.photo, 'image/jpeg')
+
+
+def serve(latency_ms, fail_every, photo_kb):
+    FakeINaturalist.latency = latency_ms / 1000
+    FakeINaturalist.fail_every = fail_every
+    FakeINaturalist.photo = np.random.default_rng(0).bytes(photo_kb * 1024)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeINaturalist)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+def run(api_url, output_dir, images, concurrency):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        counts = image_scrape.download_birds(image_scrape.BIRDS, output_dir, images, concurrency, api_url,
+                                             session=image_scrape.make_session(concurrency, backoff=0.01))
+    return time.perf_counter() - start, sum(counts.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=60, help="per species (5 species)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--photo-kb", type=int, default=200)
+    parser.add_argument("--fail-every", type=int, default=25, help="every Nth request gets a 503 (0 = never)")
+    args = parser.parse_args()
+
+    server, api_url = serve(args.latency_ms, args.fail_every, args.photo_kb)
+    print(f"{len(image_scrape.BIRDS)} species x {args.images} photos, {args.photo_kb}KB each, "
+          f"{args.latency_ms:.0f}ms latency, 503 every {args.fail_every} requests\n")
+    print(f"{'concurrency':>12} {'time':>8} {'images/s':>9} {'speed-up':>9} {'downloaded':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = None
+        for concurrency in args.concurrency:
+            output_dir = os.path.join(tmp, f"c{concurrency}")
+            elapsed, downloaded = run(api_url, output_dir, args.images, concurrency)
+            baseline = baseline or downloaded / elapsed
+            print(f"{concurrency:>12} {elapsed:7.2f}s {downloaded / elapsed:9.1f} "
+                  f"{downloaded / elapsed / baseline:8.1f}x {downloaded:>11}")
+
+        # Resume: drop a third of the photos from the manifest, then run again
+        manifest_path = os.path.join(output_dir, image_scrape.MANIFEST_FILE)
+        with open(manifest_path) as f:
+            lines = f.readlines()
+        keep = lines[:1 + 2 * (len(lines) - 1) // 3]
+        with open(manifest_path, 'w') as f:
+            f.writelines(keep)
+        before = FakeINaturalist.requests
+        elapsed, downloaded = run(api_url, output_dir, args.images, args.concurrency[-1])
+        print(f"\nresume: {downloaded} photos re-fetched (expected {len(lines) - len(keep)}), "
+              f"{FakeINaturalist.requests - before} requests, {elapsed:.2f}s")
+        elapsed, downloaded = run(api_url, output_dir, args.images, args.concurrency[-1])
+        print(f"complete dataset: {downloaded} photos fetched on a re-run")
+    server.shutdown()
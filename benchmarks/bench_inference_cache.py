@@ -0,0 +1,96 @@
+# Benchmark: the shared inference cache (inference_cache.py) behind identify_bird_image and
+# identify_bird_sound. Uses the tiny stand-in ViT from bench_image_batch and the stub
+# BirdNET analyzer from bench_audio_stream, both wrapped to count model executions, and
+# shows that a repeated request (a Streamlit rerun) never reaches the model.
+#
+#   python benchmarks/bench_inference_cache.py
+#   python benchmarks/bench_inference_cache.py --repeats 50 --disk-mb 0.02
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import image_processor
+from bench_image_batch import make_photos, tiny_pipeline
+import audio_processor
+import inference_cache
+from bench_audio_stream import StubAnalyzer, make_recording
+
+
+class Counting:
+    # Wraps a model and counts how often it actually runs
+    def __init__(self, model):
+        self.model, self.calls = model, 0
+        self.custom_species_list = getattr(model, 'custom_species_list', [])
+        self.species_class = getattr(model, 'species_class', None)
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.model(*args, **kwargs)
+
+    def analyze_recording(self, recording):
+        self.calls += 1
+        return self.model.analyze_recording(recording)
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+    return (time.perf_counter() - start) / repeats * 1000, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--disk-mb", type=float, default=0.005, help="small budget so eviction kicks in")
+    args = parser.parse_args()
+
+    pipe = Counting(tiny_pipeline(image_size=224, hidden_size=192, num_layers=12))
+    analyzer = Counting(StubAnalyzer())
+    # Route the page-level functions to the stand-in models
+    image_processor.load_image_model = lambda: pipe
+    audio_processor.load_audio_model = lambda: analyzer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        photo = make_photos(os.path.join(tmp, 'photos'), 1, size=(1280, 960))[0]
+        clip = os.path.join(tmp, 'clip.wav')
+        make_recording(clip, 15 / 60)
+        inference_cache._cache = inference_cache.InferenceCache(
+            disk_dir=os.path.join(tmp, 'cache'), max_disk_mb=args.disk_mb)
+
+        print(f"{'input':>6} {'first (miss)':>13} {'repeat (hit)':>13} {'speed-up':>9} {'model runs':>11}")
+        for name, fn, model in [
+            ('photo', lambda: image_processor.identify_bird_image(open(photo, 'rb')), pipe),
+            ('audio', lambda: audio_processor.identify_bird_sound(clip), analyzer),
+        ]:
+            miss_ms, first = timed(fn, 1)
+            runs_after_miss = model.calls
+            hit_ms, again = timed(fn, args.repeats)
+            assert again == first and model.calls == runs_after_miss, "repeat request reached the model"
+            print(f"{name:>6} {miss_ms:11.1f}ms {hit_ms:11.2f}ms {miss_ms / hit_ms:8.0f}x {model.calls:>11}")
+
+        # New process (simulated): empty memory tier, results still on disk
+        inference_cache._cache = inference_cache.InferenceCache(
+            disk_dir=os.path.join(tmp, 'cache'), max_disk_mb=args.disk_mb)
+        calls = pipe.calls
+        disk_ms, _ = timed(lambda: image_processor.identify_bird_image(photo), 1)
+        print(f"\nafter restart: photo served from disk in {disk_ms:.2f}ms, model runs {pipe.calls - calls}")
+
+        # Different parameters are a different key
+        image_processor.identify_bird_image(photo, top_k=5)
+        print(f"top_k=5 for the same photo: model runs {pipe.calls - calls}")
+
+        # Fill the disk tier past its budget with distinct photos
+        for path in make_photos(os.path.join(tmp, 'more'), 40, size=(320, 240), seed=1):
+            image_processor.identify_bird_image(path)
+        cache = inference_cache.get_cache()
+        files = [f for f in os.listdir(os.path.join(tmp, 'cache')) if f.endswith('.pkl')]
+        size_kb = sum(os.path.getsize(os.path.join(tmp, 'cache', f)) for f in files) / 1024
+        print(f"disk tier: {len(files)} entries, {size_kb:.1f}KB (budget {args.disk_mb * 1024:.1f}KB)")
+        print(f"counters: {cache.stats}")
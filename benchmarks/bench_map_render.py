@@ -0,0 +1,59 @@
+# Benchmark: home.py map payload size and build time vs number of hotspots.
+#
+# "legacy" is the original per-row folium.Circle + folium.Marker loop; "fast" is the
+# viewport-bounded, clustered FastMarkerCluster layer from map_view.py, measured at a
+# city-wide, neighbourhood and street zoom level centred on Singapore.
+#
+#   python benchmarks/bench_map_render.py
+#   python benchmarks/bench_map_render.py --sizes 100 10000 --legacy-max 10000
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import map_view
+
+SPECIES = ["Red Junglefowl", "Common Myna", "Asian Koel", "Javan Myna", "Asian Glossy Starling"]
+CENTER = [1.3521, 103.8198]
+
+
+def make_hotspots(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'common_name': rng.choice(SPECIES, n_rows),
+        'lat': rng.uniform(1.24, 1.46, n_rows).round(3),
+        'lon': rng.uniform(103.62, 104.02, n_rows).round(3),
+        'sighting_count': rng.integers(3, 50, n_rows),
+    })
+
+
+def measure(df, mode, zoom):
+    start = time.perf_counter()
+    m, _ = map_view.build_map(df, CENTER, zoom, mode=mode)
+    html = m.get_root().render()
+    return len(html.encode('utf-8')), time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 1_000_000])
+    parser.add_argument("--zooms", type=int, nargs="+", default=[12, 15, 18])
+    parser.add_argument("--legacy-max", type=int, default=10_000,
+                        help="skip the legacy renderer above this many hotspots (it needs minutes at 1M)")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    print(f"{'hotspots':>10} {'mode':>8} {'zoom':>5} {'payload':>12} {'build+render':>13}")
+    for n in args.sizes:
+        df = make_hotspots(n)
+        runs = [('fast', z) for z in args.zooms]
+        if n <= args.legacy_max:
+            runs.insert(0, ('legacy', None))
+        for mode, zoom in runs:
+            size, elapsed = measure(df, mode, zoom or map_view.DEFAULT_ZOOM)
+            print(f"{n:>10} {mode:>8} {zoom or '-':>5} {size / 1024:10.1f}KB {elapsed * 1000:11.1f}ms")
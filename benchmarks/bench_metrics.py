@@ -0,0 +1,173 @@
+# Benchmark + check for metrics.py. Runs every instrumented path once with stand-in
+# models (tiny ViT from bench_image_batch, stub BirdNET from bench_audio_stream): model
+# loads, image/audio identification (cache miss and hit), both storage backends, hotspot
+# rebuilds, index builds, map building, error paths. Then asserts each one shows up on
+# the /metrics endpoint and in the rolling JSON log, and measures what instrumentation
+# costs per call when metrics are disabled and enabled.
+#
+#   python benchmarks/bench_metrics.py
+#   python benchmarks/bench_metrics.py --calls 1000000
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.request
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import image_processor
+from bench_image_batch import make_photos, tiny_pipeline
+import audio_processor
+from bench_audio_stream import StubAnalyzer, make_recording
+from bench_save_sighting import make_sightings
+import activity
+import hotspot_pyramid
+import inference_cache
+import map_view
+import metrics
+import model_loader
+import spatial_index
+import storage
+import utils
+
+# Every series an instrumented path should produce
+EXPECTED = [
+    'terranova_model_load_seconds_count{model="image"}',
+    'terranova_model_load_seconds_count{model="audio"}',
+    'terranova_identify_seconds_count{kind="image"}',
+    'terranova_identify_seconds_count{kind="audio"}',
+    'terranova_inference_seconds_count{kind="image"}',
+    'terranova_inference_seconds_count{kind="audio"}',
+    'terranova_inference_payload_bytes_count',
+    'terranova_inference_cache_hit_rate',
+    'terranova_storage_write_seconds_count{backend="csv"}',
+    'terranova_storage_write_seconds_count{backend="sqlite"}',
+    'terranova_storage_read_seconds_count{backend="csv",table="hotspots"}',
+    'terranova_storage_read_seconds_count{backend="sqlite",table="sightings"}',
+    'terranova_hotspot_rebuild_seconds_count{backend="csv"}',
+    'terranova_hotspot_rebuild_seconds_count{backend="sqlite"}',
+    'terranova_update_hotspots_seconds_count',
+    'terranova_index_build_seconds_count{index="pyramid"}',
+    'terranova_index_build_seconds_count{index="activity"}',
+    'terranova_index_build_seconds_count{index="spatial"}',
+    'terranova_map_build_seconds_count{mode="fast"}',
+    'terranova_map_build_seconds_count{mode="legacy"}',
+    'terranova_map_markers_count',
+    'terranova_errors_total{where="storage_listener"}',
+    'terranova_errors_total{where="update_hotspots"}',
+    'terranova_errors_total{where="model_load"}',
+]
+
+
+def exercise(tmp):
+    photo = make_photos(os.path.join(tmp, 'photos'), 1, size=(640, 480))[0]
+    clip = os.path.join(tmp, 'clip.wav')
+    make_recording(clip, 10 / 60)
+
+    # Model loads go through model_loader, as on the Identify page
+    model_loader.load('image')
+    model_loader.load('audio')
+    for _ in range(2):  # a miss, then a cache hit
+        image_processor.identify_bird_image(open(photo, 'rb'))
+        audio_processor.identify_bird_sound(clip)
+
+    # Both storage backends, with a listener that fails
+    sightings = make_sightings(2000, n_sites=50)
+    sightings.to_csv(storage.hotspots.SIGHTINGS_FILE, index=False)
+    for store in (storage.CsvStore(), storage.SqliteStore(os.path.join(tmp, 'bench.db'))):
+        if isinstance(store, storage.SqliteStore):
+            store.import_csv()
+        store.listeners.append(lambda *args: 1 / 0)
+        store.add_sighting('01/03/2025', '08:00:00', 1.3, 103.8, 'Red Junglefowl', 'bench')
+        store.load_sightings()
+        store.rebuild_hotspots()
+        hotspots_df = store.load_hotspots()
+    storage._stores['csv'] = storage.CsvStore()
+    storage.STORAGE_BACKEND = 'csv'
+    utils.update_hotspots()
+    with open(storage.hotspots.SIGHTINGS_FILE, 'w') as f:
+        f.write("id,not_a_sighting\n1,x\n")
+    utils.update_hotspots()  # unreadable history: reported, not raised
+    sightings.to_csv(storage.hotspots.SIGHTINGS_FILE, index=False)
+
+    hotspot_pyramid.HotspotPyramid(sightings)
+    activity.ActivityIndex(sightings)
+    spatial_index.HotspotIndex(hotspots_df)
+    for mode in ('fast', 'legacy'):
+        map_view.build_map(hotspots_df, [1.35, 103.82], 12, mode=mode)
+
+    # A model that fails to load
+    model_loader.MODELS['broken'] = ('no_such_module', 'load')
+    model_loader._status['broken'] = {'state': 'not loaded', 'seconds': None, 'error': None}
+    model_loader._locks['broken'] = model_loader.threading.Lock()
+    with contextlib.suppress(ImportError):
+        model_loader.load('broken')
+
+
+def per_call_ns(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=300_000)
+    parser.add_argument("--port", type=int, default=0, help="0 = any free port")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    image_processor.load_image_model = lambda: tiny_pipeline()
+    audio_processor.load_audio_model = lambda: StubAnalyzer()
+    inference_cache._cache = None
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        metrics.enable()
+        with contextlib.redirect_stdout(io.StringIO()):
+            exercise(tmp)
+            inference_cache.get_cache()
+
+        server = metrics.start(port=args.port, log_file=None)
+        url = f"http://127.0.0.1:{server.server_port}"
+        text = urllib.request.urlopen(f"{url}/metrics").read().decode()
+        missing = [series for series in EXPECTED if series not in text]
+        assert not missing, f"not exported: {missing}"
+        snapshot = json.loads(urllib.request.urlopen(f"{url}/metrics.json").read())
+        print(f"/metrics: {len(text.splitlines())} lines, all {len(EXPECTED)} instrumented paths present; "
+              f"{len(snapshot['errors'])} recent errors in /metrics.json")
+
+        # Rolling JSON log: rotates past max_bytes and keeps `backups` old files
+        log = os.path.join(tmp, 'metrics.jsonl')
+        for _ in range(6):
+            metrics.write_log(log, max_bytes=1, backups=2)
+        files = sorted(f for f in os.listdir(tmp) if f.startswith('metrics.jsonl'))
+        assert files == ['metrics.jsonl', 'metrics.jsonl.1', 'metrics.jsonl.2'], files
+        json.loads(open(log).readline())
+        print(f"JSON log: {files}")
+        os.chdir(cwd)
+
+    # Per-call overhead of the decorator and the context manager
+    def plain():
+        return None
+    decorated = metrics.timed('overhead')(plain)
+
+    def with_timer():
+        with metrics.timer('overhead'):
+            return None
+
+    print(f"\n{'call':>22} {'disabled':>10} {'enabled':>10}")
+    base = per_call_ns(plain, args.calls)
+    print(f"{'plain function':>22} {base:8.0f}ns {base:8.0f}ns")
+    for label, fn in [('@metrics.timed', decorated), ('with metrics.timer', with_timer)]:
+        metrics.enable(False)
+        off = per_call_ns(fn, args.calls)
+        metrics.enable(True)
+        on = per_call_ns(fn, args.calls)
+        print(f"{label:>22} {off:8.0f}ns {on:8.0f}ns")
@@ -0,0 +1,254 @@
+# Load test: several Streamlit-like worker processes identifying photos and recordings
+# at once, each loading its own models (as before) vs sharing one inference service
+# (inference_service.py) over a Unix socket.
+#
+# Each worker imports what home.py imports, loads the models through model_loader like
+# the Identify page, then runs --sessions concurrent sessions of --requests
+# identifications each (photos and recordings alternating, inference cache off so every
+# request reaches a model). Reports resident memory per worker and for the service,
+# and p50/p99 identification latency. Uses the stand-in models from synthetic.py.
+# Also checks that a sighting saved through the service reaches another process's hotspot
+# pyramid and indexes from the change log, without rebuilding them, and that a short
+# recording is not held up behind a long one (with --chunk-ms of model time per chunk).
+#
+#   python benchmarks/bench_multiprocess.py
+#   python benchmarks/bench_multiprocess.py --workers 4 --sessions 8 --requests 20
+#   python benchmarks/bench_multiprocess.py --long-minutes 10 --chunk-ms 50
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import synthetic
+
+SOCKET = 'bench.sock'
+
+
+def rss_mb(pid='self'):
+    with open(f'/proc/{pid}/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmRSS')) / 1024
+
+
+def read_all(paths):
+    out = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            out.append(f.read())
+    return out
+
+
+# --- CHILD PROCESSES ---
+def worker(mode, sessions, requests):
+    acks, sys.stdout = sys.stdout, sys.stderr
+    if mode == 'in-process':
+        synthetic.install_stub_models()
+    # What a Streamlit worker has loaded once home.py and the Identify page ran
+    import activity, hotspot_pyramid, inference_service, map_view, model_loader, spatial_index, utils  # noqa: F401
+    for name in model_loader.MODELS:
+        model_loader.load(name)
+    photos = read_all(sorted(os.path.join('photos', d, f) for d in os.listdir('photos')
+                             for f in os.listdir(os.path.join('photos', d))))
+    clips = read_all(sorted(os.path.join('clips', f) for f in os.listdir('clips')))
+    print('ready', file=acks, flush=True)
+    sys.stdin.readline()   # all workers start together
+
+    def session(s):
+        # Uploads arrive as file-like objects, like Streamlit's UploadedFile
+        latencies = []
+        for r in range(requests):
+            start = time.perf_counter()
+            if (s + r) % 2 == 0:
+                inference_service.identify_bird_image(io.BytesIO(photos[(s * requests + r) % len(photos)]))
+                kind = 'image'
+            else:
+                inference_service.identify_bird_sound(io.BytesIO(clips[(s * requests + r) % len(clips)]))
+                kind = 'audio'
+            latencies.append((kind, time.perf_counter() - start))
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(sessions) as pool:
+        latencies = [item for found in pool.map(session, range(sessions)) for item in found]
+    print(json.dumps({'latencies': latencies, 'seconds': time.perf_counter() - start, 'rss_mb': rss_mb()}),
+          file=acks, flush=True)
+
+
+def service(socket_path, chunk_ms):
+    sys.stdout = sys.stderr
+    synthetic.install_stub_models()
+    import audio_processor
+    import inference_service
+    from bench_audio_preprocess import TimedStubAnalyzer
+    if chunk_ms:
+        analyzer = TimedStubAnalyzer(chunk_ms)
+        audio_processor.load_audio_model = lambda: analyzer
+    inference_service.serve(socket_path)
+
+
+# --- PARENT ---
+def start(args, role, env, socket_path=SOCKET, chunk_ms=0):
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child', role, '--socket', socket_path,
+                             '--chunk-ms', str(chunk_ms),
+                             '--sessions', str(args.sessions), '--requests', str(args.requests)],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env)
+
+
+def wait_for_service(client, timeout=120):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return client.request({'op': 'status'}, retry=False)
+        except ConnectionError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def run_mode(args, mode):
+    import inference_service
+
+    env = dict(os.environ, TERRANOVA_CACHE_ITEMS='0', TERRANOVA_WARMUP='0', TERRANOVA_FLUSH_SECS='0.2')
+    server = None
+    if mode == 'service':
+        env['TERRANOVA_INFERENCE_SOCKET'] = SOCKET
+        server = start(args, 'service', env)
+        client = inference_service.InferenceClient(SOCKET)
+        wait_for_service(client)
+
+    workers = [start(args, 'worker', env) for _ in range(args.workers)]
+    for proc in workers:
+        assert proc.stdout.readline().strip() == 'ready', f"{mode} worker failed to start"
+    for proc in workers:
+        proc.stdin.write('go\n')
+        proc.stdin.flush()
+    reports = [json.loads(proc.stdout.readline()) for proc in workers]
+    for proc in workers:
+        proc.wait()
+
+    service_mb = 0.0
+    if server:
+        service_mb = rss_mb(server.pid)
+        check_data_version(client)
+        server.terminate()
+        server.wait()
+
+    latencies = [item for report in reports for item in report['latencies']]
+    row = {'mode': mode, 'worker_mb': np.mean([r['rss_mb'] for r in reports]), 'service_mb': service_mb,
+           'per_s': len(latencies) / max(r['seconds'] for r in reports)}
+    row['total_mb'] = row['worker_mb'] * args.workers + service_mb
+    for kind in ('image', 'audio'):
+        times = np.array([t for k, t in latencies if k == kind]) * 1000
+        row[f'{kind}_p50'], row[f'{kind}_p99'] = np.percentile(times, 50), np.percentile(times, 99)
+    return row
+
+
+def check_data_version(client):
+    # This process stands in for another Streamlit worker with its indexes already built
+    import activity
+    import hotspot_pyramid
+    import spatial_index
+    import storage
+
+    pyramid, spatial, active = hotspot_pyramid.get_pyramid(), spatial_index.get_index(), activity.get_index()
+    seen = storage.data_version()
+    assert 'Oriental Magpie-Robin' not in pyramid.names
+    for i in range(3):   # three sightings make the grid square a verified hotspot
+        client.request({'op': 'sighting', 'row': ['01/03/2025', '08:00:00', 1.35, 103.82, 'Oriental Magpie-Robin',
+                                                  f'bench{i}']}, retry=False)
+    deadline = time.monotonic() + 10
+    while sum(len(change['rows']) for change in storage.changes_since(seen, storage.data_version()) or []) < 3:
+        assert time.monotonic() < deadline, "the sightings never reached the change log"
+        time.sleep(0.05)
+    # Replayed into the existing objects, not rebuilt from the store
+    assert hotspot_pyramid.get_pyramid() is pyramid and 'Oriental Magpie-Robin' in pyramid.names, "stale pyramid"
+    assert spatial_index.get_index() is spatial and activity.get_index() is active, "rebuilt instead of replayed"
+    nearby = spatial.nearest(1.35, 103.82, k=50, max_radius_m=200)
+    assert 'Oriental Magpie-Robin' in set(nearby['common_name']), "stale spatial index"
+    assert 'Oriental Magpie-Robin' in set(active.active_hotspots([8], [3])['common_name']), "stale activity index"
+
+
+def tone_clip(seconds, rate=48000):
+    # One long, loud call: no silence to skip, every chunk reaches the model
+    import soundfile as sf
+    t = np.arange(int(seconds * rate)) / rate
+    out = io.BytesIO()
+    sf.write(out, (0.3 * np.sin(2 * np.pi * 2000 * t)).astype(np.float32), rate, format='WAV', subtype='PCM_16')
+    return out.getvalue()
+
+
+def check_turns(args, env):
+    # A short recording sent while a long one is being analyzed comes back first
+    import inference_service
+
+    server = start(args, 'service', env, 'turns.sock', args.chunk_ms)
+    client = inference_service.InferenceClient('turns.sock')
+    wait_for_service(client)
+    client.wait_ready('audio')
+    long_clip, short_clip = tone_clip(args.long_minutes * 60), tone_clip(6)
+
+    def identify(data, delay):
+        time.sleep(delay)
+        start_time = time.perf_counter()
+        inference_service.InferenceClient('turns.sock').request(
+            {'op': 'audio', 'lat': 1.35, 'lon': 103.82, 'date': None, 'min_conf': 0.5}, data)
+        return time.perf_counter() - start_time
+
+    with ThreadPoolExecutor(2) as pool:
+        long_job, short_job = pool.submit(identify, long_clip, 0), pool.submit(identify, short_clip, 0.5)
+        long_secs, short_secs = long_job.result(), short_job.result()
+    server.terminate()
+    server.wait()
+    print(f"\n{args.long_minutes}min recording: {long_secs:.2f}s; a 6s one sent 0.5s later: {short_secs:.2f}s")
+    assert short_secs < long_secs / 3, "the short recording waited for the long one"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=3, help="Streamlit server processes")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent sessions per worker")
+    parser.add_argument("--requests", type=int, default=10, help="identifications per session")
+    parser.add_argument("--modes", nargs="+", choices=['in-process', 'service'], default=['in-process', 'service'])
+    parser.add_argument("--long-minutes", type=float, default=5, help="long recording for the turn-taking check")
+    parser.add_argument("--chunk-ms", type=float, default=20, help="simulated model time per 3s chunk, same check")
+    parser.add_argument("--child", choices=['worker', 'service'], help=argparse.SUPPRESS)
+    parser.add_argument("--socket", default=SOCKET, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child == 'service':
+        service(args.socket, args.chunk_ms)
+        sys.exit()
+    if args.child == 'worker':
+        worker('service' if os.environ.get('TERRANOVA_INFERENCE_SOCKET') else 'in-process',
+               args.sessions, args.requests)
+        sys.exit()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        synthetic.write_sightings_csv('sightings.csv', 50_000, n_sites=500)
+        synthetic.make_photos('photos', 16, size=(640, 480))
+        synthetic.make_clips('clips', 8)
+        import storage
+        sys.stdout = open(os.devnull, 'w')   # the store's import messages
+        storage.get_store()                  # seeded once, before several processes open it
+        sys.stdout = sys.__stdout__
+
+        print(f"{args.workers} workers x {args.sessions} sessions x {args.requests} identifications")
+        print(f"{'mode':>10} {'MB/worker':>10} {'service MB':>11} {'total MB':>9} | {'photo p50':>9} {'p99':>8} | "
+              f"{'audio p50':>9} {'p99':>8} | {'req/s':>6}")
+        for mode in args.modes:
+            r = run_mode(args, mode)
+            print(f"{mode:>10} {r['worker_mb']:10.0f} {r['service_mb']:11.0f} {r['total_mb']:9.0f} | "
+                  f"{r['image_p50']:7.0f}ms {r['image_p99']:6.0f}ms | {r['audio_p50']:7.0f}ms {r['audio_p99']:6.0f}ms | "
+                  f"{r['per_s']:6.1f}")
+        if 'service' in args.modes:
+            check_turns(args, dict(os.environ, TERRANOVA_CACHE_ITEMS='0', TERRANOVA_WARMUP='0'))
+        os.chdir(cwd)
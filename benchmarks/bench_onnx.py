@@ -0,0 +1,135 @@
+# Benchmark: PyTorch pipeline vs ONNX Runtime fp32 vs ONNX Runtime int8 for the image
+# classifier. Reports accuracy parity against PyTorch, single-image latency, batched
+# throughput and peak memory (each backend is measured in its own fresh process).
+#
+# By default a randomly initialised ViT-Tiny-sized stand-in is used so it runs offline;
+# pass --model zhiquanchng/singapore-bird-classifier to measure the real classifier. (The
+# stand-in's random weights give near-uniform scores, so int8 may reorder near-ties.)
+#
+#   python benchmarks/bench_onnx.py
+#   python benchmarks/bench_onnx.py --threads 1 4 --images 64
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import onnx_classifier
+
+# bench_image_batch (and through it transformers/streamlit) is only imported by the parent
+# process, so the spawned measurement processes start clean.
+
+
+def load_backend(backend, model_dir, threads):
+    if backend == 'torch':
+        import torch
+        from transformers import pipeline
+        if threads:
+            torch.set_num_threads(threads)
+        return pipeline("image-classification", model=os.path.join(model_dir, 'torch'), device='cpu')
+    return onnx_classifier.OnnxImageClassifier(model_dir, quantized=backend == 'onnx-int8', intra_op_threads=threads)
+
+
+def peak_rss_mb():
+    # VmHWM is reset by exec, unlike ru_maxrss which a spawned child inherits from its parent
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(backend, model_dir, paths, threads, queue):
+    # Runs in a fresh process so peak RSS belongs to this backend alone
+    from PIL import Image
+
+    start = time.perf_counter()
+    classifier = load_backend(backend, model_dir, threads)
+    load_s = time.perf_counter() - start
+
+    images = [Image.open(p).convert('RGB') for p in paths]
+    classifier(images[0], top_k=3)  # warm up
+
+    latencies = []
+    for img in images:
+        start = time.perf_counter()
+        classifier(img, top_k=3)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    classifier(images, top_k=3, batch_size=16)
+    throughput = len(images) / (time.perf_counter() - start)
+
+    queue.put({
+        'load_s': load_s, 'p50_ms': np.percentile(latencies, 50) * 1000,
+        'p99_ms': np.percentile(latencies, 99) * 1000, 'throughput': throughput,
+        'peak_rss_mb': peak_rss_mb(),
+    })
+
+
+def run_isolated(*args):
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=measure, args=(*args, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def prepare_models(model_dir, model_path):
+    from bench_image_batch import tiny_pipeline
+
+    if model_path:
+        from transformers import AutoImageProcessor, AutoModelForImageClassification
+        model = AutoModelForImageClassification.from_pretrained(model_path)
+        processor = AutoImageProcessor.from_pretrained(model_path)
+    else:
+        # ViT-Tiny-sized stand-in (~5M parameters)
+        pipe = tiny_pipeline(image_size=224, hidden_size=192, num_layers=12)
+        model, processor = pipe.model, pipe.image_processor
+    model.save_pretrained(os.path.join(model_dir, 'torch'))
+    processor.save_pretrained(os.path.join(model_dir, 'torch'))
+    onnx_classifier.export_onnx(model, processor, model_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=None, help="Hugging Face model id (default: offline stand-in)")
+    parser.add_argument("--images", type=int, default=48)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 0], help="intra-op threads, 0 = default")
+    args = parser.parse_args()
+
+    from bench_image_batch import make_photos
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = os.path.join(tmp, 'model')
+        prepare_models(model_dir, args.model)
+        paths = make_photos(os.path.join(tmp, 'photos'), args.images, size=(640, 480))
+
+        from transformers import pipeline
+        reference = pipeline("image-classification", model=os.path.join(model_dir, 'torch'), device='cpu')
+        print("Accuracy parity vs PyTorch:")
+        for backend in ('onnx', 'onnx-int8'):
+            report = onnx_classifier.parity_report(reference, load_backend(backend, model_dir, 0), paths)
+            print(f"   {backend:>9}: top-1 {report['top1_agreement']:.1%}, top-k set {report['topk_set_agreement']:.1%}, "
+                  f"max score diff {report['max_score_diff']:.4f}")
+
+        sizes = {name: os.path.getsize(os.path.join(model_dir, name)) / 2**20
+                 for name in (onnx_classifier.FP32_FILE, onnx_classifier.INT8_FILE)}
+        print(f"\nModel files: fp32 {sizes[onnx_classifier.FP32_FILE]:.1f}MB, int8 {sizes[onnx_classifier.INT8_FILE]:.1f}MB\n")
+
+        print(f"{'backend':>10} {'threads':>8} {'load':>8} {'p50':>9} {'p99':>9} {'batch img/s':>12} {'peak RSS':>10}")
+        for threads in args.threads:
+            for backend in ('torch', 'onnx', 'onnx-int8'):
+                r = run_isolated(backend, model_dir, paths, threads)
+                print(f"{backend:>10} {threads or 'auto':>8} {r['load_s']:7.2f}s {r['p50_ms']:7.1f}ms {r['p99_ms']:7.1f}ms "
+                      f"{r['throughput']:12.1f} {r['peak_rss_mb']:8.0f}MB")
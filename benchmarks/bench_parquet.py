@@ -0,0 +1,103 @@
+# Benchmark: cold loads from the CSV files vs the Parquet store (storage.ParquetStore).
+#
+# Each load runs in a fresh process (no warm pandas/pyarrow state, no cached frames),
+# timing the call and the process's peak resident memory above its post-import
+# baseline. Loads: the whole history, the three columns the hotspot pipeline reads,
+# one species in a bounding box over one year, and the verified hotspots table.
+# Checks that both stores return the same rows for every load.
+#
+#   python benchmarks/bench_parquet.py
+#   python benchmarks/bench_parquet.py --sizes 1000000 10000000
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import storage
+from suite import SPECIES_MIX
+from synthetic import write_sightings_csv
+
+LOADS = {
+    'all columns': ('load_sightings', {}),
+    'lat/lon/species': ('load_sightings', {'columns': ['latitude', 'longitude', 'common_name']}),
+    'species+bbox+year': ('load_sightings', {
+        'species': 'Asian Koel', 'bounds': [[1.28, 103.75], [1.38, 103.90]],
+        'start': '2024-01-01', 'end': '2024-12-31',
+    }),
+    'hotspots': ('load_hotspots', {}),
+}
+
+
+def peak_rss_mb():
+    # High-water mark of this process's resident memory (Linux). Not ru_maxrss: that one
+    # carries over the parent's peak across exec.
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmHWM')) / 1024
+
+
+def child(backend, load):
+    # Runs in its own process: one load, reported as JSON on stdout
+    store = storage.CsvStore.__new__(storage.CsvStore) if backend == 'csv' else storage.ParquetStore()
+    if backend == 'csv':
+        # Skip CsvStore's incremental engine sync: only the load is measured
+        store.sightings_file, store.output_file = storage.hotspots.SIGHTINGS_FILE, storage.hotspots.HOTSPOTS_FILE
+    method, kwargs = LOADS[load]
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    df = getattr(store, method)(**kwargs)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    print(json.dumps({
+        'seconds': elapsed, 'peak_mb': peak - baseline, 'rows': len(df),
+        'frame_mb': df.memory_usage(deep=True).sum() / 2**20,
+        'check': round(float(df['lat' if 'lat' in df else 'latitude'].sum()), 6),
+    }))
+
+
+def run_child(backend, load):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', backend, load],
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def dir_mb(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files) / 2**20
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--sites", type=int, default=5000)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        sys.exit()
+
+    for n_rows in args.sizes:
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            write_sightings_csv(storage.hotspots.SIGHTINGS_FILE, n_rows, n_sites=args.sites, species=SPECIES_MIX,
+                                start='2019-01-01', end='2025-12-31')
+            storage.hotspots.get_engine().rebuild()
+            start = time.perf_counter()
+            storage.ParquetStore().import_csv()
+            convert_s = time.perf_counter() - start
+
+            print(f"\n{n_rows:,} sightings: sightings.csv {os.path.getsize(storage.hotspots.SIGHTINGS_FILE) / 2**20:.0f}MB, "
+                  f"Parquet {dir_mb(storage.PARQUET_DIR):.0f}MB (converted in {convert_s:.1f}s)")
+            print(f"{'load':>20} {'rows':>10} | {'CSV s':>7} {'peak MB':>8} {'frame MB':>8} | "
+                  f"{'Parquet s':>9} {'peak MB':>8} {'frame MB':>8} | {'speedup':>7}")
+            for load in LOADS:
+                csv, parquet = run_child('csv', load), run_child('parquet', load)
+                assert csv['rows'] == parquet['rows'] and csv['check'] == parquet['check'], (load, csv, parquet)
+                print(f"{load:>20} {csv['rows']:>10,} | {csv['seconds']:7.2f} {csv['peak_mb']:8.0f} {csv['frame_mb']:8.0f} | "
+                      f"{parquet['seconds']:9.2f} {parquet['peak_mb']:8.0f} {parquet['frame_mb']:8.0f} | "
+                      f"{csv['seconds'] / parquet['seconds']:6.1f}x")
+            os.chdir(cwd)
@@ -0,0 +1,83 @@
+# Benchmark: latency of saving a sighting to the store as the sightings history grows.
+# (utils.save_new_sighting itself only journals the sighting; this is the write the
+# sighting queue's worker makes, see bench_sighting_queue.py.)
+#
+# Compares the storage backends (storage.py: SQLite, or CSV + hotspots.py) against the old behaviour
+# (re-read sightings.csv for the next id, then a full update_hotspots rebuild).
+# For CSV the p99 column is the occasional compaction of final_hotspots.csv (saves
+# otherwise append the changed square's row), which scales with the number of hotspots.
+#
+#   python benchmarks/bench_save_sighting.py
+#   python benchmarks/bench_save_sighting.py --sizes 2500 100000 --saves 50 --skip-legacy
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import hotspots
+import storage
+from synthetic import SPECIES, make_sightings
+
+def legacy_save(row):
+    # What save_new_sighting did before: full read for the id, append, full rebuild
+    existing_df = pd.read_csv('sightings.csv')
+    new_id = existing_df['id'].max() + 1
+    row = row.assign(id=new_id)
+    row.to_csv('sightings.csv', mode='a', header=False, index=False)
+    cells = hotspots.aggregate_sightings(pd.read_csv('sightings.csv'))
+    hotspots.verified_hotspots(cells).to_csv('final_hotspots.csv', index=False)
+
+
+def time_saves(n_rows, n_saves, skip_legacy):
+    rng = np.random.default_rng(1)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        make_sightings(n_rows).to_csv('sightings.csv', index=False)
+        hotspots._engines.clear()
+        storage._stores.clear()
+
+        # Cold start: the first save in a fresh process builds the store (CSV engine state
+        # or the one-off SQLite import)
+        start = time.perf_counter()
+        storage.get_store()
+        cold = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(n_saves):
+            start = time.perf_counter()
+            storage.get_store().add_sighting("01/01/2025", "08:00:00", 1.3 + rng.normal(0, 0.01),
+                                             103.8 + rng.normal(0, 0.01), rng.choice(SPECIES), "bench")
+            latencies.append(time.perf_counter() - start)
+
+        legacy = None
+        if not skip_legacy:
+            row = make_sightings(1, seed=2)
+            start = time.perf_counter()
+            legacy_save(row)
+            legacy = time.perf_counter() - start
+
+        os.chdir(cwd)
+    return cold, np.array(latencies), legacy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2_500, 50_000, 500_000, 5_000_000])
+    parser.add_argument("--saves", type=int, default=200)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--backend", choices=["sqlite", "csv", "parquet"], default=storage.STORAGE_BACKEND)
+    args = parser.parse_args()
+    storage.STORAGE_BACKEND = args.backend
+
+    print(f"{'rows':>10} {'cold start':>11} {'save p50':>10} {'save p99':>10} {'legacy save':>12}")
+    for n in args.sizes:
+        cold, lat, legacy = time_saves(n, args.saves, args.skip_legacy)
+        legacy_txt = f"{legacy * 1000:10.1f}ms" if legacy is not None else f"{'-':>12}"
+        print(f"{n:>10} {cold * 1000:9.1f}ms {np.percentile(lat, 50) * 1000:8.2f}ms "
+              f"{np.percentile(lat, 99) * 1000:8.2f}ms {legacy_txt}")
@@ -0,0 +1,164 @@
+# Benchmark + check for sighting_queue.py (write-behind "Confirm & Upload").
+#
+# 1. Burst: --sessions threads submit --burst sightings at once, as if that many users
+#    pressed Confirm & Upload together. Compares the click latency of the queue (journal
+#    append) with writing straight to the store, and checks every sighting is stored once.
+# 2. Crash/restart: a child process submits sightings and is killed (SIGKILL at a random
+#    point, or right after a batch commits but before the journal records it). A new
+#    queue in another process adopts its journal and must store every acknowledged
+#    sighting exactly once.
+#
+#   python benchmarks/bench_sighting_queue.py
+#   python benchmarks/bench_sighting_queue.py --backend csv --rows 500000 --burst 1000 --crashes 10
+import argparse
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import hotspots
+import sighting_queue
+import storage
+from synthetic import SPECIES, write_sightings_csv
+
+
+def sighting(i, tag):
+    rng = random.Random(int(i))
+    return ("01/03/2025", "08:00:00", 1.3 + rng.gauss(0, 0.01), 103.8 + rng.gauss(0, 0.01),
+            SPECIES[i % len(SPECIES)], f"{tag}-{i}")
+
+
+def fresh_store(backend):
+    hotspots._engines.clear()
+    storage._stores.clear()
+    return storage.get_store(backend)
+
+
+def stored_users(store, tag):
+    users = store.load_sightings(['username'])['username'].astype(str)
+    return users[users.str.startswith(f"{tag}-")].value_counts()
+
+
+def click_latencies(submit, n, sessions, tag):
+    # n submissions spread over `sessions` threads that all start together
+    def session(ids):
+        times = []
+        for i in ids:
+            start = time.perf_counter()
+            submit(*sighting(i, tag))
+            times.append(time.perf_counter() - start)
+        return times
+    with ThreadPoolExecutor(sessions) as pool:
+        return np.concatenate(list(pool.map(session, np.array_split(np.arange(n), sessions))))
+
+
+def burst(args):
+    store = fresh_store(args.backend)
+    direct = click_latencies(store.add_sighting, args.burst, args.sessions, 'direct')
+
+    queue = sighting_queue.SightingQueue(store=lambda: store, journal_file='burst.jsonl', flush_secs=args.flush_secs)
+    start = time.perf_counter()
+    queued = click_latencies(queue.submit, args.burst, args.sessions, 'burst')
+    while queue.status()['queued']:
+        time.sleep(0.01)
+    drained = time.perf_counter() - start
+    queue.close()
+
+    counts = stored_users(store, 'burst')
+    assert len(counts) == args.burst and (counts == 1).all(), "lost or duplicated sightings"
+    print(f"burst of {args.burst} from {args.sessions} sessions ({args.backend}, {args.rows:,} rows of history):")
+    print(f"{'':>22} {'p50':>9} {'p99':>9} {'max':>9}")
+    for label, lat in [('write to store', direct), ('sighting queue', queued)]:
+        print(f"{label:>22} {np.percentile(lat, 50) * 1000:7.2f}ms {np.percentile(lat, 99) * 1000:7.2f}ms "
+              f"{lat.max() * 1000:7.2f}ms")
+    print(f"all stored once after {drained:.2f}s, in {queue.status()['version']} batches")
+
+
+def child(mode, n, tag, backend, flush_secs):
+    # Submits n sightings, printing each index once submit() has returned (= acknowledged)
+    acks, sys.stdout = sys.stdout, sys.stderr   # anything else the app prints goes to stderr
+    if mode == 'after-commit':
+        store = storage.get_store(backend)
+        add_sightings, calls = store.add_sightings, []
+
+        def add_then_die(rows):
+            add_sightings(rows)
+            calls.append(len(rows))
+            if len(calls) == 2:
+                os._exit(9)   # batch committed, "done" never journalled
+        store.add_sightings = add_then_die
+    queue = sighting_queue.SightingQueue(store=lambda: storage.get_store(backend), journal_file='crash.jsonl',
+                                         flush_secs=flush_secs)
+    for i in range(n):
+        queue.submit(*sighting(i, tag))
+        print(i, file=acks, flush=True)
+        time.sleep(random.uniform(0, 0.002))
+    while queue.status()['queued']:
+        time.sleep(0.01)
+    os._exit(0)
+
+
+def crash_round(args, round_no, mode):
+    n, tag = args.crash_submissions, f"crash{round_no}"
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child', mode, str(n), tag,
+                             '--backend', args.backend, '--flush-secs', '0.02'],
+                            stdout=subprocess.PIPE, text=True)
+    kill_at = random.Random(round_no).randint(n // 4, n - 1)
+    acked = set()
+    for line in proc.stdout:
+        acked.add(int(line))
+        if mode == 'kill' and len(acked) >= kill_at:
+            proc.send_signal(signal.SIGKILL)
+            break
+    proc.wait()
+    acked |= {int(line) for line in proc.stdout.read().split()}
+
+    store = fresh_store(args.backend)
+    queue = sighting_queue.SightingQueue(store=lambda: store, journal_file='crash.jsonl', flush_secs=0.02)
+    while queue.status()['queued']:
+        time.sleep(0.01)
+    queue.close()
+
+    counts = stored_users(store, tag)
+    stored = {int(user.split('-')[1]) for user in counts.index}
+    lost = {i for i in acked if i not in stored}
+    print(f"{round_no:>5} {mode:>13} {len(acked):>6} {len(stored):>7} {len(lost):>5} {int((counts > 1).sum()):>11}")
+    assert not lost, f"acknowledged sightings lost: {sorted(lost)[:10]}"
+    assert (counts == 1).all(), "duplicated sightings"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["sqlite", "csv", "parquet"], default=storage.STORAGE_BACKEND)
+    parser.add_argument("--rows", type=int, default=100_000, help="sightings history before the test")
+    parser.add_argument("--burst", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--flush-secs", type=float, default=sighting_queue.FLUSH_SECS)
+    parser.add_argument("--crashes", type=int, default=5)
+    parser.add_argument("--crash-submissions", type=int, default=300)
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child[0], int(args.child[1]), args.child[2], args.backend, args.flush_secs)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        write_sightings_csv(hotspots.SIGHTINGS_FILE, args.rows, n_sites=2000)
+        sys.stdout = open(os.devnull, 'w')   # the stores' rebuild messages
+        fresh_store(args.backend)
+        sys.stdout = sys.__stdout__
+        burst(args)
+
+        print(f"\ncrash/restart, {args.crash_submissions} submissions per round:")
+        print(f"{'round':>5} {'killed':>13} {'acked':>6} {'stored':>7} {'lost':>5} {'duplicated':>11}")
+        for round_no in range(args.crashes):
+            crash_round(args, round_no, 'after-commit' if round_no == 0 else 'kill')
+        os.chdir(cwd)
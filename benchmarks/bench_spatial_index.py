@@ -0,0 +1,75 @@
+# Benchmark: "hotspots near me" queries through spatial_index.HotspotIndex vs a brute-force
+# pandas scan (haversine over every row of the hotspot table), with results cross-checked.
+#
+#   python benchmarks/bench_spatial_index.py
+#   python benchmarks/bench_spatial_index.py --sightings 1000000 --queries 500
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import hotspots
+import spatial_index
+from bench_save_sighting import SPECIES, make_sightings
+
+
+def brute_within(df, lat, lon, radius_m, species=None):
+    if species:
+        df = df[df['common_name'] == species]
+    d = spatial_index.haversine_m(lat, lon, df['lat'].to_numpy(), df['lon'].to_numpy())
+    return df.assign(distance_m=d)[d <= radius_m].sort_values('distance_m')
+
+
+def brute_nearest(df, lat, lon, k, species=None):
+    if species:
+        df = df[df['common_name'] == species]
+    d = spatial_index.haversine_m(lat, lon, df['lat'].to_numpy(), df['lon'].to_numpy())
+    return df.assign(distance_m=d).nsmallest(k, 'distance_m')
+
+
+def timed(fn, points):
+    start = time.perf_counter()
+    results = [fn(lat, lon, species) for lat, lon, species in points]
+    return (time.perf_counter() - start) / len(points), results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sightings", type=int, default=1_000_000)
+    parser.add_argument("--sites", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius", type=float, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    sightings = make_sightings(args.sightings, n_sites=args.sites)
+    table = hotspots.verified_hotspots(hotspots.aggregate_sightings(sightings)).reset_index(drop=True)
+
+    start = time.perf_counter()
+    index = spatial_index.HotspotIndex(table)
+    print(f"{args.sightings} sightings -> {len(table)} hotspots, index built in {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(3)
+    points = [(rng.uniform(1.26, 1.44), rng.uniform(103.65, 104.0), rng.choice([None] + SPECIES))
+              for _ in range(args.queries)]
+
+    queries = {
+        f"within {args.radius:.0f}m": (
+            lambda lat, lon, sp: index.within(lat, lon, args.radius, sp),
+            lambda lat, lon, sp: brute_within(table, lat, lon, args.radius, sp),
+        ),
+        f"{args.k} nearest": (
+            lambda lat, lon, sp: index.nearest(lat, lon, args.k, sp),
+            lambda lat, lon, sp: brute_nearest(table, lat, lon, args.k, sp),
+        ),
+    }
+    print(f"{'query':>14} {'index':>10} {'brute force':>12} {'speed-up':>9} {'same result':>12}")
+    for label, (indexed, brute) in queries.items():
+        t_index, r_index = timed(indexed, points)
+        t_brute, r_brute = timed(brute, points)
+        same = all(np.allclose(a['distance_m'].to_numpy(), b['distance_m'].to_numpy())
+                   for a, b in zip(r_index, r_brute))
+        print(f"{label:>14} {t_index * 1000:8.3f}ms {t_brute * 1000:10.3f}ms {t_brute / t_index:8.1f}x {str(same):>12}")
@@ -0,0 +1,155 @@
+# Benchmark + check for species_prior.py (location/season priors for BirdNET detections).
+#
+# Identifies --recordings clips, each at its own GPS fix around Singapore and its own
+# date, three ways: no location filter at all (the analysis itself), BirdNET's filter
+# (lat/lon passed to BirdNET: its location model runs again for every new fix) and the
+# cached species priors (one location model run per grid cell and week, then a dict
+# lookup). Reports the per-recording overhead of each filter over the bare analysis.
+# The audio model is the stub from bench_audio_stream; the location model is BirdNET's.
+#
+#   python benchmarks/bench_species_prior.py
+#   python benchmarks/bench_species_prior.py --recordings 200 --rows 1000000
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import audio_processor
+import hotspots
+import species_prior
+import storage
+from bench_audio_stream import StubAnalyzer
+from birdnetlib import RecordingBuffer
+from birdnetlib.analyzer import Analyzer
+from suite import SPECIES_MIX
+from synthetic import SINGAPORE_BBOX, make_clips, write_sightings_csv
+
+
+class FilteringStubAnalyzer(StubAnalyzer):
+    # The stub plus what Analyzer.analyze_recording does first for a recording with lat/lon
+    return_predicted_species_list = Analyzer.return_predicted_species_list
+    set_predicted_species_list_from_position = Analyzer.set_predicted_species_list_from_position
+
+    def __init__(self):
+        self.cached_species_lists = {}
+
+    def analyze_recording(self, recording):
+        if recording.lon and recording.lat:
+            self.set_predicted_species_list_from_position(recording)
+        super().analyze_recording(recording)
+
+
+def birdnet_filter(analyzer, clip, lat, lon, date):
+    # analyze_bird_sound with BirdNET filtering by location itself, as before the priors
+    samples = audio_processor.decode_audio(clip)
+    names = set()
+    for start, end in audio_processor.active_segments(samples):
+        recording = RecordingBuffer(analyzer, samples[start:end], audio_processor.SAMPLE_RATE,
+                                    lat=lat, lon=lon, date=date, min_conf=0.5)
+        recording.analyze()
+        names |= {d['common_name'] for d in recording.detections}
+    return names
+
+
+def per_recording(fn, fixes):
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for fix in fixes:
+            start = time.perf_counter()
+            fn(*fix)
+            times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recordings", type=int, default=100, help="each at its own GPS fix and date")
+    parser.add_argument("--clips", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=200_000, help="sightings history for the local counts")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    south, north, west, east = SINGAPORE_BBOX
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        write_sightings_csv(hotspots.SIGHTINGS_FILE, args.rows, n_sites=2000, species=SPECIES_MIX,
+                            start='2024-01-01', end='2025-12-31')
+        clips = make_clips(os.path.join(tmp, 'clips'), args.clips)
+        fixes = [(clips[i % len(clips)], rng.uniform(south, north), rng.uniform(west, east),
+                  datetime(2025, 1, 1) + timedelta(days=int(rng.integers(0, 365))))
+                 for i in range(args.recordings)]
+
+        plain = StubAnalyzer()
+        filtering = FilteringStubAnalyzer()
+        audio_processor.load_audio_model = lambda: plain
+        with contextlib.redirect_stdout(io.StringIO()):
+            store = storage.get_store()
+            # Load the location model and the audio stack outside the timings
+            birdnet_filter(filtering, clips[0], 1.0, 100.0, datetime(2025, 1, 1))
+
+        def with_priors(clip, lat, lon, date):
+            # identify_bird_sound on a cache miss
+            matches = audio_processor.analyze_bird_sound(clip)
+            return audio_processor.get_priors().rerank(matches, lat, lon, date)
+
+        bare = per_recording(lambda clip, *_: audio_processor.analyze_bird_sound(clip), fixes)
+        birdnet = per_recording(lambda *fix: birdnet_filter(filtering, *fix), fixes)
+        cold = per_recording(with_priors, fixes)
+        warm = per_recording(with_priors, fixes)
+        priors = audio_processor.get_priors()
+        cells = {species_prior.cell_of(lat, lon) for _, lat, lon, _ in fixes}
+
+        print(f"{args.recordings} recordings at distinct GPS fixes, {len(cells)} prior cells, "
+              f"{args.rows:,} sightings of history")
+        print(f"{'':>28} {'p50':>9} {'mean':>9} {'overhead':>9}")
+        for label, times in [('no location filter', bare), ('BirdNET filter per fix', birdnet),
+                             ('species priors (cold)', cold), ('species priors (warm)', warm)]:
+            print(f"{label:>28} {np.median(times):7.1f}ms {times.mean():7.1f}ms "
+                  f"{times.mean() - bare.mean():+7.1f}ms")
+
+        # Same filtering as BirdNET: nothing kept that its location list rules out, unless
+        # it was actually sighted in that cell in that season
+        for clip, lat, lon, date in fixes[:20]:
+            with contextlib.redirect_stdout(io.StringIO()):
+                allowed = birdnet_filter(filtering, clip, lat, lon, date)
+                kept = {m['name'] for m in with_priors(clip, lat, lon, date)}
+            cell, week = species_prior.cell_of(lat, lon), species_prior.week_48(date)
+            assert kept - allowed <= priors.local_shares(cell, week).keys(), (kept, allowed)
+
+        # Re-ranking: equal confidence, the species seen more often here comes first
+        lat, lon, date = 1.35, 103.82, datetime(2025, 3, 1)
+        local = priors.local_shares(species_prior.cell_of(lat, lon), species_prior.week_48(date))
+        common, rare = max(local, key=local.get), min(local, key=local.get)
+        ranked = priors.rerank([{'name': rare, 'score': 80.0}, {'name': common, 'score': 80.0}], lat, lon, date)
+        assert [m['name'] for m in ranked] == [common, rare], ranked
+        print(f"\nequal confidence: {ranked[0]['name']} (prior {ranked[0]['prior']}%) ranked above "
+              f"{ranked[1]['name']} (prior {ranked[1]['prior']}%)")
+
+        # A new sighting reaches the local counts without re-reading the store
+        before = priors.local_counts(species_prior.cell_of(lat, lon))[1].sum()
+        store.add_sighting(date.strftime("%d/%m/%Y"), "08:00:00", lat, lon, "Oriental Magpie-Robin", "bench")
+        assert priors.local_counts(species_prior.cell_of(lat, lon))[1].sum() == before + 1
+        assert 'Oriental Magpie-Robin' in priors.prior(lat, lon, date)
+
+        # Saved priors are reused by a new process without running the location model
+        def no_model():
+            raise AssertionError("location model ran for a saved cell")
+        reloaded = species_prior.SpeciesPriors(no_model, audio_processor.MODEL_VERSION)
+        [reloaded.location_prior(species_prior.cell_of(lat, lon), species_prior.week_48(date))
+         for _, lat, lon, date in fixes]
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            count = species_prior.SpeciesPriors(lambda: plain.species_class, audio_processor.MODEL_VERSION,
+                                                prior_file='precomputed.pkl').precompute()
+        print(f"precomputed {count} Singapore cell/weeks in {time.perf_counter() - start:.1f}s "
+              f"({os.path.getsize('precomputed.pkl') / 1024:.0f}KB)")
+        os.chdir(cwd)
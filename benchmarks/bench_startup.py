@@ -0,0 +1,117 @@
+# Benchmark: Identify page start-up, eager (the old page: import both model stacks and load
+# both models under a spinner before drawing anything) vs lazy (model_loader: background
+# warm-up, per-tab loading). Each mode runs in a fresh process so imports are cold.
+#
+# Imports are real (transformers, birdnetlib, ...); the model weight loading itself is
+# replaced by stubs that sleep for --image-load / --audio-load seconds, so it runs offline.
+#
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --image-load 5 --audio-load 8 --runs 3
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+LOAD_SECS = {'image': 2.0, 'audio': 4.0}
+
+# The page as it was before lazy loading. Image stack first: see model_loader.MODELS.
+EAGER_PAGE = """
+import streamlit as st
+import utils
+import image_processor
+import audio_processor
+import bench_startup
+
+st.set_page_config(page_title="Identify Species", page_icon="🔍")
+with st.spinner("Loading AI Models..."):
+    bench_startup.stub_audio_model()
+    bench_startup.stub_image_model()
+st.title("🔍 Identify Species")
+tab1, tab2 = st.tabs(["📸 Visual Scanner", "🎙️ Audio Scanner"])
+"""
+
+
+def stub_image_model():
+    import image_processor  # the real import cost
+    time.sleep(LOAD_SECS['image'])
+    return image_processor
+
+
+def stub_audio_model():
+    import audio_processor
+    time.sleep(LOAD_SECS['audio'])
+    return audio_processor
+
+
+def child(mode):
+    from streamlit.testing.v1 import AppTest
+    import bench_startup  # the pages import the stubs from here, not from __main__
+    bench_startup.LOAD_SECS.update(LOAD_SECS)
+
+    start = time.perf_counter()
+    if mode == 'eager':
+        import utils, image_processor, audio_processor
+    else:
+        import utils, model_loader
+        model_loader.MODELS.update(image=('bench_startup', 'stub_image_model'),
+                                   audio=('bench_startup', 'stub_audio_model'))
+    import_s = time.perf_counter() - start
+
+    if mode == 'eager':
+        app = AppTest.from_string(EAGER_PAGE, default_timeout=120)
+    else:
+        app = AppTest.from_file(os.path.join(ROOT, 'pages', '1_Identify.py'), default_timeout=120)
+    app.session_state['logged_in'] = True
+    app.session_state['user'] = 'bench'
+    start = time.perf_counter()
+    app.run()
+    render_s = time.perf_counter() - start
+    assert not app.exception, app.exception
+    assert app.title[0].value == "🔍 Identify Species"
+
+    ready_s = render_s
+    if mode == 'lazy':
+        while not all(model_loader.is_ready(n) for n in model_loader.MODELS):
+            time.sleep(0.01)
+        ready_s = time.perf_counter() - start
+    print(json.dumps({'import_s': import_s, 'render_s': render_s, 'ready_s': ready_s}))
+
+
+def run_child(mode, args):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.path.dirname(os.path.abspath(__file__))]))
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', mode,
+           '--image-load', str(args.image_load), '--audio-load', str(args.audio_load)]
+    out = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+    if out.returncode:
+        sys.exit(f"{mode} run failed:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image-load", type=float, default=LOAD_SECS['image'])
+    parser.add_argument("--audio-load", type=float, default=LOAD_SECS['audio'])
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--child", choices=['eager', 'lazy'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    LOAD_SECS.update(image=args.image_load, audio=args.audio_load)
+
+    if args.child:
+        child(args.child)
+        sys.exit()
+
+    print(f"stub model loads: image {args.image_load}s, audio {args.audio_load}s\n")
+    # first render / models ready are counted from process start, i.e. including the imports
+    print(f"{'mode':>6} {'page imports':>13} {'script run':>11} {'first render':>13} {'models ready':>13}")
+    for mode in ('eager', 'lazy'):
+        runs = [run_child(mode, args) for _ in range(args.runs)]
+        median = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+        print(f"{mode:>6} {median['import_s']:12.2f}s {median['render_s']:10.2f}s "
+              f"{median['import_s'] + median['render_s']:12.2f}s {median['import_s'] + median['ready_s']:12.2f}s")
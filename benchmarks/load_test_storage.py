@@ -0,0 +1,81 @@
+# Load test: many concurrent writers saving sightings through storage.get_store().
+#
+# Every writer is a separate process (like separate Streamlit servers sharing one data
+# directory). Afterwards the ids are checked for gaps/duplicates, the hotspot counts are
+# checked against a full rebuild, and write throughput is reported.
+#
+#   python benchmarks/load_test_storage.py --backend sqlite --writers 16 --writes 200
+#   python benchmarks/load_test_storage.py --backend csv
+#   python benchmarks/load_test_storage.py --backend parquet
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+
+SPECIES = ["Red Junglefowl", "Common Myna", "Asian Koel", "Javan Myna", "Asian Glossy Starling"]
+
+
+def writer(args):
+    backend, n_writes, seed, barrier = args
+    rng = np.random.default_rng(seed)
+    store = storage.get_store(backend)
+
+    # Release every writer at the same instant to maximise contention
+    barrier.wait()
+    started = time.time()
+
+    ids = []
+    for _ in range(n_writes):
+        ids.append(store.add_sighting(
+            "01/01/2025", "08:00:00", 1.35 + rng.normal(0, 0.002), 103.82 + rng.normal(0, 0.002),
+            SPECIES[rng.integers(len(SPECIES))], f"writer{seed}",
+        ))
+    return ids, started, time.time()
+
+
+def run(backend, n_writers, n_writes):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        ctx = mp.get_context("spawn")
+        with ctx.Manager() as manager, ctx.Pool(n_writers, initializer=os.chdir, initargs=(tmp,)) as pool:
+            barrier = manager.Barrier(n_writers)
+            jobs = [(backend, n_writes, seed, barrier) for seed in range(n_writers)]
+            results = pool.map(writer, jobs, chunksize=1)
+        elapsed = max(r[2] for r in results) - min(r[1] for r in results)
+
+        # --- VERIFY ---
+        store = storage.get_store(backend)
+        returned = [i for ids, _, _ in results for i in ids]
+        stored = store.load_sightings()['id'].tolist()
+        incremental = store.load_hotspots()
+        store.rebuild_hotspots()
+        rebuilt = store.load_hotspots()
+        os.chdir(cwd)
+
+    expected = n_writers * n_writes
+    print(f"backend={backend} writers={n_writers} writes/writer={n_writes}")
+    print(f"   rows stored:        {len(stored)} / {expected}")
+    print(f"   duplicate ids:      {len(returned) - len(set(returned))} returned, {len(stored) - len(set(stored))} stored")
+    print(f"   ids contiguous:     {sorted(stored) == list(range(1, expected + 1))}")
+    print(f"   hotspots match rebuild: {incremental.equals(rebuilt)}")
+    print(f"   throughput:         {expected / elapsed:.0f} writes/sec ({elapsed:.2f}s)")
+    return len(stored) == expected and len(set(stored)) == expected and incremental.equals(rebuilt)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["sqlite", "csv", "parquet"], default="sqlite")
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=200)
+    args = parser.parse_args()
+
+    ok = run(args.backend, args.writers, args.writes)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,262 @@
+# End-to-end benchmark suite: hotspot pipeline rebuild, sighting save, map build and
+# image/audio inference throughput on synthetic data (benchmarks/synthetic.py) with
+# stand-in models. Results go to a JSON file per commit; --compare checks them against
+# an earlier run and exits non-zero when a metric got worse by more than --threshold.
+#
+#   python benchmarks/suite.py                               # -> benchmarks/results/<commit>.json
+#   python benchmarks/suite.py --rows 5000000 --cases rebuild save
+#   python benchmarks/suite.py --compare benchmarks/results/<base>.json --threshold 0.25
+#   python benchmarks/suite.py --compare old.json --against new.json   # compare only, no run
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+import synthetic
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+SPECIES_MIX = {"Javan Myna": 40, "Asian Glossy Starling": 25, "Common Myna": 15, "Asian Koel": 12,
+               "Red Junglefowl": 8}
+
+
+def metric(value, unit, better='lower'):
+    return {'value': float(value), 'unit': unit, 'better': better}
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+@contextlib.contextmanager
+def workdir():
+    # Each case runs in its own scratch directory (the app uses relative data paths)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            yield tmp
+        finally:
+            os.chdir(cwd)
+
+
+def fresh_stores():
+    import hotspots
+    import storage
+    hotspots._engines.clear()
+    storage._stores.clear()
+    return {'csv': storage.CsvStore(), 'sqlite': storage.SqliteStore()}
+
+
+# --- 1. CASES ---
+def bench_rebuild(args):
+    # utils.update_hotspots (full recount) on a history of args.rows sightings, per backend
+    import storage
+    import utils
+
+    results = {}
+    with workdir():
+        synthetic.write_sightings_csv('sightings.csv', args.rows, n_sites=args.sites, species=SPECIES_MIX,
+                                      start='2019-01-01', end='2025-12-31')
+        with contextlib.redirect_stdout(io.StringIO()):
+            stores = fresh_stores()
+            import_s, _ = timed(stores['sqlite'].import_csv)
+            for backend, store in stores.items():
+                storage._stores[backend] = store
+                storage.STORAGE_BACKEND = backend
+                elapsed, ok = timed(utils.update_hotspots)
+                assert ok, f"update_hotspots failed on {backend}"
+                results[f'update_hotspots_{backend}_s'] = metric(elapsed, 's')
+        results['sqlite_import_s'] = metric(import_s, 's')
+    return results
+
+
+def bench_save(args):
+    # Latency of one saved sighting with args.rows already in the history
+    results = {}
+    rng = np.random.default_rng(1)
+    with workdir():
+        synthetic.write_sightings_csv('sightings.csv', args.rows, n_sites=args.sites, species=SPECIES_MIX)
+        with contextlib.redirect_stdout(io.StringIO()):
+            stores = fresh_stores()
+            stores['sqlite'].import_csv()
+        for backend, store in stores.items():
+            latencies = []
+            for _ in range(args.saves):
+                lat, lon = 1.3 + rng.normal(0, 0.01), 103.8 + rng.normal(0, 0.01)
+                start = time.perf_counter()
+                store.add_sighting("01/01/2025", "08:00:00", lat, lon, rng.choice(synthetic.SPECIES), "bench")
+                latencies.append(time.perf_counter() - start)
+            results[f'save_{backend}_p50_ms'] = metric(np.percentile(latencies, 50) * 1000, 'ms')
+            results[f'save_{backend}_p99_ms'] = metric(np.percentile(latencies, 99) * 1000, 'ms')
+    return results
+
+
+def bench_map(args):
+    # home.py's map step: pick the pyramid level for the zoom, query the viewport, build + render
+    import hotspot_pyramid
+    import map_view
+
+    results = {}
+    sightings = synthetic.make_sightings(args.rows, n_sites=args.sites, species=SPECIES_MIX)
+    build_s, pyramid = timed(lambda: hotspot_pyramid.HotspotPyramid(sightings))
+    results['pyramid_build_s'] = metric(build_s, 's')
+    center = [1.3521, 103.8198]
+    for zoom in (12, 15, 18):
+        times = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            level = map_view.level_for_zoom(zoom, pyramid.levels)
+            df = pyramid.query(level, map_view.render_bounds(center, zoom))
+            m, _ = map_view.build_map(df, center, zoom)
+            html = m.get_root().render()
+            times.append(time.perf_counter() - start)
+        results[f'map_zoom{zoom}_ms'] = metric(np.median(times) * 1000, 'ms')
+        results[f'map_zoom{zoom}_kb'] = metric(len(html.encode()) / 1024, 'KB')
+    return results
+
+
+def bench_inference(args):
+    # Image/audio identification with stand-in models: batch throughput, single-request
+    # latency (cache miss) and a repeated request (cache hit)
+    synthetic.install_stub_models()
+    import audio_processor
+    import image_processor
+    import inference_cache
+
+    results = {}
+    with workdir() as tmp:
+        photos = synthetic.make_photos(os.path.join(tmp, 'photos'), args.images, size=(640, 480))
+        clips = synthetic.make_clips(os.path.join(tmp, 'clips'), args.clips)
+        inference_cache._cache = inference_cache.InferenceCache()
+
+        elapsed, _ = timed(lambda: list(image_processor.identify_bird_images(photos, batch_size=16)))
+        results['image_batch_per_s'] = metric(len(photos) / elapsed, 'images/s', 'higher')
+        miss = [timed(lambda: image_processor.identify_bird_image(p))[0] for p in photos[:args.clips]]
+        hit = [timed(lambda: image_processor.identify_bird_image(p))[0] for p in photos[:args.clips]]
+        results['image_identify_ms'] = metric(np.median(miss) * 1000, 'ms')
+        results['image_identify_cached_ms'] = metric(np.median(hit) * 1000, 'ms')
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            miss = [timed(lambda: audio_processor.identify_bird_sound(c))[0] for c in clips]
+            hit = [timed(lambda: audio_processor.identify_bird_sound(c))[0] for c in clips]
+            recording = os.path.join(tmp, 'long.wav')
+            from bench_audio_stream import make_recording
+            make_recording(recording, args.audio_minutes / 60)
+            elapsed, _ = timed(lambda: list(audio_processor.stream_bird_sound(recording)))
+        results['audio_identify_ms'] = metric(np.median(miss) * 1000, 'ms')
+        results['audio_identify_cached_ms'] = metric(np.median(hit) * 1000, 'ms')
+        results['audio_stream_x_realtime'] = metric(args.audio_minutes * 60 / elapsed, 'x', 'higher')
+    return results
+
+
+# Inference first: its model stacks have to be imported before anything pulls in TensorFlow
+CASES = {'inference': bench_inference, 'rebuild': bench_rebuild, 'save': bench_save, 'map': bench_map}
+
+
+# --- 2. RESULTS ---
+def git_commit():
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return sha, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def compare(baseline, current, threshold):
+    """
+    Prints every metric the two runs share and returns the regressions: metrics that got
+    worse (in their 'better' direction) by more than `threshold` (0.2 = 20%).
+    """
+    regressions = []
+    print(f"\n{'metric':>36} {'baseline':>12} {'current':>12} {'change':>8}")
+    for case, metrics in current['results'].items():
+        for name, new in metrics.items():
+            old = baseline.get('results', {}).get(case, {}).get(name)
+            if old is None or old['value'] == 0:
+                continue
+            change = new['value'] / old['value'] - 1
+            worse = change if new['better'] == 'lower' else -change
+            flag = "  REGRESSION" if worse > threshold else ""
+            print(f"{case + '.' + name:>36} {old['value']:12.3f} {new['value']:12.3f} {change:+7.0%}{flag}")
+            if flag:
+                regressions.append((case, name, change))
+    return regressions
+
+
+def run(args):
+    sha, dirty = git_commit()
+    report = {
+        'commit': sha, 'dirty': dirty, 'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+        'args': {k: v for k, v in vars(args).items() if k not in ('compare', 'against', 'output')},
+        'results': {},
+    }
+    for name, case in CASES.items():
+        if name not in args.cases:
+            continue
+        print(f"▶ {name}...", flush=True)
+        elapsed, results = timed(lambda: case(args))
+        report['results'][name] = results
+        for metric_name, m in results.items():
+            print(f"   {metric_name:<28} {m['value']:12.3f} {m['unit']}")
+        print(f"   ({elapsed:.1f}s)")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TerraNova end-to-end benchmarks.")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--rows", type=int, default=500_000, help="sightings in the synthetic history")
+    parser.add_argument("--sites", type=int, default=5000)
+    parser.add_argument("--saves", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5, help="map builds per zoom")
+    parser.add_argument("--images", type=int, default=48)
+    parser.add_argument("--clips", type=int, default=8)
+    parser.add_argument("--audio-minutes", type=float, default=5)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="baseline results file to check against")
+    parser.add_argument("--against", help="with --compare: compare this results file instead of running")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.against:
+        with open(args.against) as f:
+            report = json.load(f)
+    else:
+        warnings.filterwarnings("ignore")
+        logging.disable(logging.WARNING)
+        report = run(args)
+        output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}{'-dirty' if report['dirty'] else ''}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"\n✅ Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} metric(s) regressed by more than {args.threshold:.0%} "
+                  f"vs {baseline.get('commit', args.compare)}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%} vs {baseline.get('commit', args.compare)}")
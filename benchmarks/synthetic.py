@@ -0,0 +1,114 @@
+# Synthetic inputs shared by the benchmarks: sightings histories (sightings.csv layout),
+# photos, WAV clips and stand-in models, so everything runs offline and reproducibly.
+#
+#   from synthetic import make_sightings, write_sightings_csv, make_clips, install_stub_models
+import os
+
+import numpy as np
+import pandas as pd
+
+SINGAPORE_BBOX = (1.24, 1.46, 103.62, 104.02)   # south, north, west, east
+SPECIES = ["Red Junglefowl", "Common Myna", "Asian Koel", "Javan Myna", "Asian Glossy Starling"]
+SITE_SPREAD_DEG = 0.0004                         # scatter of sightings around their site (~45m)
+
+
+# --- 1. SIGHTINGS ---
+def make_sightings(n_rows, n_sites=2000, seed=0, species=None, start=None, end=None,
+                   bbox=SINGAPORE_BBOX, part=0, first_id=1):
+    """
+    Sightings clustered around a fixed set of sites (parks, hawker centres) inside bbox,
+    so the number of grid squares stays realistic while the history keeps growing.
+
+    species: None (uniform over SPECIES), a list of names, or {name: weight}.
+    start/end: date range ("2020-01-01") for date_observed/time_observed (morning-heavy
+    times); without them every sighting is 01/01/2024 08:00:00.
+    part: chunk number when writing a large history in pieces; sites stay the same.
+    """
+    rng = np.random.default_rng(seed)
+    south, north, west, east = bbox
+    site_lat = rng.uniform(south, north, n_sites)
+    site_lon = rng.uniform(west, east, n_sites)
+    if part:
+        rng = np.random.default_rng([seed, part])
+    site = rng.integers(0, n_sites, n_rows)
+    lat = site_lat[site] + rng.normal(0, SITE_SPREAD_DEG, n_rows)
+    lon = site_lon[site] + rng.normal(0, SITE_SPREAD_DEG, n_rows)
+
+    if species is None:
+        names = rng.choice(SPECIES, n_rows)
+    elif isinstance(species, dict):
+        weights = np.array(list(species.values()), dtype=float)
+        names = rng.choice(list(species), n_rows, p=weights / weights.sum())
+    else:
+        names = rng.choice(list(species), n_rows)
+
+    date, time = '01/01/2024', '08:00:00'
+    if start is not None:
+        first, last = pd.Timestamp(start), pd.Timestamp(end or start)
+        days = rng.integers(0, (last - first).days + 1, n_rows)
+        date = (first + pd.to_timedelta(days, unit='D')).strftime('%d/%m/%Y')
+        seconds = np.clip(rng.normal(9.5 * 3600, 3 * 3600, n_rows), 0, 86399).astype(int)
+        time = pd.to_datetime(seconds, unit='s').strftime('%H:%M:%S')
+
+    return pd.DataFrame({
+        'id': np.arange(first_id, first_id + n_rows),
+        'date_observed': date,
+        'time_observed': time,
+        'latitude': lat,
+        'longitude': lon,
+        'common_name': names,
+        'username': 'bench',
+    })
+
+
+def write_sightings_csv(path, n_rows, chunk_rows=1_000_000, **kwargs):
+    # Millions of rows without holding them all in memory: written in chunks sharing sites
+    for part, first in enumerate(range(0, n_rows, chunk_rows)):
+        chunk = make_sightings(min(chunk_rows, n_rows - first), part=part, first_id=first + 1, **kwargs)
+        chunk.to_csv(path, mode='a' if part else 'w', header=not part, index=False)
+    return path
+
+
+# --- 2. MEDIA ---
+def make_photos(directory, n_images, size=(1024, 768), seed=0):
+    # Same photos as bench_image_batch (one folder per classifier label)
+    from bench_image_batch import make_photos
+    return make_photos(directory, n_images, size, seed)
+
+
+def make_clips(directory, n_clips, seconds=10, rate=48000, seed=0):
+    # Short noisy WAV clips with one 1-3 kHz tone "call" each, like a phone recording
+    import soundfile as sf
+    from bench_audio_stream import SPECIES_TONES
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    t = np.arange(int(seconds * rate)) / rate
+    paths = []
+    for i in range(n_clips):
+        samples = rng.normal(0, 0.01, len(t)).astype(np.float32)
+        start, length = int(rng.uniform(0, seconds / 2) * rate), int(rng.uniform(2, seconds / 2) * rate)
+        tone = rng.choice(list(SPECIES_TONES))
+        samples[start:start + length] += 0.3 * np.sin(2 * np.pi * tone * t[:length])
+        path = os.path.join(directory, f"clip_{i}.wav")
+        sf.write(path, samples, rate, subtype='PCM_16')
+        paths.append(path)
+    return paths
+
+
+# --- 3. STAND-IN MODELS ---
+def install_stub_models(image_size=224, hidden_size=192, num_layers=12):
+    """
+    Routes image_processor/audio_processor (and so model_loader and the pages) to a
+    randomly initialised ViT and the stub BirdNET analyzer. Returns (pipe, analyzer).
+    """
+    import image_processor
+    from bench_image_batch import tiny_pipeline
+    import audio_processor
+    from bench_audio_stream import StubAnalyzer
+
+    pipe = tiny_pipeline(image_size=image_size, hidden_size=hidden_size, num_layers=num_layers)
+    analyzer = StubAnalyzer()
+    image_processor.load_image_model = lambda: pipe
+    audio_processor.load_audio_model = lambda: analyzer
+    return pipe, analyzer
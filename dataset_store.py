@@ -0,0 +1,232 @@
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from image_io import decode_images, find_images
+
+# Build step after image_scrape.py: drops duplicate photos (perceptual hash), resizes
+# the rest to the classifier's input size once and packs them into .npy shards that
+# training/evaluation loaders memory-map instead of re-decoding JPEGs every epoch.
+#
+#   store/
+#     classes.json          label names (the image_scrape.py folder names), by label id
+#     index.csv             row, shard, offset, label, species, phash, source
+#     images-00000.npy      uint8 (n, size, size, 3), one file per shard
+
+IMAGE_SIZE = 224      # ViT input size of zhiquanchng/singapore-bird-classifier
+HASH_THRESHOLD = 3    # max differing bits (of 64) for two photos to count as the same
+SHARD_SIZE = 5000
+INDEX_FILE = 'index.csv'
+CLASSES_FILE = 'classes.json'
+INDEX_COLUMNS = ['row', 'shard', 'offset', 'label', 'species', 'phash', 'source']
+
+
+# --- 1. PERCEPTUAL HASH ---
+def dhash(img):
+    # 64-bit difference hash: is each pixel brighter than its right-hand neighbour on a
+    # 9x8 greyscale thumbnail. Survives re-encoding, resizing and small crops.
+    pixels = np.asarray(img.convert('L').resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def hash_file(path):
+    img = Image.open(path)
+    img.draft('L', (64, 64))  # the hash only needs a thumbnail, so decode as little as possible
+    return dhash(img)
+
+
+class HashIndex:
+    """
+    Near-duplicate lookup. Splits each hash into threshold+1 bands: two hashes within
+    `threshold` bits must agree exactly on at least one band (pigeonhole), so only
+    those candidates need a full comparison.
+    """
+
+    def __init__(self, threshold=HASH_THRESHOLD):
+        self.threshold = threshold
+        self.bands = threshold + 1
+        self.band_bits = 64 // self.bands
+        self.buckets = [{} for _ in range(self.bands)]
+
+    def keys(self, h):
+        mask = (1 << self.band_bits) - 1
+        return [(h >> (i * self.band_bits)) & mask for i in range(self.bands)]
+
+    def find(self, h):
+        matches = {}
+        for bucket, key in zip(self.buckets, self.keys(h)):
+            for other, value in bucket.get(key, ()):
+                if bin(h ^ other).count('1') <= self.threshold:
+                    matches[other] = value
+        return list(matches.values())
+
+    def add(self, h, value):
+        for bucket, key in zip(self.buckets, self.keys(h)):
+            bucket.setdefault(key, []).append((h, value))
+
+
+# --- 2. BUILD ---
+def read_index(store_dir):
+    path = os.path.join(store_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+def select_images(paths, rows, threshold=HASH_THRESHOLD, num_workers=4):
+    """
+    Decides which of `paths` to pack. A photo is dropped if it is a near-duplicate of
+    one already in the store or earlier in this run. When copies carry different
+    species labels the label is ambiguous, so every new copy is dropped.
+    Returns (kept [(path, species, hash)], stats).
+    """
+    hashes = HashIndex(threshold)
+    for row in rows:
+        hashes.add(int(row['phash']), row['species'])
+
+    stats = {'duplicates': 0, 'conflicts': 0, 'unreadable': 0}
+    kept = {}
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        for (path, species), h in zip(paths, pool.map(lambda p: safe_hash(p[0]), paths)):
+            if h is None:
+                stats['unreadable'] += 1
+                continue
+            matches = hashes.find(h)
+            if any(m != species for m in matches):
+                stats['conflicts'] += 1
+                # Pull earlier copies from this run too; ones already packed stay
+                for other in [p for p, (s, oh) in kept.items() if s != species and bin(h ^ oh).count('1') <= threshold]:
+                    del kept[other]
+                    stats['conflicts'] += 1
+            elif matches:
+                stats['duplicates'] += 1
+            else:
+                kept[path] = (species, h)
+            hashes.add(h, species)
+    return [(path, species, h) for path, (species, h) in kept.items()], stats
+
+def safe_hash(path):
+    try:
+        return hash_file(path)
+    except Exception as e:
+        print(f"   Skipped {path}: {e}")
+        return None
+
+def build_store(dataset_dir, store_dir, size=IMAGE_SIZE, threshold=HASH_THRESHOLD, num_workers=4,
+                shard_size=SHARD_SIZE):
+    """
+    Packs every new photo under dataset_dir (one sub-folder per species) into store_dir.
+    Re-running after another scrape only appends new, non-duplicate photos as new
+    shards; existing shards are never rewritten.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    rows = read_index(store_dir)
+    packed = {row['source'] for row in rows}
+
+    classes_path = os.path.join(store_dir, CLASSES_FILE)
+    classes = []
+    if os.path.exists(classes_path):
+        with open(classes_path) as f:
+            classes = json.load(f)
+    paths = [(p, os.path.basename(os.path.dirname(p))) for p in find_images(dataset_dir)]
+    paths = [(p, s) for p, s in paths if os.path.relpath(p, dataset_dir) not in packed]
+    for species in sorted({s for _, s in paths} - set(classes)):
+        classes.append(species)
+    label_of = {species: i for i, species in enumerate(classes)}
+
+    kept, stats = select_images(paths, rows, threshold, num_workers)
+    print(f"🔍 {len(paths)} new photos: {len(kept)} to pack, {stats['duplicates']} duplicates, "
+          f"{stats['conflicts']} with conflicting labels, {stats['unreadable']} unreadable.")
+
+    shard = 1 + max([int(row['shard']) for row in rows], default=-1)
+    new_rows = []
+    for start in range(0, len(kept), shard_size):
+        chunk = kept[start:start + shard_size]
+        images = np.lib.format.open_memmap(os.path.join(store_dir, f"images-{shard:05d}.npy"), mode='w+',
+                                           dtype=np.uint8, shape=(len(chunk), size, size, 3))
+        # decode_images yields None for files that fail now but hashed fine before; those
+        # rows stay black and are left out of the index
+        for offset, img in enumerate(decode_images([p for p, _, _ in chunk], (size, size), num_workers)):
+            if img is None:
+                continue
+            images[offset] = np.asarray(img)
+            path, species, h = chunk[offset]
+            new_rows.append({'row': len(rows) + len(new_rows), 'shard': shard, 'offset': offset,
+                             'label': label_of[species], 'species': species, 'phash': h,
+                             'source': os.path.relpath(path, dataset_dir)})
+        images.flush()
+        del images
+        print(f"   Packed shard {shard} ({len(chunk)} images)")
+        shard += 1
+
+    # Index last, so an interrupted build leaves the previous store readable
+    with open(classes_path, 'w') as f:
+        json.dump(classes, f, indent=1)
+    with open(os.path.join(store_dir, INDEX_FILE), 'a' if rows else 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=INDEX_COLUMNS)
+        if not rows:
+            writer.writeheader()
+        writer.writerows(new_rows)
+
+    return {'packed': len(new_rows), 'total': len(rows) + len(new_rows), **stats}
+
+
+# --- 3. LOAD ---
+class PackedDataset:
+    """
+    Read-only view of a packed store. Images come straight out of the memory-mapped
+    shards (no decode, no copy until you ask for one): dataset[i] -> (uint8 HxWx3, label).
+    """
+
+    def __init__(self, store_dir):
+        with open(os.path.join(store_dir, CLASSES_FILE)) as f:
+            self.classes = json.load(f)
+        rows = read_index(store_dir)
+        shards = sorted({int(row['shard']) for row in rows})
+        self.images = {s: np.load(os.path.join(store_dir, f"images-{s:05d}.npy"), mmap_mode='r') for s in shards}
+        self.shard = np.array([int(row['shard']) for row in rows], dtype=np.int32)
+        self.offset = np.array([int(row['offset']) for row in rows], dtype=np.int64)
+        self.labels = np.array([int(row['label']) for row in rows], dtype=np.int16)
+        self.sources = [row['source'] for row in rows]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, i):
+        return self.images[self.shard[i]][self.offset[i]], int(self.labels[i])
+
+    def batches(self, batch_size=32, shuffle=False, seed=None):
+        # Yields (uint8 images (b, H, W, 3), labels (b,)) batches; convert/normalise per batch
+        order = np.arange(len(self))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(order)
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            shards, offsets = self.shard[rows], self.offset[rows]
+            if (shards == shards[0]).all() and (np.diff(offsets) == 1).all():
+                # In-order rows from one shard: a view of the memmap, no copy
+                images = self.images[shards[0]][offsets[0]:offsets[-1] + 1]
+            else:
+                images = np.stack([self.images[s][o] for s, o in zip(shards, offsets)])
+            yield images, self.labels[rows]
+
+
+# Pack a scraped dataset (run again after scraping more to append):
+#   python dataset_store.py path/to/bird_images_dataset path/to/bird_images_store
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deduplicate and pack bird photos for training.")
+    parser.add_argument("dataset_dir")
+    parser.add_argument("store_dir")
+    parser.add_argument("--size", type=int, default=IMAGE_SIZE)
+    parser.add_argument("--threshold", type=int, default=HASH_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    args = parser.parse_args()
+
+    result = build_store(args.dataset_dir, args.store_dir, args.size, args.threshold, args.workers, args.shard_size)
+    print(f"✅ Packed {result['packed']} images ({result['total']} in the store) into {args.store_dir}")
@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image
+
+# --- CONFIGURATION ---
+# The Field Guide's species entries live in a data file, read once per process (and
+# again only when the file changes). Card images in the grid come from small local
+# thumbnails made by `python field_guide.py thumbnails`; the detail view keeps the
+# full-size image.
+CATALOG_FILE = os.environ.get('TERRANOVA_FIELD_GUIDE', 'field_guide.json')
+THUMBNAIL_DIR = os.environ.get('TERRANOVA_THUMBNAIL_DIR', 'thumbnails')
+THUMBNAIL_WIDTH = 240     # px; a grid card is a third of a phone screen
+THUMBNAIL_QUALITY = 80
+# Wikimedia rejects requests without a descriptive User-Agent
+USER_AGENT = "TerraNova/1.0 (Singapore bird field guide thumbnail builder)"
+
+
+# --- 1. NAMES ---
+def clean_label(label):
+    # Classifier labels ("red_junglefowl") and BirdNET common names ("Red Junglefowl")
+    # both come out in the same title case
+    return label.replace("_", " ").title()
+
+
+def name_key(name):
+    return re.sub(r"\s+", " ", clean_label(str(name))).strip()
+
+
+def slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+# --- 2. CATALOG ---
+@lru_cache(maxsize=4)
+def read_catalog(path, mtime):
+    with open(path, encoding='utf-8') as f:
+        species = json.load(f)
+    return species, {name_key(name): name for name in species}
+
+
+def load_catalog(path=CATALOG_FILE):
+    # (species {name: entry} in display order, {name_key: name}); cached per file version
+    return read_catalog(path, os.path.getmtime(path))
+
+
+def find_species(name, path=CATALOG_FILE):
+    # Catalog name + entry for a classifier label or BirdNET name, or (None, None)
+    species, index = load_catalog(path)
+    match = index.get(name_key(name)) if name else None
+    return (match, species[match]) if match else (None, None)
+
+
+def thumbnail_path(name, thumbnail_dir=THUMBNAIL_DIR):
+    return os.path.join(thumbnail_dir, f"{slug(name)}.jpg")
+
+
+def card_image(name, info, thumbnail_dir=THUMBNAIL_DIR):
+    # Local thumbnail when it has been built, otherwise the full image URL
+    path = thumbnail_path(name, thumbnail_dir)
+    return path if os.path.exists(path) else info['img']
+
+
+# --- 3. THUMBNAIL BUILD ---
+def make_thumbnail(data, output_path, width=THUMBNAIL_WIDTH, quality=THUMBNAIL_QUALITY):
+    img = Image.open(BytesIO(data))
+    img.draft('RGB', (width, width))
+    img = img.convert('RGB')
+    if img.width > width:
+        img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+    tmp_path = output_path + '.part'
+    img.save(tmp_path, 'JPEG', quality=quality, optimize=True)
+    os.replace(tmp_path, output_path)
+
+
+def build_thumbnails(path=CATALOG_FILE, thumbnail_dir=THUMBNAIL_DIR, width=THUMBNAIL_WIDTH,
+                     concurrency=8, session=None, force=False):
+    """
+    Downloads every catalog image once and writes a width-px JPEG thumbnail per species.
+    Species that already have one are skipped unless force=True.
+    Returns {'built', 'skipped', 'failed'}.
+    """
+    from image_scrape import make_session
+
+    species, _ = load_catalog(path)
+    os.makedirs(thumbnail_dir, exist_ok=True)
+    session = session or make_session(concurrency)
+    session.headers.setdefault('User-Agent', USER_AGENT)
+
+    def build(name):
+        output_path = thumbnail_path(name, thumbnail_dir)
+        if os.path.exists(output_path) and not force:
+            return 'skipped'
+        try:
+            response = session.get(species[name]['img'], timeout=30)
+            response.raise_for_status()
+            make_thumbnail(response.content, output_path, width)
+            return 'built'
+        except Exception as e:
+            print(f"   Failed {name}: {e}")
+            return 'failed'
+
+    stats = {'built': 0, 'skipped': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for result in pool.map(build, species):
+            stats[result] += 1
+    return stats
+
+
+# Build the grid thumbnails (re-run after adding species to field_guide.json):
+#   python field_guide.py thumbnails
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Field Guide catalog tools.")
+    parser.add_argument("command", choices=["thumbnails"])
+    parser.add_argument("--catalog", default=CATALOG_FILE)
+    parser.add_argument("--output", default=THUMBNAIL_DIR)
+    parser.add_argument("--width", type=int, default=THUMBNAIL_WIDTH)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--force", action="store_true", help="rebuild existing thumbnails")
+    args = parser.parse_args()
+
+    result = build_thumbnails(args.catalog, args.output, args.width, args.concurrency, force=args.force)
+    print(f"✅ {result['built']} thumbnails built, {result['skipped']} already there, "
+          f"{result['failed']} failed ({args.output})")
@@ -1,17 +1,29 @@
+import calendar
+
 import streamlit as st
 import pandas as pd
-import folium
 from streamlit_folium import st_folium
-from folium.plugins import LocateControl
 from streamlit_js_eval import get_geolocation
 
 # Import our new helper file
 import utils 
+import storage
+import map_view
+import spatial_index
+import activity
+import hotspot_pyramid
+import model_loader
+import metrics
 
 # --- CONFIG ---
 st.set_page_config(page_title="TerraNova", layout="wide", page_icon="🌏")
 utils.make_map_responsive()
 
+# Start loading the Identify page's models while the user logs in / browses the map
+model_loader.start_warmup()
+# Serve /metrics and write the metrics log (only with TERRANOVA_METRICS=1)
+metrics.start()
+
 # --- SESSION STATE ---
 if 'logged_in' not in st.session_state:
     st.session_state['logged_in'] = False
@@ -40,14 +52,20 @@ if not st.session_state['logged_in']:
     st.stop()
 
 # --- MAIN MAP LOGIC ---
-@st.cache_data
-def load_data():
+# Keyed on the data version: every server process reloads once any of them saves a sighting
+@st.cache_data(max_entries=2)
+def load_data(version):
     try:
-        return pd.read_csv('final_hotspots.csv') 
-    except:
+        return storage.get_store().load_hotspots()
+    except Exception as e:
+        metrics.error('load_data', e)
         return pd.DataFrame()
 
-df = load_data()
+# Time filter: only show where birds have been seen at these hours / in these months
+with st.sidebar:
+    st.subheader("🕒 When")
+    hour_range = st.slider("Time of day", 0, 23, (0, 23), format="%d:00")
+    months = st.multiselect("Months", list(range(1, 13)), format_func=lambda m: calendar.month_abbr[m])
 
 # GPS Handling
 loc = get_geolocation()
@@ -57,26 +75,57 @@ if loc:
     user_lat = loc['coords']['latitude']
     user_lon = loc['coords']['longitude']
 
-# Draw Map
-m = folium.Map(location=[user_lat, user_lon], zoom_start=18, tiles="CartoDB dark_matter")
-LocateControl(auto_start=True, strings={"title": "My Location"}, flyTo=True).add_to(m)
+# Nearby First: closest verified hotspots to the user, from the spatial index
+with st.sidebar:
+    st.subheader("📍 Hotspots Near You")
+    try:
+        nearby = spatial_index.get_index().nearest(user_lat, user_lon, k=5, max_radius_m=5000)
+    except Exception as e:
+        print(f"⚠️ Nearby hotspots unavailable: {e}")
+        metrics.error('spatial_index', e)
+        nearby = pd.DataFrame()
+    if nearby.empty:
+        st.caption("No verified hotspots within 5 km.")
+    for spot in nearby.itertuples():
+        st.markdown(f"**{spot.common_name}** · {spot.distance_m:,.0f} m")
+        st.caption(f"{spot.sighting_count} sightings")
 
-if not df.empty:
-    for index, row in df.iterrows():
-        name = str(row['common_name'])
-        # Simple icon logic
-        icon_color = "red" if "Junglefowl" in name else "purple" if "Myna" in name else "green"
-        
-        folium.Circle(
-            [row['lat'], row['lon']], radius=50, color=icon_color, 
-            fill=True, fill_opacity=0.2, weight=1, popup=name
-        ).add_to(m)
-        
-        if row.get('sighting_count', 0) >= 3: 
-            folium.Marker(
-                [row['lat'], row['lon']],
-                icon=folium.Icon(color=icon_color, icon="leaf"),
-                tooltip=f"{name}"
-            ).add_to(m)
+# Draw Map: only the hotspots around the current viewport, clustered when zoomed out
+view = st.session_state.get('map_view')
+if view is None:
+    view = {'center': [user_lat, user_lon], 'zoom': map_view.DEFAULT_ZOOM, 'bounds': None}
+
+# Hotspots at the grid resolution that suits the zoom (time-filtered ones are 110m squares)
+if hour_range != (0, 23) or months:
+    hours = list(range(hour_range[0], hour_range[1] + 1)) if hour_range != (0, 23) else None
+    try:
+        df = activity.get_index().active_hotspots(hours, months or None)
+    except Exception as e:
+        print(f"⚠️ Time-filtered hotspots unavailable: {e}")
+        metrics.error('activity', e)
+        df = pd.DataFrame()
+else:
+    try:
+        pyramid = hotspot_pyramid.get_pyramid()
+        level = map_view.level_for_zoom(view['zoom'], pyramid.levels)
+        df = pyramid.query(level, map_view.render_bounds(view['center'], view['zoom'], view['bounds']))
+    except Exception as e:
+        # Fall back to the flat hotspot table
+        print(f"⚠️ Hotspot pyramid unavailable: {e}")
+        metrics.error('hotspot_pyramid', e)
+        df = load_data(storage.data_version())
+
+m, rendered_bounds = map_view.build_map(df, view['center'], view['zoom'], view['bounds'])
+map_state = st_folium(m, height=700, width="100%", returned_objects=["bounds", "zoom", "center"])
 
-st_folium(m, height=700, width="100%")
\ No newline at end of file
+# Re-render only once the user zooms, or pans past the margin that was already sent
+if map_state and rendered_bounds is not None:
+    bounds = map_view.bounds_from_st_folium(map_state.get('bounds'))
+    zoom = map_state.get('zoom')
+    if bounds and zoom and (zoom != view['zoom'] or not map_view.contains(rendered_bounds, bounds)):
+        center = map_state.get('center') or {}
+        st.session_state['map_view'] = {
+            'center': [center.get('lat', user_lat), center.get('lng', user_lon)],
+            'zoom': zoom, 'bounds': bounds,
+        }
+        st.rerun()
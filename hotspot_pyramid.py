@@ -0,0 +1,123 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import hotspots
+import metrics
+import storage
+
+# Hotspots at several grid resolutions (hotspots.PYRAMID_DECIMALS), so the map can show
+# ~1km squares when zoomed out and ~1m squares when zoomed in. Every level applies the
+# MIN_SIGHTINGS threshold to its own squares: a 1km square can be verified while none of
+# the 110m squares inside it are. Built in one pass from the sightings history and kept
+# current from the store's sighting listener.
+
+
+class Level:
+    # All grid squares of one resolution: sorted cell keys + counts from the build, plus
+    # squares first seen since then. The verified table is rebuilt lazily after a change.
+    def __init__(self, decimals, keys, counts):
+        self.decimals = decimals
+        self.keys, self.counts = keys, counts
+        self.new = {}
+        self.table = None
+
+    def add(self, key):
+        i = np.searchsorted(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            self.counts[i] += 1
+            count = self.counts[i]
+        else:
+            count = self.new[key] = self.new.get(key, 0) + 1
+        if count >= hotspots.MIN_SIGHTINGS:
+            self.table = None
+
+    def verified(self, names):
+        # Verified squares as a HOTSPOT_COLUMNS frame sorted by lat, for bounds lookups
+        if self.table is None:
+            keys = np.concatenate([self.keys, np.fromiter(self.new.keys(), dtype=np.int64, count=len(self.new))])
+            counts = np.concatenate([self.counts, np.fromiter(self.new.values(), dtype=np.int64, count=len(self.new))])
+            keep = counts >= hotspots.MIN_SIGHTINGS
+            codes, lats, lons = hotspots.decode_keys(keys[keep], self.decimals)
+            order = np.argsort(lats, kind='stable')
+            self.table = pd.DataFrame({
+                'common_name': np.asarray(names, dtype=object)[codes[order]],
+                'lat': lats[order], 'lon': lons[order],
+                'sighting_count': counts[keep][order].astype(np.int64),
+            })
+        return self.table
+
+
+class HotspotPyramid:
+    """
+    Verified hotspots per grid resolution. query(decimals, bounds) returns one level's
+    hotspots inside the map bounds with a binary search on latitude, so a render only
+    touches the squares it will draw.
+    """
+
+    def __init__(self, sightings=None, levels=hotspots.PYRAMID_DECIMALS):
+        self.levels = tuple(levels)
+        self.names, self.codes = [], {}
+        self.level = {}
+        self.lock = threading.Lock()
+        if sightings is not None:
+            self.load(sightings)
+
+    @metrics.timed('index_build', index='pyramid')
+    def load(self, sightings):
+        names, pyramid = hotspots.aggregate_pyramid(sightings, self.levels)
+        level = {d: Level(d, keys, counts.astype(np.int64)) for d, (keys, counts) in pyramid.items()}
+        with self.lock:
+            self.names, self.codes = names, {name: i for i, name in enumerate(names)}
+            self.level = level
+
+    def update(self, common_name, lat, lon, date=None, time=None):
+        # Storage sighting listener: count one new sighting at every level
+        if not common_name or np.isnan(lat) or np.isnan(lon) or abs(lat) > 90 or abs(lon) > 180:
+            return
+        with self.lock:
+            code = self.codes.get(common_name)
+            if code is None:
+                code = self.codes[common_name] = len(self.names)
+                self.names.append(common_name)
+            for decimals, level in self.level.items():
+                level.add(int(hotspots.cell_keys(code, lat, lon, decimals)))
+
+    # --- QUERIES ---
+    def hotspots(self, decimals):
+        with self.lock:
+            return self.level[decimals].verified(self.names)
+
+    def query(self, decimals, bounds=None):
+        # Verified hotspots of one level, optionally only those inside [[south, west], [north, east]]
+        table = self.hotspots(decimals)
+        if bounds is None:
+            return table
+        (south, west), (north, east) = bounds
+        lats = table['lat'].to_numpy()
+        a, b = np.searchsorted(lats, south, 'left'), np.searchsorted(lats, north, 'right')
+        lons = table['lon'].to_numpy()[a:b]
+        return table.iloc[a:b][(lons >= west) & (lons <= east)]
+
+
+# One pyramid per process, built from the store's sightings and kept current from the
+# store's change log (sightings saved by this process and the others alike)
+_pyramid = None
+_pyramid_version = None
+_pyramid_after_id = 0
+_pyramid_lock = threading.Lock()
+
+def build_pyramid():
+    sightings = storage.get_store().load_sightings(['id', 'latitude', 'longitude', 'common_name'])
+    return HotspotPyramid(sightings), storage.last_id(sightings)
+
+def get_pyramid():
+    global _pyramid, _pyramid_version, _pyramid_after_id
+    with _pyramid_lock:
+        if _pyramid is not None:
+            _pyramid_version = storage.follow(_pyramid_version, _pyramid_after_id, sighting_listener=_pyramid.update)
+        if _pyramid_version is None:
+            _pyramid, _pyramid_version, _pyramid_after_id = storage.build_current(
+                build_pyramid, sighting_listener='update')
+        return _pyramid
@@ -0,0 +1,303 @@
+import csv
+import io
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+# --- CONFIG ---
+SIGHTINGS_FILE = 'sightings.csv'
+HOTSPOTS_FILE = 'final_hotspots.csv'
+STATE_FILE = 'hotspot_state.pkl'
+
+GRID_DECIMALS = 3        # approx 110m grid squares
+MIN_SIGHTINGS = 3        # a grid square needs this many sightings to be "verified"
+CHECKPOINT_EVERY = 100   # appends between state snapshots
+PYRAMID_DECIMALS = (2, 3, 4, 5)  # zoom levels of the map's hotspot pyramid: ~1.1km, 110m, 11m, 1.1m
+DATE_FORMAT = "%d/%m/%Y"   # date_observed
+TIME_FORMAT = "%H:%M:%S"   # time_observed
+
+
+# --- 1. GRID HELPERS ---
+def grid_key(common_name, lat, lon):
+    # Same rounding as Series.round() so incremental and full results match exactly
+    return (common_name, np.round(np.float64(lat), GRID_DECIMALS), np.round(np.float64(lon), GRID_DECIMALS))
+
+
+def aggregate_sightings(df):
+    # The original hotspot algorithm: round to the grid, then count per species + grid square
+    df = df.copy()
+    df['lat_grid'] = df['latitude'].round(GRID_DECIMALS)
+    df['lon_grid'] = df['longitude'].round(GRID_DECIMALS)
+    return df.groupby(['common_name', 'lat_grid', 'lon_grid'], observed=True).size().reset_index(name='sighting_count')
+
+
+def verified_hotspots(cells):
+    # FILTER: Only keep verified hotspots (>= 3 sightings), renamed back to lat/lon for the map
+    verified = cells[cells['sighting_count'] >= MIN_SIGHTINGS].copy()
+    verified.rename(columns={'lat_grid': 'lat', 'lon_grid': 'lon'}, inplace=True)
+    return verified
+
+
+def read_hotspots(output_file=HOTSPOTS_FILE):
+    # The verified hotspots table. HotspotEngine appends a row for each square whose count
+    # changed, so a later row for the same square supersedes the earlier ones.
+    df = pd.read_csv(output_file)
+    df = df.drop_duplicates(['common_name', 'lat', 'lon'], keep='last')
+    return df.sort_values(['common_name', 'lat', 'lon'], ignore_index=True)
+
+
+def parse_field(values, fmt, field):
+    # Vectorized date/time parsing: each distinct string is parsed once (a history has far
+    # fewer distinct dates and times than rows), then broadcast back. Unparseable -> -1
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    parsed = getattr(pd.to_datetime(pd.Series(uniques, dtype=object), format=fmt, errors='coerce').dt, field)
+    # Missing values have code -1: the -1 appended at the end
+    return np.append(parsed.fillna(-1).to_numpy(dtype=np.int64), -1)[codes]
+
+
+def aggregate_activity(df):
+    """
+    The hotspot grouping plus when each grid square is active: returns (cells, hours,
+    months) where cells is exactly aggregate_sightings(df) and hours[i] / months[i] are
+    row i's 24-bin hour-of-day and 12-bin month histograms. Sightings without a
+    readable time or date only count in sighting_count.
+    """
+    df = df.dropna(subset=['common_name', 'latitude', 'longitude'])
+    grouped = df.groupby([df['common_name'], df['latitude'].round(GRID_DECIMALS).rename('lat_grid'),
+                          df['longitude'].round(GRID_DECIMALS).rename('lon_grid')], sort=True, observed=True)
+    codes = grouped.ngroup().to_numpy()
+    cells = grouped.size().reset_index(name='sighting_count')
+    n = len(cells)
+
+    hour = parse_field(df['time_observed'], TIME_FORMAT, 'hour')
+    month = parse_field(df['date_observed'], DATE_FORMAT, 'month')
+    has_hour, has_month = hour >= 0, month >= 1
+    hours = np.bincount(codes[has_hour] * 24 + hour[has_hour], minlength=n * 24).reshape(n, 24)
+    months = np.bincount(codes[has_month] * 12 + month[has_month] - 1, minlength=n * 12).reshape(n, 12)
+    return cells, hours, months
+
+
+def cell_keys(codes, lat, lon, decimals):
+    # One int64 per (species code, grid square) at this resolution. Same rounding as
+    # Series.round(): np.round is rint(x * 10^d) / 10^d, so the integer part is exact.
+    scale = 10 ** decimals
+    lat_span, lon_span = 180 * scale + 1, 360 * scale + 1
+    if (int(np.max(codes, initial=0)) + 1) * lat_span * lon_span >= 2 ** 63:
+        raise ValueError(f"too many species for a {decimals}-decimal grid key")
+    lat_i = np.rint(np.multiply(lat, float(scale))).astype(np.int64) + 90 * scale
+    lon_i = np.rint(np.multiply(lon, float(scale))).astype(np.int64) + 180 * scale
+    return (np.asarray(codes, dtype=np.int64) * lat_span + lat_i) * lon_span + lon_i
+
+
+def decode_keys(keys, decimals):
+    # Inverse of cell_keys: (species codes, lat_grid, lon_grid)
+    scale = 10 ** decimals
+    lat_span, lon_span = 180 * scale + 1, 360 * scale + 1
+    codes, rest = np.divmod(keys, lat_span * lon_span)
+    lat_i, lon_i = np.divmod(rest, lon_span)
+    return codes, (lat_i - 90 * scale) / float(scale), (lon_i - 180 * scale) / float(scale)
+
+
+def aggregate_pyramid(df, levels=PYRAMID_DECIMALS):
+    """
+    Per species + grid square counts at several resolutions in one pass: species are
+    factorized once, then each level is an integer cell key and a sort. Returns
+    (species names, {decimals: (sorted cell keys, counts)}); at GRID_DECIMALS the cells
+    are exactly those of aggregate_sightings(df). Coordinates off the globe are dropped.
+    """
+    df = df.dropna(subset=['common_name', 'latitude', 'longitude'])
+    lat, lon = df['latitude'].to_numpy(dtype=np.float64), df['longitude'].to_numpy(dtype=np.float64)
+    valid = (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+    codes, names = pd.factorize(df['common_name'][valid], sort=True)
+    lat, lon = lat[valid], lon[valid]
+    pyramid = {}
+    for decimals in levels:
+        keys, counts = np.unique(cell_keys(codes, lat, lon, decimals), return_counts=True)
+        pyramid[decimals] = (keys, counts)
+    return list(names), pyramid
+
+
+# --- 2. INCREMENTAL ENGINE ---
+class HotspotEngine:
+    """
+    Keeps per (common_name, lat_grid, lon_grid) counts in memory and updates a single
+    grid square per new sighting instead of regrouping the whole history.
+
+    sightings.csv doubles as the journal: the state snapshot records the byte offset it
+    has consumed, so rows appended since the last snapshot (by this or another process)
+    are replayed from the tail of the file rather than re-reading it all.
+
+    final_hotspots.csv is patched the same way: the new counts of the squares a save
+    changed are appended (read_hotspots keeps the latest row per square), and the table is
+    only rewritten whole once the appended rows have doubled the file.
+    """
+
+    def __init__(self, sightings_file=SIGHTINGS_FILE, output_file=HOTSPOTS_FILE, state_file=STATE_FILE):
+        self.sightings_file = sightings_file
+        self.output_file = output_file
+        self.state_file = state_file
+
+        self.counts = {}
+        self.verified = {}      # the counts >= MIN_SIGHTINGS, i.e. what output_file lists
+        self.output_bytes = 0   # size of output_file when this engine last wrote it whole
+        self.columns = None
+        self.offset = 0
+        self.max_id = 0
+        self.pending = 0
+        self.loaded = False
+
+    # --- FULL REBUILD ---
+    def rebuild(self):
+        df = pd.read_csv(self.sightings_file)
+        print(f"   - Found {len(df)} raw sightings.")
+
+        cells = aggregate_sightings(df)
+        self.counts = {
+            (name, lat, lon): int(n)
+            for name, lat, lon, n in zip(cells['common_name'], cells['lat_grid'], cells['lon_grid'], cells['sighting_count'])
+        }
+        self.verified = {key: n for key, n in self.counts.items() if n >= MIN_SIGHTINGS}
+        self.columns = list(df.columns)
+        self.max_id = int(df['id'].max()) if not df.empty else 0
+        self.offset = os.path.getsize(self.sightings_file)
+        self.loaded = True
+
+        self.write_hotspots()
+        self.save_state()
+        return len(self.verified)
+
+    # --- STATE SNAPSHOT ---
+    def save_state(self):
+        state = {
+            'offset': self.offset,
+            'max_id': self.max_id,
+            'columns': self.columns,
+            'counts': self.counts,
+        }
+        tmp_file = self.state_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, self.state_file)
+        self.pending = 0
+
+    def load_state(self):
+        try:
+            with open(self.state_file, 'rb') as f:
+                state = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return False
+
+        # A shorter file means sightings.csv was replaced; the snapshot no longer applies
+        if state['offset'] > os.path.getsize(self.sightings_file):
+            return False
+
+        self.counts = state['counts']
+        self.verified = {key: n for key, n in self.counts.items() if n >= MIN_SIGHTINGS}
+        self.columns = state['columns']
+        self.offset = state['offset']
+        self.max_id = state['max_id']
+        self.loaded = True
+        return True
+
+    # --- CATCH UP ---
+    def sync(self):
+        # Bring the counts up to date with sightings.csv, reading only what was appended.
+        # Call before reading next_id and again after appending a sighting.
+        if not os.path.exists(self.sightings_file):
+            return False
+
+        if not self.loaded and not self.load_state():
+            self.rebuild()
+            return True
+
+        size = os.path.getsize(self.sightings_file)
+        if size < self.offset:
+            self.rebuild()
+        elif size > self.offset:
+            self.replay_tail()
+        return True
+
+    def replay_tail(self):
+        with open(self.sightings_file, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+
+        # Ignore a partially written last line; it is picked up on the next sync
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return
+
+        id_pos = self.columns.index('id')
+        lat_pos = self.columns.index('latitude')
+        lon_pos = self.columns.index('longitude')
+        name_pos = self.columns.index('common_name')
+
+        changed = set()
+        for row in csv.reader(io.StringIO(data[:end].decode('utf-8'))):
+            if not row:
+                continue
+            try:
+                self.max_id = max(self.max_id, int(row[id_pos]))
+                key = self.apply(row[name_pos], float(row[lat_pos]), float(row[lon_pos]))
+            except (ValueError, IndexError):
+                continue
+            if key:
+                changed.add(key)
+
+        self.offset += end
+        self.pending += 1
+        if changed:
+            self.write_hotspots(changed)
+        if self.pending >= CHECKPOINT_EVERY:
+            self.save_state()
+
+    def apply(self, common_name, lat, lon):
+        # Update one grid square; returns its key if the verified hotspot table changed
+        if not common_name or np.isnan(lat) or np.isnan(lon):
+            return None
+        key = grid_key(common_name, lat, lon)
+        count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+        if count < MIN_SIGHTINGS:
+            return None
+        self.verified[key] = count
+        return key
+
+    # --- PUBLIC API ---
+    def next_id(self):
+        self.sync()
+        return self.max_id + 1
+
+    def hotspots(self, keys=None):
+        rows = [(name, lat, lon, self.verified[(name, lat, lon)]) for name, lat, lon in (keys or self.verified)]
+        verified = pd.DataFrame(rows, columns=['common_name', 'lat', 'lon', 'sighting_count'])
+        verified['sighting_count'] = verified['sighting_count'].astype('int64')
+        return verified.sort_values(['common_name', 'lat', 'lon'], ignore_index=True)
+
+    def write_hotspots(self, changed=None):
+        # Appends the changed squares' rows, or rewrites the whole table (no changes given,
+        # no file yet, or the appended rows have doubled its size since it was last compact)
+        try:
+            size = os.path.getsize(self.output_file)
+        except FileNotFoundError:
+            size = None
+        if changed is not None and size is not None and size <= 2 * self.output_bytes:
+            self.hotspots(changed).to_csv(self.output_file, mode='a', header=False, index=False)
+            return
+        # Write then rename, so a reader in another process never sees half a table
+        tmp_file = f"{self.output_file}.{os.getpid()}.tmp"
+        self.hotspots().to_csv(tmp_file, index=False)
+        self.output_bytes = os.path.getsize(tmp_file)
+        os.replace(tmp_file, self.output_file)
+
+
+# One engine per set of files, shared by every session in this process
+_engines = {}
+
+def get_engine(sightings_file=SIGHTINGS_FILE, output_file=HOTSPOTS_FILE, state_file=STATE_FILE):
+    key = tuple(os.path.abspath(p) for p in (sightings_file, output_file, state_file))
+    if key not in _engines:
+        _engines[key] = HotspotEngine(sightings_file, output_file, state_file)
+    return _engines[key]
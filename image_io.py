@@ -0,0 +1,52 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from PIL import Image
+
+# Finding and decoding photos, without the classifier: shared by image_processor.py and
+# the offline dataset tools (dataset_store.py), which shouldn't pull in transformers or
+# streamlit just to read JPEGs.
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def find_images(directory):
+    # Every image under a dataset folder (image_scrape.py makes one sub-folder per species)
+    for root, _, files in sorted(os.walk(directory)):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def decode_image(image_file, size=None):
+    # Runs in a worker thread: decode + resize so the model only sees small RGB images
+    img = Image.open(image_file)
+    if size:
+        # Lets the JPEG decoder skip most of the work when the photo is much larger than needed
+        img.draft('RGB', size)
+    img = img.convert('RGB')
+    if size:
+        img = img.resize(size, Image.BILINEAR)
+    return img
+
+
+def decode_images(image_files, size=None, num_workers=4, prefetch=64):
+    # Ordered, bounded parallel decode: at most `prefetch` images are in flight at once.
+    # Yields None for files that cannot be read so results stay aligned with the input.
+    def safe_decode(image_file):
+        try:
+            return decode_image(image_file, size)
+        except Exception as e:
+            print(f"   Skipped {image_file}: {e}")
+            return None
+
+    files = iter(image_files)
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        pending = deque(pool.submit(safe_decode, f) for f in islice(files, prefetch))
+        while pending:
+            img = pending.popleft().result()
+            for f in islice(files, 1):
+                pending.append(pool.submit(safe_decode, f))
+            yield img
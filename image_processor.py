@@ -1,26 +1,40 @@
-from transformers import pipeline
 from PIL import Image
 import streamlit as st
+import argparse
+import csv
+import os
+from itertools import islice
+
+import metrics
+from field_guide import clean_label
+from image_io import decode_images, find_images
+from inference_cache import get_cache
+
+MODEL_PATH = "zhiquanchng/singapore-bird-classifier"
+
+# Backend: torch (transformers pipeline), onnx or onnx-int8 (ONNX Runtime, see onnx_classifier.py)
+IMAGE_BACKEND = os.environ.get('TERRANOVA_IMAGE_BACKEND', 'torch')
+ONNX_MODEL_DIR = os.environ.get('TERRANOVA_ONNX_DIR', os.path.join('models', 'singapore-bird-classifier-onnx'))
+ONNX_THREADS = int(os.environ.get('TERRANOVA_ONNX_THREADS', '0'))  # 0 = ONNX Runtime default
+IMAGE_MODEL_ID = f"{MODEL_PATH}:{IMAGE_BACKEND}"   # inference cache key
 
 # 1. LOAD YOUR CUSTOM MODEL FROM HUGGING FACE
 @st.cache_resource(show_spinner=False)
 def load_image_model():
-    model_path = "zhiquanchng/singapore-bird-classifier"
-    
+    model_path = MODEL_PATH
+
+    if IMAGE_BACKEND in ('onnx', 'onnx-int8'):
+        from onnx_classifier import load_onnx_classifier
+        return load_onnx_classifier(model_path, ONNX_MODEL_DIR, IMAGE_BACKEND == 'onnx-int8', ONNX_THREADS)
+
+    # Only the torch backend imports transformers (and torch): several seconds of start-up
+    from transformers import pipeline
     return pipeline("image-classification", model=model_path)
 
 # 2. LABEL CLEANER
-def clean_label(label):
-    return label.replace("_", " ").title()
+# clean_label lives in field_guide.py so the Field Guide resolves names the same way
 
-# 3. IDENTIFY IMAGE
-def identify_bird_image(image_file):
-    pipe = load_image_model()
-    img = Image.open(image_file)
-    
-    # Get Top 3 predictions
-    predictions = pipe(img, top_k=3)
-    
+def format_predictions(predictions):
     results = []
     for p in predictions:
         # Clean up the label
@@ -33,4 +47,80 @@ def identify_bird_image(image_file):
             'raw_label': p['label']
         })
         
-    return results
\ No newline at end of file
+    return results
+
+# 3. IDENTIFY IMAGE
+@metrics.timed('identify', kind='image')
+def identify_bird_image(image_file, top_k=3):
+    # Streamlit reruns the page on every click: the same photo comes from the cache,
+    # without loading or running the model
+    return get_cache().get_or_compute(
+        image_file, IMAGE_MODEL_ID, lambda: classify_bird_image(image_file, top_k), top_k=top_k,
+    )
+
+@metrics.timed('inference', kind='image')
+def classify_bird_image(image_file, top_k=3):
+    pipe = load_image_model()
+    img = Image.open(image_file)
+    
+    # Get Top 3 predictions
+    predictions = pipe(img, top_k=top_k)
+    
+    return format_predictions(predictions)
+
+# 4. BATCH IDENTIFY (many images at once)
+def model_input_size(pipe):
+    # (width, height) the classifier's image processor resizes to, if it declares one
+    size = getattr(getattr(pipe, 'image_processor', None), 'size', None) or {}
+    if 'height' in size and 'width' in size:
+        return (size['width'], size['height'])
+    if 'shortest_edge' in size:
+        return (size['shortest_edge'], size['shortest_edge'])
+    return None
+
+def identify_bird_images(image_files, batch_size=8, num_workers=4, top_k=3, pipe=None):
+    """
+    Batch version of identify_bird_image for re-scoring many photos.
+
+    Accepts any list/iterator of paths or file objects and yields one result list
+    (same dicts as identify_bird_image) per input, in input order; None for
+    images that could not be decoded.
+    """
+    pipe = pipe or load_image_model()
+    images = decode_images(image_files, model_input_size(pipe), num_workers, prefetch=max(2 * batch_size, num_workers))
+
+    while True:
+        batch = list(islice(images, batch_size))
+        if not batch:
+            break
+        valid = [img for img in batch if img is not None]
+        predictions = iter(pipe(valid, top_k=top_k, batch_size=batch_size) if valid else [])
+        for img in batch:
+            yield format_predictions(next(predictions)) if img is not None else None
+
+# Score a whole folder of photos:
+#   python image_processor.py path/to/bird_images_dataset --output scores.csv
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Identify every bird photo in a folder.")
+    parser.add_argument("directory")
+    parser.add_argument("--output", default="image_scores.csv")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = list(find_images(args.directory))
+    print(f"🔍 Scoring {len(paths)} images from {args.directory}...")
+
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['file', 'folder', 'rank', 'name', 'score', 'raw_label'])
+        for i, (path, results) in enumerate(zip(paths, identify_bird_images(
+                paths, batch_size=args.batch_size, num_workers=args.workers, top_k=args.top_k))):
+            folder = os.path.basename(os.path.dirname(path))
+            for rank, r in enumerate(results or [], start=1):
+                writer.writerow([path, folder, rank, r['name'], f"{r['score']:.2f}", r['raw_label']])
+            if (i + 1) % 100 == 0:
+                print(f"   Scored {i + 1} images...")
+
+    print(f"✅ Results saved to {args.output}")
@@ -1,6 +1,13 @@
+import argparse
+import csv
 import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-from pyinaturalist import get_observations
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # --- CONFIGURATION ---
 OUTPUT_DIR = r"F:\pokedex app data\bird_images_dataset"
@@ -14,57 +21,187 @@ BIRDS = [
 MAX_IMAGES = 60 
 PLACE_ID = 6734 # Singapore
 
-def download_bird_data(species_name):
-    print(f"\n🦅 Searching iNaturalist for: {species_name}...")
-    
-    # This function behaves exactly like the "Explore" tab
-    observations = get_observations(
-        taxon_name=species_name,
-        place_id=PLACE_ID,
-        quality_grade="research",
-        photos=True,
-        per_page=MAX_IMAGES
-    )
-    
-    results = observations['results']
-    print(f"   Found {len(results)} verified observations.")
-    
-    # Create Folder
+# The same observations endpoint pyinaturalist's get_observations wraps; calling it
+# directly lets the searches share the download session (and a local test server)
+API_URL = os.environ.get('INAT_API_URL', 'https://api.inaturalist.org/v1')
+PER_PAGE = 200        # iNaturalist's maximum
+CONCURRENCY = 8       # photos downloading at once
+RETRIES = 4           # per request, with exponential backoff (0.5s, 1s, 2s, ...)
+BACKOFF = 0.5
+CHUNK_SIZE = 64 * 1024
+MANIFEST_FILE = 'manifest.csv'
+
+
+# --- 1. HTTP SESSION ---
+def make_session(pool_size=CONCURRENCY, retries=RETRIES, backoff=BACKOFF):
+    # One pooled, keep-alive session for every request; retries 429/5xx and dropped
+    # connections with backoff (honouring Retry-After)
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(['GET']), respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# --- 2. MANIFEST (what is already on disk) ---
+class Manifest:
+    """
+    Append-only record of downloaded observations (obs_id, species, file) in the
+    dataset folder, so re-runs skip anything already fetched.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_FILE)
+        self.species = {}
+        if os.path.exists(self.path):
+            with open(self.path, newline='') as f:
+                for row in csv.DictReader(f):
+                    self.species[int(row['obs_id'])] = row['species']
+        new_file = not os.path.exists(self.path)
+        self.file = open(self.path, 'a', newline='')
+        self.writer = csv.writer(self.file)
+        if new_file:
+            self.writer.writerow(['obs_id', 'species', 'file'])
+
+    def __contains__(self, obs_id):
+        return obs_id in self.species
+
+    def count(self, species_name):
+        return sum(1 for s in self.species.values() if s == species_name)
+
+    def add(self, obs_id, species_name, filename):
+        self.species[obs_id] = species_name
+        self.writer.writerow([obs_id, species_name, filename])
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+# --- 3. SEARCH + DOWNLOAD ---
+def iter_observations(session, species_name, api_url=API_URL, per_page=PER_PAGE):
+    # Pages through every research-grade observation with photos, newest first. Paging by
+    # id_below rather than page numbers, which iNaturalist caps at 10,000 results.
+    params = {
+        'taxon_name': species_name, 'place_id': PLACE_ID, 'quality_grade': 'research',
+        'photos': 'true', 'per_page': per_page, 'order_by': 'id', 'order': 'desc',
+    }
+    while True:
+        response = session.get(f"{api_url}/observations", params=params, timeout=30)
+        response.raise_for_status()
+        results = response.json()['results']
+        if not results:
+            return
+        yield from results
+        params['id_below'] = results[-1]['id']
+
+def download_photo(session, url, file_path, retries=RETRIES, backoff=BACKOFF):
+    # Streams to a .part file and renames it, so an interrupted run never leaves a
+    # truncated photo behind. Retries here cover connections dropped mid-body.
+    for attempt in range(retries + 1):
+        try:
+            with session.get(url, timeout=10, stream=True) as response:
+                response.raise_for_status()
+                with open(file_path + '.part', 'wb') as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+            os.replace(file_path + '.part', file_path)
+            return file_path
+        except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+def photo_jobs(session, species_name, output_dir, manifest, max_images, api_url, wanted):
+    # (obs_id, photo_url, file_path) for this species' observations not yet downloaded.
+    # wanted() is how many more photos to start; it is checked before every job, so a
+    # complete species makes no request and paging stops as soon as nothing is wanted.
+    if wanted() <= 0:
+        return
     folder_name = species_name.lower().replace(" ", "_")
-    save_path = os.path.join(OUTPUT_DIR, folder_name)
-    if not os.path.exists(save_path):
-        os.makedirs(save_path)
-        
-    # Download Images
-    count = 0
-    for obs in results:
-        if count >= MAX_IMAGES: break
-        
-        if obs['photos']:
-            # We grab 'large' to get better AI training data than standard thumbnails
-            photo_url = obs['photos'][0]['url'].replace("square", "large")
-            obs_id = obs['id']
-            
-            try:
-                img_data = requests.get(photo_url, timeout=10).content
-                filename = f"{folder_name}_{obs_id}.jpg"
-                file_path = os.path.join(save_path, filename)
-                
-                with open(file_path, 'wb') as f:
-                    f.write(img_data)
-                
-                count += 1
-                if count % 10 == 0:
-                    print(f"   Downloaded {count} images...")
-                    
-            except Exception as e:
-                print(f"   Skipped: {e}")
+    save_path = os.path.join(output_dir, folder_name)
+    os.makedirs(save_path, exist_ok=True)
+
+    for obs in iter_observations(session, species_name, api_url, per_page=min(PER_PAGE, max_images)):
+        if obs['id'] in manifest or not obs.get('photos'):
+            continue
+        # We grab 'large' to get better AI training data than standard thumbnails
+        photo_url = obs['photos'][0]['url'].replace("square", "large")
+        yield obs['id'], photo_url, os.path.join(save_path, f"{folder_name}_{obs['id']}.jpg")
+        if wanted() <= 0:
+            return
+
+def download_birds(birds=BIRDS, output_dir=OUTPUT_DIR, max_images=MAX_IMAGES, concurrency=CONCURRENCY,
+                   api_url=API_URL, session=None):
+    """
+    Downloads up to max_images photos per species with `concurrency` downloads in
+    flight at once, shared across species (searching the next page or species overlaps
+    with downloading the current one). Returns {species: photos downloaded this run}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    session = session or make_session(concurrency)
+    manifest = Manifest(output_dir)
+    downloaded = {bird: 0 for bird in birds}
+    in_flight = {bird: 0 for bird in birds}
+    pending = deque()
+
+    def finish(future, obs_id, species_name, file_path):
+        in_flight[species_name] -= 1
+        try:
+            future.result()
+        except Exception as e:
+            print(f"   Skipped {obs_id}: {e}")
+            return
+        manifest.add(obs_id, species_name, os.path.relpath(file_path, output_dir))
+        downloaded[species_name] += 1
+        if downloaded[species_name] % 10 == 0:
+            print(f"   {species_name}: downloaded {downloaded[species_name]} images...")
+
+    def wanted(species_name):
+        # Photos still to start: counting the ones in flight, but waiting on them before
+        # saying none, since any of them can fail and leave the species short
+        while True:
+            left = max_images - manifest.count(species_name) - in_flight[species_name]
+            if left > 0 or not in_flight[species_name]:
+                return left
+            finish(*pending.popleft())
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for species_name in birds:
+                print(f"\n🦅 Searching iNaturalist for: {species_name}...")
+                try:
+                    jobs = photo_jobs(session, species_name, output_dir, manifest, max_images, api_url,
+                                      lambda: wanted(species_name))
+                    for obs_id, photo_url, file_path in jobs:
+                        # Bounded: never more than 2x concurrency photos queued
+                        while len(pending) >= 2 * concurrency:
+                            finish(*pending.popleft())
+                        future = pool.submit(download_photo, session, photo_url, file_path)
+                        pending.append((future, obs_id, species_name, file_path))
+                        in_flight[species_name] += 1
+                except requests.RequestException as e:
+                    print(f"   Search failed: {e}")
+            while pending:
+                finish(*pending.popleft())
+    finally:
+        manifest.close()
+    return downloaded
+
+def download_bird_data(species_name, **kwargs):
+    return download_birds([species_name], **kwargs)[species_name]
 
 if __name__ == "__main__":
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
-        
-    for bird in BIRDS:
-        download_bird_data(bird)
-        
-    print("\n✅ Download Complete!")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download research-grade bird photos from iNaturalist.")
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--max-images", type=int, default=MAX_IMAGES)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    args = parser.parse_args()
+
+    counts = download_birds(BIRDS, args.output, args.max_images, args.concurrency)
+    for bird, count in counts.items():
+        print(f"   {bird}: {count} new images")
+
+    print("\n✅ Download Complete!")
@@ -0,0 +1,175 @@
+import copy
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import metrics
+
+# Shared cache for identification results. Streamlit reruns the Identify page on every
+# widget click, so the same photo/clip would otherwise be re-classified each time.
+#   key = sha256(input bytes + model id + parameters)
+#   memory tier: LRU of the most recent results (per process)
+#   disk tier (optional): one pickle per key, oldest-used evicted past a size budget
+
+CACHE_DIR = os.environ.get('TERRANOVA_CACHE_DIR')  # unset = memory only
+CACHE_ITEMS = int(os.environ.get('TERRANOVA_CACHE_ITEMS', '256'))
+CACHE_DISK_MB = float(os.environ.get('TERRANOVA_CACHE_MB', '200'))
+
+
+def read_bytes(source):
+    # Paths, Streamlit UploadedFiles and other file objects (left rewound for the model)
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    if hasattr(source, 'read'):
+        data = source.read()
+        source.seek(0)
+        return data
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def make_key(data, model_id, **params):
+    h = hashlib.sha256(data)
+    h.update(model_id.encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class InferenceCache:
+    def __init__(self, max_items=CACHE_ITEMS, disk_dir=CACHE_DIR, max_disk_mb=CACHE_DISK_MB):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = int(max_disk_mb * 2**20)
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'disk_evictions': 0}
+        self.disk_bytes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.disk_bytes = sum(size for _, size, _ in self.disk_entries())
+
+    def disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def get(self, key):
+        # Returns (found, value)
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return True, self.memory[key]
+
+        if self.disk_dir:
+            try:
+                with open(self.disk_path(key), 'rb') as f:
+                    value = pickle.load(f)
+                try:
+                    os.utime(self.disk_path(key))  # mark as recently used for eviction
+                except OSError:
+                    pass
+                with self.lock:
+                    self.stats['disk_hits'] += 1
+                self.remember(key, value)
+                return True, value
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                pass
+
+        with self.lock:
+            self.stats['misses'] += 1
+        return False, None
+
+    def remember(self, key, value):
+        with self.lock:
+            self.memory[key] = value
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_items:
+                self.memory.popitem(last=False)
+
+    def put(self, key, value):
+        self.remember(key, value)
+        if self.disk_dir:
+            # Write then rename, so a reader in another process never sees half a file
+            tmp = f"{self.disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self.disk_bytes += os.path.getsize(tmp)
+            os.replace(tmp, self.disk_path(key))
+            # Only scan the folder once the running total says it may be over budget
+            if self.disk_bytes > self.max_disk_bytes:
+                self.evict()
+
+    def disk_entries(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith('.pkl'):
+                try:
+                    stat = os.stat(os.path.join(self.disk_dir, name))
+                    entries.append((stat.st_mtime, stat.st_size, name))
+                except FileNotFoundError:
+                    pass
+        return entries
+
+    def evict(self):
+        # Drop least recently used files until the folder is back under 90% of the budget
+        entries = self.disk_entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= 0.9 * self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+                self.stats['disk_evictions'] += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.disk_bytes = total
+
+    def get_or_compute(self, source, model_id, compute, **params):
+        """
+        Returns the cached result for these input bytes/model/parameters, or runs
+        compute() once and stores its result. Only the input bytes are hashed, so the
+        model is never touched on a hit.
+        """
+        data = read_bytes(source)
+        metrics.observe('inference_payload_bytes', len(data), model=model_id)
+        key = make_key(data, model_id, **params)
+        found, value = self.get(key)
+        if not found:
+            value = compute()
+            self.put(key, value)
+        # Callers get their own copy, so editing a result cannot change the cached one
+        return copy.deepcopy(value)
+
+    def metrics(self):
+        # Gauges for the metrics endpoint: hit counts and the overall hit rate
+        stats = dict(self.stats)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.disk_dir, name))
+            self.disk_bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    # One cache per process, shared by every Streamlit session
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = InferenceCache()
+            metrics.register_collector('inference_cache', _cache.metrics)
+        return _cache
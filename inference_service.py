@@ -0,0 +1,358 @@
+import argparse
+import io
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+
+import metrics
+from inference_cache import get_cache, make_key, read_bytes
+
+# Local inference service for running several Streamlit server processes side by side.
+# One process owns the models (and the sighting queue, so there is a single writer);
+# the Streamlit workers send it requests over a Unix socket instead of each loading
+# ~500MB of BirdNET and the image classifier. Photos that arrive together are
+# classified in one batch; recordings take turns, so a long one doesn't hold up the rest.
+#
+#   python inference_service.py                  # then start the workers with
+#   TERRANOVA_INFERENCE_SOCKET=terranova.sock streamlit run home.py --server.port 8501 ...
+#
+# Without TERRANOVA_INFERENCE_SOCKET every process loads its own models, as before.
+
+SOCKET_PATH = os.environ.get('TERRANOVA_INFERENCE_SOCKET')   # unset = models in-process
+DEFAULT_SOCKET = 'terranova.sock'
+BATCH_MAX = int(os.environ.get('TERRANOVA_BATCH_MAX', '16'))             # photos per model call
+BATCH_WAIT_SECS = float(os.environ.get('TERRANOVA_BATCH_WAIT_MS', '10')) / 1000   # wait for more to batch with
+REQUEST_TIMEOUT = 300   # seconds; a long recording can take a while
+
+_serving = False   # True inside the service process itself
+
+
+def remote():
+    # Whether this process should send its inference to the service
+    return bool(SOCKET_PATH) and not _serving
+
+
+# --- 1. PROTOCOL ---
+# Each message: 8-byte header (JSON length, payload length), the JSON, then raw bytes
+# (the photo or recording). Replies are {'ok': True, 'result': ...} or {'ok': False, 'error'}.
+def send_message(sock, header, payload=b''):
+    head = json.dumps(header, default=float).encode()
+    sock.sendall(struct.pack('!II', len(head), len(payload)) + head + payload)
+
+
+def recv_exact(sock, n):
+    data = bytearray()
+    while len(data) < n:
+        chunk = sock.recv(min(n - len(data), 1 << 20))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return bytes(data)
+
+
+def recv_message(sock):
+    head_len, payload_len = struct.unpack('!II', recv_exact(sock, 8))
+    return json.loads(recv_exact(sock, head_len)), recv_exact(sock, payload_len)
+
+
+# --- 2. SERVICE ---
+class Batcher:
+    """
+    Collects requests from every connection and hands them to run_batch(items) in
+    groups: whatever arrives within max_wait of the first one, up to max_batch.
+    run_batch returns one result per item (an Exception fails only that item).
+    """
+
+    def __init__(self, name, run_batch, max_batch=BATCH_MAX, max_wait=BATCH_WAIT_SECS):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.worker = threading.Thread(target=self.run, name=f"batch-{name}", daemon=True)
+        self.worker.start()
+
+    def submit(self, item):
+        future = Future()
+        self.queue.put((item, future))
+        return future.result()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            metrics.observe('inference_batch', len(batch), buckets=metrics.COUNT_BUCKETS, kind=self.name)
+            try:
+                results = self.run_batch([item for item, _ in batch])
+            except Exception as e:
+                metrics.error('inference_service', e)
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+class Interleaver:
+    """
+    Runs jobs on one thread (BirdNET's interpreter takes one recording at a time), a
+    step of each in turn, so a short job isn't stuck behind a long one. make_job(item)
+    returns a generator that yields between steps and returns the item's result.
+    """
+
+    def __init__(self, name, make_job):
+        self.name = name
+        self.make_job = make_job
+        self.queue = queue.Queue()
+        self.worker = threading.Thread(target=self.run, name=f"turns-{name}", daemon=True)
+        self.worker.start()
+
+    def submit(self, item):
+        future = Future()
+        self.queue.put((item, future))
+        return future.result()
+
+    def run(self):
+        jobs = deque()
+        while True:
+            # New jobs join the rotation; only wait for one when there's nothing to run
+            try:
+                while True:
+                    item, future = self.queue.get(block=not jobs)
+                    jobs.append((self.make_job(*item), future))
+            except queue.Empty:
+                pass
+            metrics.observe('inference_interleaved', len(jobs), buckets=metrics.COUNT_BUCKETS, kind=self.name)
+            job, future = jobs.popleft()
+            try:
+                with metrics.timer('inference_step', kind=self.name):
+                    next(job)
+            except StopIteration as done:
+                future.set_result(done.value)
+            except Exception as e:
+                metrics.error('inference_service', e)
+                future.set_exception(e)
+            else:
+                jobs.append((job, future))
+
+
+def identify_images(requests):
+    # [(photo bytes, top_k)] -> results: cache hits as they are, the misses through the
+    # classifier together
+    import image_processor
+    import model_loader
+
+    pipe = model_loader.load('image')
+    cache = get_cache()
+    keys = [make_key(data, image_processor.IMAGE_MODEL_ID, top_k=top_k) for data, top_k in requests]
+    results, misses = [], []
+    for i, key in enumerate(keys):
+        found, value = cache.get(key)
+        results.append(value)
+        if not found:
+            misses.append(i)
+
+    if misses:
+        top_k = max(requests[i][1] for i in misses)
+        with metrics.timer('inference', kind='image'):
+            predictions = list(image_processor.identify_bird_images(
+                [io.BytesIO(requests[i][0]) for i in misses], batch_size=len(misses), top_k=top_k, pipe=pipe))
+        for i, found in zip(misses, predictions):
+            if found is None:
+                results[i] = ValueError("Could not read the photo.")
+            else:
+                results[i] = found[:requests[i][1]]
+                cache.put(keys[i], results[i])
+    return results
+
+
+def identify_sound_steps(data, lat, lon, date, min_conf):
+    # audio_processor.identify_bird_sound, PIECE_SECS of audio per step (see Interleaver)
+    import model_loader
+
+    model_loader.load('audio')
+    import audio_processor
+    cache = get_cache()
+    key = make_key(data, audio_processor.AUDIO_MODEL_ID, min_conf=min_conf)
+    found, matches = cache.get(key)
+    if not found:
+        matches = yield from audio_processor.analyze_steps(data, min_conf)
+        cache.put(key, matches)
+    return audio_processor.apply_priors(matches, lat, lon, datetime.fromisoformat(date) if date else None)
+
+
+class InferenceService:
+    def __init__(self, batch_max=BATCH_MAX, batch_wait=BATCH_WAIT_SECS):
+        self.images = Batcher('image', identify_images, batch_max, batch_wait)
+        self.sounds = Interleaver('audio', identify_sound_steps)
+
+    def handle(self, header, payload):
+        import model_loader
+        import sighting_queue
+
+        op = header['op']
+        if op == 'image':
+            return self.images.submit((payload, header['top_k']))
+        if op == 'audio':
+            return self.sounds.submit(
+                (payload, header['lat'], header['lon'], header['date'], header['min_conf']))
+        if op == 'sighting':
+            return sighting_queue.get_queue().submit(*header['row'])
+        if op == 'load':
+            model_loader.load(header['model'])
+            return model_loader.status(header['model'])
+        if op == 'status':
+            return {'models': model_loader.status(), 'pid': os.getpid()}
+        raise ValueError(f"Unknown request: {op}")
+
+
+class RequestHandler(socketserver.BaseRequestHandler):
+    # One thread per connection; a connection sends any number of requests in turn
+    def handle(self):
+        while True:
+            try:
+                header, payload = recv_message(self.request)
+            except (ConnectionError, struct.error):
+                return
+            try:
+                response = {'ok': True, 'result': self.server.service.handle(header, payload)}
+            except Exception as e:
+                metrics.error('inference_service', e)
+                response = {'ok': False, 'error': str(e)}
+            send_message(self.request, response)
+
+
+def serve(socket_path=None, batch_max=BATCH_MAX, batch_wait=BATCH_WAIT_SECS):
+    global _serving
+    import model_loader
+
+    _serving = True
+    socket_path = socket_path or SOCKET_PATH or DEFAULT_SOCKET
+    if os.path.exists(socket_path):
+        try:
+            InferenceClient(socket_path).request({'op': 'status'}, retry=False)
+            raise RuntimeError(f"An inference service is already running on {socket_path}")
+        except ConnectionError:
+            os.remove(socket_path)   # left over from a service that was killed
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, RequestHandler)
+    server.daemon_threads = True
+    server.service = InferenceService(batch_max, batch_wait)
+    model_loader.start_warmup()
+    metrics.start()
+    print(f"✅ Inference service listening on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+
+# --- 3. CLIENT ---
+class InferenceClient:
+    # Used by the Streamlit workers; one connection per thread, reopened if the service restarts
+    def __init__(self, socket_path=None):
+        self.socket_path = socket_path or SOCKET_PATH or DEFAULT_SOCKET
+        self.local = threading.local()
+
+    def connection(self):
+        sock = getattr(self.local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            self.local.sock = sock
+        return sock
+
+    def close(self):
+        sock = getattr(self.local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self.local.sock = None
+
+    def request(self, header, payload=b'', retry=True, timeout=REQUEST_TIMEOUT):
+        # retry: send once more on a fresh connection if the old one broke (only for
+        # requests that are safe to repeat)
+        for attempt in range(2 if retry else 1):
+            try:
+                sock = self.connection()
+                sock.settimeout(timeout)
+                send_message(sock, header, payload)
+                response, _ = recv_message(sock)
+                break
+            except OSError as e:
+                self.close()
+                error = e
+        else:
+            raise ConnectionError(f"Inference service unavailable at {self.socket_path}: {error}")
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def wait_ready(self, name):
+        # Blocks until the service has this model loaded (model_loader.load, remotely)
+        self.request({'op': 'load', 'model': name}, timeout=None)
+        return self
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = InferenceClient()
+        return _client
+
+
+# --- 4. ENTRY POINTS FOR THE PAGES ---
+# Same signatures as the processors; routed to the service when one is configured
+def identify_bird_image(image_file, top_k=3):
+    if not remote():
+        from image_processor import identify_bird_image
+        return identify_bird_image(image_file, top_k)
+    with metrics.timer('identify', kind='image'):
+        return get_client().request({'op': 'image', 'top_k': top_k}, read_bytes(image_file))
+
+
+def identify_bird_sound(audio_file, lat=1.3521, lon=103.8198, date=None, min_conf=0.5):
+    if not remote():
+        from audio_processor import identify_bird_sound
+        return identify_bird_sound(audio_file, lat, lon, date, min_conf)
+    with metrics.timer('identify', kind='audio'):
+        header = {'op': 'audio', 'lat': lat, 'lon': lon, 'date': date.isoformat() if date else None,
+                  'min_conf': min_conf}
+        return get_client().request(header, read_bytes(audio_file))
+
+
+def submit_sighting(date, time_observed, lat, lon, common_name, username):
+    # The service's queue is the only writer; not retried, so a sighting is never sent twice
+    if not remote():
+        import sighting_queue
+        return sighting_queue.get_queue().submit(date, time_observed, lat, lon, common_name, username)
+    return get_client().request({'op': 'sighting', 'row': [date, time_observed, lat, lon, common_name, username]},
+                                retry=False)
+
+
+# python inference_service.py [--socket terranova.sock]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the TerraNova models to local Streamlit workers.")
+    parser.add_argument("--socket", default=SOCKET_PATH or DEFAULT_SOCKET)
+    parser.add_argument("--batch-max", type=int, default=BATCH_MAX)
+    parser.add_argument("--batch-wait-ms", type=float, default=BATCH_WAIT_SECS * 1000)
+    args = parser.parse_args()
+    serve(args.socket, args.batch_max, args.batch_wait_ms / 1000)
@@ -0,0 +1,191 @@
+import os
+
+import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import FastMarkerCluster, LocateControl
+
+import metrics
+
+# --- CONFIG ---
+# TERRANOVA_MAP_MODE=fast (viewport + clustering, default) or legacy (one Circle + Marker per row)
+MAP_RENDER_MODE = os.environ.get('TERRANOVA_MAP_MODE', 'fast')
+
+DEFAULT_ZOOM = 18
+MAX_ZOOM = 22
+CLUSTER_BELOW_ZOOM = 15       # below this zoom, nearby hotspots are merged before sending
+CLUSTER_CELL_PX = 60          # size of a merge cell on screen
+MAX_MARKERS = 2000            # above this many visible hotspots, merge at any zoom
+VIEWPORT_PADDING = 0.5        # extra margin (fraction of the view) rendered around the viewport
+VIEWPORT_PX = (1400, 700)     # assumed map size before st_folium has reported real bounds
+LEVEL_CELL_PX = 20            # finest hotspot grid whose squares are still at least this big on screen
+
+# Builds each marker in the browser from a plain [lat, lon, label, color] row
+MARKER_CALLBACK = """
+var callback = function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: 'leaf', markerColor: row[3], iconColor: 'white', prefix: 'glyphicon'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindTooltip(row[2]);
+    return marker;
+};
+"""
+
+
+# --- 1. VIEWPORT ---
+def degrees_per_px(zoom):
+    # Web Mercator: the world is 256 * 2^zoom pixels wide
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def viewport_bounds(center, zoom, size_px=VIEWPORT_PX):
+    # Approximate [[south, west], [north, east]] for a map that has not reported its bounds yet
+    half_w = size_px[0] / 2 * degrees_per_px(zoom)
+    half_h = size_px[1] / 2 * degrees_per_px(zoom)
+    return [[center[0] - half_h, center[1] - half_w], [center[0] + half_h, center[1] + half_w]]
+
+
+def bounds_from_st_folium(bounds):
+    # st_folium returns {'_southWest': {'lat', 'lng'}, '_northEast': {...}}
+    try:
+        sw, ne = bounds['_southWest'], bounds['_northEast']
+        if sw['lat'] is None:
+            return None
+        return [[sw['lat'], sw['lng']], [ne['lat'], ne['lng']]]
+    except (KeyError, TypeError):
+        return None
+
+
+def pad_bounds(bounds, padding=VIEWPORT_PADDING):
+    (south, west), (north, east) = bounds
+    dlat, dlon = (north - south) * padding, (east - west) * padding
+    return [[south - dlat, west - dlon], [north + dlat, east + dlon]]
+
+
+def contains(outer, inner):
+    return (outer[0][0] <= inner[0][0] and outer[0][1] <= inner[0][1]
+            and outer[1][0] >= inner[1][0] and outer[1][1] >= inner[1][1])
+
+
+def render_bounds(center, zoom, bounds=None):
+    # The area build_map renders hotspots for: the viewport plus a margin
+    return pad_bounds(bounds or viewport_bounds(center, zoom))
+
+
+def level_for_zoom(zoom, levels):
+    # Grid resolution (decimals) for this zoom: the finest whose squares are at least
+    # LEVEL_CELL_PX wide, so zoomed-out maps get fewer, bigger squares
+    px_per_deg = 1 / degrees_per_px(zoom)
+    fitting = [d for d in levels if 10.0 ** -d * px_per_deg >= LEVEL_CELL_PX]
+    return max(fitting) if fitting else min(levels)
+
+
+def in_bounds(df, bounds):
+    (south, west), (north, east) = bounds
+    lat, lon = df['lat'].to_numpy(), df['lon'].to_numpy()
+    return df[(lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)]
+
+
+# --- 2. STYLING + CLUSTERING ---
+def icon_colors(names):
+    # Same colour rule as the original per-row loop, applied to the whole column at once
+    names = names.astype(str)
+    return np.select(
+        [names.str.contains("Junglefowl", regex=False), names.str.contains("Myna", regex=False)],
+        ["red", "purple"], default="green",
+    )
+
+
+def cluster_hotspots(df, zoom, cell_px=CLUSTER_CELL_PX):
+    # Merge hotspots that fall in the same on-screen cell into one aggregate marker,
+    # placed at the sighting-weighted centre and labelled with its busiest species.
+    if df.empty:
+        return df.assign(hotspots=pd.Series(dtype='int64'))
+    cell = cell_px * degrees_per_px(zoom)
+    binned = df.assign(
+        lat_bin=np.floor(df['lat'].to_numpy() / cell),
+        lon_bin=np.floor(df['lon'].to_numpy() / cell),
+        w_lat=df['lat'] * df['sighting_count'],
+        w_lon=df['lon'] * df['sighting_count'],
+    )
+    groups = binned.groupby(['lat_bin', 'lon_bin'])
+    clusters = groups.agg(
+        sighting_count=('sighting_count', 'sum'), hotspots=('common_name', 'size'),
+        w_lat=('w_lat', 'sum'), w_lon=('w_lon', 'sum'),
+    )
+    top = binned.sort_values('sighting_count').drop_duplicates(['lat_bin', 'lon_bin'], keep='last')
+    clusters['common_name'] = top.set_index(['lat_bin', 'lon_bin'])['common_name']
+    clusters['lat'] = clusters['w_lat'] / clusters['sighting_count']
+    clusters['lon'] = clusters['w_lon'] / clusters['sighting_count']
+    return clusters.reset_index()[['common_name', 'lat', 'lon', 'sighting_count', 'hotspots']]
+
+
+def marker_rows(df):
+    labels = df['common_name'].astype(str)
+    if 'hotspots' in df:
+        more = df['hotspots'] - 1
+        labels = labels.where(more == 0, labels + " +" + more.astype(str) + " more") \
+            + " (" + df['sighting_count'].astype(str) + " sightings)"
+    rows = pd.DataFrame({
+        'lat': df['lat'].round(6), 'lon': df['lon'].round(6),
+        'label': labels, 'color': icon_colors(df['common_name']),
+    })
+    return rows.to_numpy(dtype=object).tolist()
+
+
+# --- 3. MAP BUILDING ---
+def base_map(center, zoom):
+    # Tiles stop at zoom 20; beyond that they are upscaled so the finest hotspot levels can be seen
+    tiles = folium.TileLayer("CartoDB dark_matter", max_zoom=MAX_ZOOM, max_native_zoom=20)
+    m = folium.Map(location=center, zoom_start=zoom, tiles=tiles, max_zoom=MAX_ZOOM)
+    LocateControl(auto_start=True, strings={"title": "My Location"}, flyTo=True).add_to(m)
+    return m
+
+
+def add_hotspots_legacy(m, df):
+    # The original renderer: two Python-side folium objects per hotspot
+    for index, row in df.iterrows():
+        name = str(row['common_name'])
+        # Simple icon logic
+        icon_color = "red" if "Junglefowl" in name else "purple" if "Myna" in name else "green"
+
+        folium.Circle(
+            [row['lat'], row['lon']], radius=50, color=icon_color,
+            fill=True, fill_opacity=0.2, weight=1, popup=name
+        ).add_to(m)
+
+        if row.get('sighting_count', 0) >= 3:
+            folium.Marker(
+                [row['lat'], row['lon']],
+                icon=folium.Icon(color=icon_color, icon="leaf"),
+                tooltip=f"{name}"
+            ).add_to(m)
+
+
+def add_hotspots_fast(m, df, zoom, bounds):
+    # Only what is on (or just around) the screen, merged at low zoom, as one layer
+    visible = in_bounds(df, bounds)
+    if zoom < CLUSTER_BELOW_ZOOM or len(visible) > MAX_MARKERS:
+        visible = cluster_hotspots(visible, zoom)
+    metrics.observe('map_markers', len(visible), buckets=metrics.COUNT_BUCKETS)
+    FastMarkerCluster(
+        marker_rows(visible), callback=MARKER_CALLBACK,
+        options={'disableClusteringAtZoom': CLUSTER_BELOW_ZOOM + 2},
+    ).add_to(m)
+    return len(visible)
+
+
+def build_map(df, center, zoom=DEFAULT_ZOOM, bounds=None, mode=None):
+    # Returns the folium map plus the padded bounds it was rendered for
+    # (None in legacy mode, which always renders everything).
+    mode = mode or MAP_RENDER_MODE
+    with metrics.timer('map_build', mode=mode):
+        m = base_map(center, zoom)
+        if mode == 'legacy':
+            if not df.empty:
+                add_hotspots_legacy(m, df)
+            return m, None
+        # Bounds are returned even with nothing to draw: df may only hold this viewport's hotspots
+        padded = render_bounds(center, zoom, bounds)
+        if not df.empty:
+            add_hotspots_fast(m, df, zoom, padded)
+        return m, padded
@@ -0,0 +1,298 @@
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Timing and counters for the app's hot paths (model loads, identification, storage reads
+# and writes, hotspot rebuilds, map building). Off unless TERRANOVA_METRICS=1; then the
+# numbers are served in Prometheus text format on http://127.0.0.1:<port>/metrics (JSON
+# on /metrics.json) and appended to a rolling JSON-lines log. When off, an instrumented
+# call costs one flag check.
+
+ENABLED = os.environ.get('TERRANOVA_METRICS', '0') == '1'
+PORT = int(os.environ.get('TERRANOVA_METRICS_PORT', '9464'))
+LOG_FILE = os.environ.get('TERRANOVA_METRICS_LOG', 'metrics.jsonl')
+LOG_EVERY = float(os.environ.get('TERRANOVA_METRICS_LOG_SECS', '60'))
+LOG_MAX_MB = 10       # rotate the log past this size,
+LOG_BACKUPS = 3       # keeping metrics.jsonl.1 .. .3
+PREFIX = 'terranova_'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1KB .. 256MB
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+
+# --- 1. REGISTRY ---
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation (what Prometheus would estimate)
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            seen += n
+            if seen >= rank and n:
+                return bound
+        return None
+
+
+class Registry:
+    """
+    Counters, histograms and gauge collectors keyed by (name, sorted labels). Collectors
+    are callables returning {name: value}, read at export time, for numbers a module
+    already keeps (e.g. inference cache hit counts).
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.collectors = {}
+        self.errors = deque(maxlen=20)
+        self.lock = threading.Lock()
+
+    def inc(self, name, value, labels):
+        key = series(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels, buckets):
+        self.observe_key(series(name, labels), value, buckets)
+
+    def observe_key(self, key, value, buckets):
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def gauges(self):
+        values = {}
+        for name, collect in list(self.collectors.items()):
+            try:
+                values.update({f"{name}_{k}": v for k, v in collect().items()})
+            except Exception as e:
+                print(f"❌ Metrics Collector Error ({name}): {e}")
+        return values
+
+    def snapshot(self):
+        # Plain-dict view for the JSON log and /metrics.json
+        with self.lock:
+            counters = [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in self.counters.items()]
+            histograms = [{'name': n, 'labels': dict(l), 'count': h.count, 'sum': h.sum,
+                           'p50': h.quantile(0.5), 'p99': h.quantile(0.99)}
+                          for (n, l), h in self.histograms.items()]
+            errors = list(self.errors)
+        return {'counters': counters, 'histograms': histograms, 'gauges': self.gauges(), 'errors': errors}
+
+    def prometheus(self):
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.buckets), list(h.counts), h.sum, h.count) for key, h in histograms]
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{format_labels(labels)} {value}")
+        for (name, labels), buckets, counts, total, count in histograms:
+            metric = f"{PREFIX}{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, n in zip(buckets + ['+Inf'], counts):
+                cumulative += n
+                lines.append(f"{metric}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{format_labels(labels)} {count}")
+        for name, value in sorted(self.gauges().items()):
+            lines.append(f"# TYPE {PREFIX}{name} gauge")
+            lines.append(f"{PREFIX}{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.errors.clear()
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+
+registry = Registry()
+
+
+# --- 2. RECORDING API ---
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+
+
+def count(name, value=1, **labels):
+    if ENABLED:
+        registry.inc(name, value, labels)
+
+
+def observe(name, value, buckets=SIZE_BUCKETS, **labels):
+    # Sizes and other distributions (payload bytes, markers per map, ...)
+    if ENABLED:
+        registry.observe(name, value, labels, buckets)
+
+
+def error(where, exc):
+    # Counts an error and keeps the last few messages for the JSON log
+    if ENABLED:
+        registry.inc('errors', 1, {'where': where})
+        with registry.lock:
+            registry.errors.append({'time': time.time(), 'where': where, 'error': f"{type(exc).__name__}: {exc}"})
+
+
+def register_collector(name, collect):
+    registry.collectors[name] = collect
+
+
+def series(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+class Timer:
+    # Records <name>_seconds; an exception also counts as an error for <name>
+    __slots__ = ('name', 'key', 'start')
+
+    def __init__(self, name, key):
+        self.name, self.key = name, key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        registry.observe_key(self.key, time.perf_counter() - self.start, LATENCY_BUCKETS)
+        if exc is not None:
+            error(self.name, exc)
+        return False
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+def timer(name, **labels):
+    # with metrics.timer('map_build'): ...
+    return Timer(name, series(f"{name}_seconds", labels)) if ENABLED else NULL_TIMER
+
+
+def timed(name=None, **labels):
+    # @metrics.timed('identify', kind='image') -> terranova_identify_seconds{kind="image"}
+    def decorator(fn):
+        metric = name or fn.__name__
+        key = series(f"{metric}_seconds", labels)  # label handling done once, not per call
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with Timer(metric, key):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- 3. EXPORT ---
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/metrics':
+            body, content_type = registry.prometheus().encode(), 'text/plain; version=0.0.4'
+        elif self.path.split('?')[0] == '/metrics.json':
+            body, content_type = json.dumps(registry.snapshot()).encode(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def write_log(path=LOG_FILE, max_bytes=LOG_MAX_MB * 2**20, backups=LOG_BACKUPS):
+    # Appends one snapshot line; past max_bytes the file becomes path.1 (path.1 -> path.2, ...)
+    if os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+        for i in range(backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        os.replace(path, f"{path}.1")
+    with open(path, 'a') as f:
+        f.write(json.dumps({'time': time.time(), **registry.snapshot()}) + "\n")
+
+
+def log_forever(path, every):
+    while True:
+        time.sleep(every)
+        try:
+            write_log(path)
+        except Exception as e:
+            print(f"❌ Metrics Log Error: {e}")
+
+
+_server = None
+_started = False
+_start_lock = threading.Lock()
+
+def start(port=PORT, log_file=LOG_FILE, log_every=LOG_EVERY):
+    """
+    Starts the /metrics endpoint and the JSON log writer once per process (pages call
+    this on every rerun). Does nothing unless metrics are enabled.
+    """
+    global _server, _started
+    if not ENABLED:
+        return None
+    with _start_lock:
+        if _started:
+            return _server
+        _started = True
+        try:
+            _server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True, name='metrics-server').start()
+        except OSError as e:
+            # Another app process on this machine already serves the port
+            print(f"⚠️ Metrics endpoint not started on port {port}: {e}")
+        if log_file:
+            threading.Thread(target=log_forever, args=(log_file, log_every), daemon=True,
+                             name='metrics-log').start()
+        return _server
@@ -0,0 +1,84 @@
+import importlib
+import os
+import threading
+import time
+
+import inference_service
+import metrics
+
+# Background loading for the Identify page's models. Pages import this instead of
+# image_processor/audio_processor, so transformers/birdnetlib are only imported (and the
+# models only loaded) in the warm-up thread or when a tab actually needs them. With an
+# inference service (inference_service.py) the models are loaded there instead.
+
+WARMUP = os.environ.get('TERRANOVA_WARMUP', '1') != '0'
+
+# name -> (module, loader). Either can load first: audio_processor keeps TensorFlow from
+# clashing with the torch stack the image model imports later.
+MODELS = {
+    'image': ('image_processor', 'load_image_model'),
+    'audio': ('audio_processor', 'load_audio_model'),
+}
+
+_status = {name: {'state': 'not loaded', 'seconds': None, 'error': None} for name in MODELS}
+_locks = {name: threading.Lock() for name in MODELS}
+_models = {}
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
+
+def load(name):
+    """
+    Imports and loads one model, blocking until it is ready. Safe to call from any
+    thread: if the warm-up thread is already loading it, this waits for that load
+    instead of starting a second one. With an inference service, waits until the
+    service has it loaded and returns the service's client.
+    """
+    module_name, loader = MODELS[name]
+    with _locks[name]:
+        if _status[name]['state'] != 'ready':
+            _status[name].update(state='loading', error=None)
+            start = time.perf_counter()
+            try:
+                with metrics.timer('model_load', model=name):
+                    if inference_service.remote():
+                        # The models live in the inference service: wait for it to have this one
+                        _models[name] = inference_service.get_client().wait_ready(name)
+                    else:
+                        _models[name] = getattr(importlib.import_module(module_name), loader)()
+            except Exception as e:
+                _status[name].update(state='error', error=str(e))
+                raise
+            _status[name].update(state='ready', seconds=time.perf_counter() - start)
+    return _models[name]
+
+
+def status(name=None):
+    # {'state': 'not loaded' | 'loading' | 'ready' | 'error', 'seconds', 'error'}
+    if name:
+        return dict(_status[name])
+    return {n: dict(s) for n, s in _status.items()}
+
+
+def is_ready(name):
+    return _status[name]['state'] == 'ready'
+
+
+def warm_up(names):
+    for name in names:
+        try:
+            load(name)
+        except Exception as e:
+            print(f"⚠️ Could not preload the {name} model: {e}")
+
+
+def start_warmup(names=tuple(MODELS)):
+    # Starts preloading once per server process; later calls return immediately
+    global _warmup_thread
+    if not WARMUP:
+        return None
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=warm_up, args=(names,), name='model-warmup', daemon=True)
+            _warmup_thread.start()
+    return _warmup_thread
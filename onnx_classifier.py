@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+# Optional CPU backend for the bird image classifier: the Hugging Face model exported to
+# ONNX (plus a dynamically int8-quantised copy) and run with ONNX Runtime.
+# Needs `pip install onnxruntime onnx` on top of requirements.txt.
+
+FP32_FILE = 'model.onnx'
+INT8_FILE = 'model.int8.onnx'
+
+
+# --- 1. EXPORT ---
+def export_onnx(model, image_processor, output_dir, quantize=True):
+    # Writes model.onnx (+ model.int8.onnx) with the config and preprocessor next to it,
+    # so the folder is self-contained for OnnxImageClassifier.
+    import torch
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = model.eval()
+    size = image_processor.size
+    height = size.get('height', size.get('shortest_edge', 224))
+    width = size.get('width', size.get('shortest_edge', 224))
+    dummy = torch.randn(1, model.config.num_channels, height, width)
+
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    torch.onnx.export(
+        model, (dummy,), fp32_path,
+        input_names=['pixel_values'], output_names=['logits'],
+        dynamic_axes={'pixel_values': {0: 'batch'}, 'logits': {0: 'batch'}},
+        dynamo=False,
+    )
+    model.config.save_pretrained(output_dir)
+    image_processor.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILE), weight_type=QuantType.QInt8)
+    return output_dir
+
+
+def export_from_hub(model_path, output_dir, quantize=True):
+    from transformers import AutoImageProcessor, AutoModelForImageClassification
+
+    print(f"🔄 Exporting {model_path} to ONNX...")
+    model = AutoModelForImageClassification.from_pretrained(model_path)
+    image_processor = AutoImageProcessor.from_pretrained(model_path)
+    export_onnx(model, image_processor, output_dir, quantize)
+    print(f"✅ Saved to {output_dir}")
+    return output_dir
+
+
+# --- 2. INFERENCE ---
+class Preprocessor:
+    """
+    NumPy re-implementation of the ViT-style image processor (resize, optional centre crop,
+    rescale, normalise) driven by the exported preprocessor_config.json, so inference does
+    not have to import transformers/torch at all.
+    """
+
+    def __init__(self, model_dir):
+        with open(os.path.join(model_dir, 'preprocessor_config.json')) as f:
+            cfg = json.load(f)
+        self.size = cfg.get('size', {'height': 224, 'width': 224})
+        self.do_resize = cfg.get('do_resize', True)
+        self.resample = cfg.get('resample', Image.BILINEAR)
+        self.crop_size = cfg.get('crop_size') if cfg.get('do_center_crop') else None
+        self.rescale_factor = cfg.get('rescale_factor', 1 / 255) if cfg.get('do_rescale', True) else 1.0
+        self.mean = np.array(cfg.get('image_mean', [0.5, 0.5, 0.5]), dtype=np.float32) if cfg.get('do_normalize', True) else None
+        self.std = np.array(cfg.get('image_std', [0.5, 0.5, 0.5]), dtype=np.float32)
+
+    def resize(self, img):
+        if 'height' in self.size:
+            return img.resize((self.size['width'], self.size['height']), self.resample)
+        # shortest_edge: scale so the short side matches, keeping the aspect ratio
+        edge = self.size['shortest_edge']
+        scale = edge / min(img.size)
+        return img.resize((round(img.width * scale), round(img.height * scale)), self.resample)
+
+    def center_crop(self, img):
+        w, h = self.crop_size['width'], self.crop_size['height']
+        left, top = (img.width - w) // 2, (img.height - h) // 2
+        return img.crop((left, top, left + w, top + h))
+
+    def __call__(self, images):
+        batch = []
+        for img in images:
+            img = img.convert('RGB')
+            if self.do_resize:
+                img = self.resize(img)
+            if self.crop_size:
+                img = self.center_crop(img)
+            pixels = np.asarray(img, dtype=np.float32) * self.rescale_factor
+            if self.mean is not None:
+                pixels = (pixels - self.mean) / self.std
+            batch.append(pixels.transpose(2, 0, 1))
+        return np.stack(batch)
+
+
+class OnnxImageClassifier:
+    """
+    Drop-in for the transformers image-classification pipeline on CPU: called with one
+    image it returns [{'label', 'score'}, ...]; with a list, one such list per image.
+    """
+
+    def __init__(self, model_dir, quantized=False, intra_op_threads=0):
+        import onnxruntime as ort
+
+        with open(os.path.join(model_dir, 'config.json')) as f:
+            config = json.load(f)
+        self.labels = {int(i): label for i, label in config['id2label'].items()}
+        self.sigmoid = len(self.labels) == 1 or config.get('problem_type') == 'multi_label_classification'
+        self.image_processor = Preprocessor(model_dir)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads  # 0 = let ONNX Runtime decide
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        model_file = os.path.join(model_dir, INT8_FILE if quantized else FP32_FILE)
+        self.session = ort.InferenceSession(model_file, options, providers=['CPUExecutionProvider'])
+
+    def scores(self, logits):
+        # Same post-processing as the pipeline: sigmoid for single/multi-label heads, else softmax
+        if self.sigmoid:
+            return 1 / (1 + np.exp(-logits))
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def __call__(self, images, top_k=5, batch_size=8):
+        single = not isinstance(images, (list, tuple))
+        images = [images] if single else list(images)
+        top_k = min(top_k, len(self.labels))
+
+        results = []
+        for i in range(0, len(images), batch_size):
+            pixels = self.image_processor(images[i:i + batch_size])
+            probs = self.scores(self.session.run(['logits'], {'pixel_values': pixels})[0])
+            for row in probs:
+                best = np.argsort(-row, kind='stable')[:top_k]
+                results.append([{'label': self.labels[int(j)], 'score': float(row[j])} for j in best])
+        return results[0] if single else results
+
+
+def load_onnx_classifier(model_path, model_dir, quantized=False, intra_op_threads=0):
+    # Export once on first use, then load straight from disk
+    needed = INT8_FILE if quantized else FP32_FILE
+    if not os.path.exists(os.path.join(model_dir, needed)):
+        export_from_hub(model_path, model_dir, quantize=True)
+    return OnnxImageClassifier(model_dir, quantized, intra_op_threads)
+
+
+# --- 3. ACCURACY PARITY ---
+def parity_report(reference, candidate, paths, top_k=3):
+    # Compares a candidate classifier against the PyTorch pipeline on the same photos
+    top1 = topk_sets = 0
+    max_diff = 0.0
+    for path in paths:
+        img = Image.open(path).convert('RGB')
+        ref = reference(img, top_k=top_k)
+        cand = candidate(img, top_k=top_k)
+        top1 += ref[0]['label'] == cand[0]['label']
+        topk_sets += {p['label'] for p in ref} == {p['label'] for p in cand}
+        ref_scores = {p['label']: p['score'] for p in ref}
+        max_diff = max([max_diff] + [abs(ref_scores[p['label']] - p['score']) for p in cand if p['label'] in ref_scores])
+    n = max(len(paths), 1)
+    return {'images': len(paths), 'top1_agreement': top1 / n, 'topk_set_agreement': topk_sets / n,
+            'max_score_diff': max_diff}
+
+
+# python onnx_classifier.py export
+# python onnx_classifier.py parity path/to/bird_images_dataset --limit 200
+if __name__ == "__main__":
+    from image_io import find_images
+    from image_processor import MODEL_PATH, ONNX_MODEL_DIR
+
+    parser = argparse.ArgumentParser(description="Export the bird classifier to ONNX and check it against PyTorch.")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("directory", nargs="?", help="image folder for the parity check")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_from_hub(MODEL_PATH, ONNX_MODEL_DIR)
+    else:
+        from transformers import pipeline
+
+        paths = list(find_images(args.directory))[:args.limit]
+        reference = pipeline("image-classification", model=MODEL_PATH)
+        for quantized in (False, True):
+            candidate = load_onnx_classifier(MODEL_PATH, ONNX_MODEL_DIR, quantized, args.threads)
+            report = parity_report(reference, candidate, paths)
+            print(f"{'int8' if quantized else 'fp32'}: {report['images']} images, "
+                  f"top-1 agreement {report['top1_agreement']:.1%}, "
+                  f"top-k set agreement {report['topk_set_agreement']:.1%}, "
+                  f"max score diff {report['max_score_diff']:.4f}")
@@ -2,10 +2,12 @@ import streamlit as st
 from datetime import datetime
 from streamlit_js_eval import get_geolocation
 
-# Import helpers and models
+# Import helpers (the models are imported and loaded lazily, see model_loader.py, or
+# live in the inference service, see inference_service.py)
 import utils
-from audio_processor import identify_bird_sound, load_audio_model
-from image_processor import identify_bird_image, load_image_model
+import model_loader
+import metrics
+import inference_service
 
 st.set_page_config(page_title="Identify Species", page_icon="🔍")
 
@@ -14,10 +16,28 @@ if 'logged_in' not in st.session_state or not st.session_state['logged_in']:
     st.warning("Please login on the Home page first.")
     st.stop()
 
-# Load Models
-with st.spinner("Loading AI Models..."):
-    load_audio_model()
-    load_image_model()
+# Preload models in the background (once per server); the page renders straight away
+model_loader.start_warmup()
+metrics.start()
+
+def model_status(name):
+    # Shows the model's readiness, re-checking every couple of seconds while it loads
+    @st.fragment(run_every=None if model_loader.is_ready(name) else 2)
+    def show():
+        info = model_loader.status(name)
+        if info['state'] == 'ready':
+            st.caption("🟢 Model ready")
+        elif info['state'] == 'error':
+            st.caption(f"🔴 Model failed to load: {info['error']}")
+        else:
+            st.caption("🟡 Model warming up... you can already take a photo or record.")
+    show()
+
+def require_model(name):
+    # Per-tab, on-demand: waits for (or starts) this tab's model only
+    if not model_loader.is_ready(name):
+        with st.spinner("Loading AI Model..."):
+            model_loader.load(name)
 
 # Get Location
 loc = get_geolocation()
@@ -32,12 +52,14 @@ tab1, tab2 = st.tabs(["📸 Visual Scanner", "🎙️ Audio Scanner"])
 # --- TAB 1: VISUAL SCANNER ---
 with tab1:
     st.header("Visual Scanner")
+    model_status('image')
     img_file = st.camera_input("Take a photo")
 
     if img_file:
         st.write("Processing...")
         try:
-            results = identify_bird_image(img_file)
+            require_model('image')
+            results = inference_service.identify_bird_image(img_file)
             top_match = results[0]
             common_name = top_match['name']
             confidence = top_match['score']
@@ -47,7 +69,7 @@ with tab1:
                 
                 # --- 1. LINK TO RESOURCES ---
                 st.page_link(
-                    "pages/2_Resources.py", 
+                    "pages/2_Field_Guide.py", 
                     label=f"📖 Learn about {common_name}", 
                     icon="🌿",
                     use_container_width=True,
@@ -58,25 +80,26 @@ with tab1:
                 if st.button("✅ Confirm & Upload", use_container_width=True, key="save_img"):
                     date = datetime.now().strftime("%d/%m/%Y")
                     time = datetime.now().strftime("%H:%M:%S")
-                    utils.save_new_sighting(date, time, user_lat, user_lon, common_name)
+                    utils.save_new_sighting(date, time, user_lat, user_lon, common_name, st.session_state['user'])
                     st.balloons()
             else:
                 st.warning(f"Unsure. Best guess: {common_name}")
         except Exception as e:
             st.error(f"Error: {e}")
+            metrics.error('identify_image', e)
 
 # --- TAB 2: AUDIO SCANNER ---
 with tab2:
     st.header("Bio-Acoustics")
+    model_status('audio')
     audio_value = st.audio_input("Record Sound")
 
     if audio_value:
         st.audio(audio_value)
-        temp_filename = "temp_recording.wav"
-        with open(temp_filename, "wb") as f:
-            f.write(audio_value.read())       
         try:
-            matches = identify_bird_sound(temp_filename)
+            require_model('audio')
+            # Decoded in memory: no temp file shared between sessions
+            matches = inference_service.identify_bird_sound(audio_value, lat=user_lat, lon=user_lon)
             if matches:
                 st.success(f"**{len(matches)} Species Detected**")
                 
@@ -88,12 +111,13 @@ with tab2:
                         
                         with col_info:
                             st.markdown(f"**{bird['name']}**")
-                            st.caption(f"Confidence: {bird['score']:.0f}%")
+                            st.caption(f"Confidence: {bird['score']:.0f}%"
+                                       + (f" · Expected here this season: {bird['prior']:.0f}%" if 'prior' in bird else ""))
                             
                         with col_link:
                             # Small link button for each specific bird
                             st.page_link(
-                                "pages/2_Resources.py",
+                                "pages/2_Field_Guide.py",
                                 label="Learn",
                                 icon="📖",
                                 query_params={"species": bird['name']}
@@ -102,4 +126,5 @@ with tab2:
             else:
                 st.warning("No clear bird calls detected.")
         except Exception as e:
-            st.error(f"Error: {e}")
\ No newline at end of file
+            st.error(f"Error: {e}")
+            metrics.error('identify_audio', e)
\ No newline at end of file
@@ -0,0 +1,256 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from filelock import FileLock, Timeout
+
+import metrics
+import storage
+
+# Write-behind queue for new sightings, so "Confirm & Upload" returns straight away.
+# submit() appends the sighting to a local journal (flushed and fsynced) and returns;
+# one worker thread writes queued sightings to the store in batches, at most one batch
+# every FLUSH_SECS, so a burst of uploads costs one store write and one hotspot update
+# instead of one per sighting. The journal is replayed on start-up: a sighting that was
+# acknowledged is never lost, even if the process is killed.
+#
+# Each server process has its own journal (JOURNAL_FILE.<pid>), locked for as long as its
+# queue runs. A new queue adopts the journals nobody holds any more (their process died)
+# into its own, so every pending sighting is replayed by exactly one process.
+
+JOURNAL_FILE = os.environ.get('TERRANOVA_JOURNAL', 'sightings_journal.jsonl')
+FLUSH_SECS = float(os.environ.get('TERRANOVA_FLUSH_SECS', '2'))
+BATCH_MAX = 500                  # sightings per store write
+JOURNAL_MAX_BYTES = 1 * 2**20    # rewrite the journal (dropping saved entries) past this size
+
+
+def read_journal(path):
+    """
+    Replays the journal: returns (pending [(key, row)], uncertain keys). Lines are
+      {"op": "add", "key", "row"}   - a submitted sighting
+      {"op": "begin", "keys"}       - a batch is being written to the store
+      {"op": "done", "keys"}        - ... and was committed
+    'uncertain' are keys of a batch that began but never finished: the store may or may
+    not have them. A torn last line (killed mid-write) was never acknowledged: skipped.
+    """
+    pending, begun = {}, set()
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry['op'] == 'add':
+                    pending[entry['key']] = entry['row']
+                elif entry['op'] == 'begin':
+                    begun.update(entry['keys'])
+                elif entry['op'] == 'done':
+                    for key in entry['keys']:
+                        pending.pop(key, None)
+                        begun.discard(key)
+    except FileNotFoundError:
+        pass
+    return list(pending.items()), begun & pending.keys()
+
+
+def already_stored(store, row):
+    # Whether the store has this exact sighting (used only for uncertain keys on restart).
+    # Stores don't keep the journal key, so a sighting is matched on all of its fields: if
+    # the same user submitted the same species at the same spot and second twice, and the
+    # process died while the second was uncertain, the second is taken as saved and dropped.
+    date, time_observed, lat, lon, common_name, username = row
+    try:
+        day = datetime.strptime(date, "%d/%m/%Y")
+    except (TypeError, ValueError):
+        day = None
+    eps = 1e-9   # a CSV round trip can move the last bit of a float
+    df = store.load_sightings(['time_observed', 'latitude', 'longitude', 'username'], species=common_name,
+                              bounds=[[lat - eps, lon - eps], [lat + eps, lon + eps]], start=day, end=day)
+    # A missing username comes back as None, NaN or '' depending on the backend
+    same_user = df['username'].fillna('').astype(str) == (username or '')
+    return bool(((df['time_observed'] == time_observed) & same_user).any())
+
+
+def orphaned_journals(journal_file):
+    # Journals of queues that are gone: [(path, its lock, acquired)]. The un-suffixed
+    # journal_file is one too (written before journals were per process).
+    paths = [journal_file] + [path for path in glob.glob(glob.escape(journal_file) + '.*')
+                              if path.rsplit('.', 1)[1].isdigit()]
+    orphans = []
+    for path in paths:
+        if path == f"{journal_file}.{os.getpid()}" or not os.path.exists(path):
+            continue
+        lock = FileLock(path + '.lock', thread_local=False)
+        try:
+            lock.acquire(timeout=0)
+        except Timeout:
+            continue   # its queue is still running
+        orphans.append((path, lock))
+    return orphans
+
+
+class SightingQueue:
+    """
+    Durable submission queue in front of a store. submit() is safe from any session
+    thread; store is a callable returning the store, resolved by the worker so a
+    submission never waits for the store to open.
+    """
+
+    def __init__(self, store=storage.get_store, journal_file=JOURNAL_FILE, flush_secs=FLUSH_SECS):
+        self.store = store
+        self.journal_file = f"{journal_file}.{os.getpid()}"
+        self.journal_lock = FileLock(self.journal_file + '.lock', thread_local=False)
+        self.journal_lock.acquire()
+        self.flush_secs = flush_secs
+        self.lock = threading.Condition()
+        pending, self.uncertain = read_journal(self.journal_file)
+        orphans = orphaned_journals(journal_file)
+        for path, _ in orphans:
+            adopted, uncertain = read_journal(path)
+            pending += adopted
+            self.uncertain |= uncertain
+        self.pending = deque(dict(pending).items())
+        self.saved = 0
+        self.version = 0          # bumped after every committed batch
+        self.last_flush = 0.0
+        self.stopping = False
+        self.journal = open(self.journal_file, 'a', encoding='utf-8')
+        self.compact_journal()
+        # Only now that our own journal has their entries (fsynced) are the orphans gone
+        for path, lock in orphans:
+            os.remove(path)
+            os.remove(lock.lock_file)
+            lock.release()
+        self.worker = threading.Thread(target=self.run, name='sighting-queue', daemon=True)
+        self.worker.start()
+
+    # --- JOURNAL ---
+    def append(self, *entries):
+        # Caller holds self.lock
+        self.journal.write(''.join(json.dumps(entry) + "\n" for entry in entries))
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+
+    def compact_journal(self):
+        # Rewrites the journal with only what is still queued
+        with self.lock:
+            entries = [{'op': 'add', 'key': key, 'row': row} for key, row in self.pending]
+            if self.uncertain:
+                entries.append({'op': 'begin', 'keys': sorted(self.uncertain)})
+            tmp_file = self.journal_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(entry) + "\n" for entry in entries))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.journal_file)
+            self.journal.close()
+            self.journal = open(self.journal_file, 'a', encoding='utf-8')
+
+    # --- SUBMIT ---
+    @metrics.timed('sighting_submit')
+    def submit(self, date, time_observed, lat, lon, common_name, username):
+        # Returns once the sighting is in the journal; it reaches the store within ~FLUSH_SECS
+        key = uuid.uuid4().hex
+        row = [date, time_observed, float(lat), float(lon), common_name, username]
+        with self.lock:
+            self.append({'op': 'add', 'key': key, 'row': row})
+            self.pending.append((key, row))
+            self.lock.notify()
+        return key
+
+    def status(self):
+        with self.lock:
+            return {'queued': len(self.pending), 'saved': self.saved, 'version': self.version}
+
+    # --- WORKER ---
+    def run(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self.stopping:
+                    self.lock.wait()
+                if self.stopping and not self.pending:
+                    return
+            # Coalesce: whatever arrives until the next flush slot goes into the same batch
+            delay = self.last_flush + self.flush_secs - time.monotonic()
+            if delay > 0 and not self.stopping:
+                time.sleep(delay)
+            if not self.flush():
+                if self.stopping:
+                    return                    # left in the journal for the next start
+                time.sleep(self.flush_secs)   # store unavailable: retry the same batch later
+
+    def flush(self):
+        # Writes up to BATCH_MAX queued sightings to the store; False if the store failed
+        with self.lock:
+            batch = [self.pending[i] for i in range(min(BATCH_MAX, len(self.pending)))]
+        if not batch:
+            return True
+        self.last_flush = time.monotonic()
+        begun = False
+        try:
+            store = self.store()
+            if self.uncertain:
+                # Restarted after a crash mid-batch: skip what that batch already committed
+                stored = {key for key, row in batch if key in self.uncertain and already_stored(store, row)}
+                with self.lock:
+                    if stored:
+                        self.append({'op': 'done', 'keys': sorted(stored)})
+                        self.pending = deque(item for item in self.pending if item[0] not in stored)
+                    self.uncertain -= {key for key, _ in batch}
+                batch = [item for item in batch if item[0] not in stored]
+            keys = [key for key, _ in batch]
+            with self.lock:
+                self.append({'op': 'begin', 'keys': keys})
+            begun = True
+            if batch:
+                store.add_sightings([row for _, row in batch])
+        except Exception as e:
+            print(f"❌ Sighting Queue Error: {e}")
+            metrics.error('sighting_queue', e)
+            if begun:
+                # The store may have committed part of the batch: check before retrying it
+                with self.lock:
+                    self.uncertain.update(key for key, _ in batch)
+            return False
+
+        with self.lock:
+            self.append({'op': 'done', 'keys': keys})
+            for _ in batch:
+                self.pending.popleft()
+            self.saved += len(batch)
+            self.version += 1
+            compact = not self.pending and self.journal.tell() > JOURNAL_MAX_BYTES
+        metrics.observe('sighting_batch', len(batch), buckets=metrics.COUNT_BUCKETS)
+        if compact:
+            self.compact_journal()
+        return True
+
+    def close(self, timeout=10):
+        # Drains the queue (what doesn't make it stays in the journal for the next start)
+        with self.lock:
+            self.stopping = True
+            self.lock.notify()
+        self.worker.join(timeout)
+        if not self.worker.is_alive():
+            self.journal.close()
+            self.journal_lock.release()   # whatever is left is adopted by the next queue
+
+
+# One queue per process, like the store it writes to
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = SightingQueue()
+            atexit.register(_queue.close)
+        return _queue
@@ -0,0 +1,151 @@
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+import hotspots
+import metrics
+import storage
+
+# --- CONFIG ---
+BUCKET_DEG = 0.01          # ~1.1km buckets, each holding the 3-decimal grid squares inside it
+EARTH_RADIUS_M = 6371000.0
+M_PER_DEG_LAT = math.pi * EARTH_RADIUS_M / 180
+
+
+# --- 1. DISTANCE ---
+def haversine_m(lat, lon, lats, lons):
+    # Great-circle distance in metres from one point to arrays of points
+    lat, lon = np.radians(lat), np.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def bucket_of(lat, lon):
+    return (math.floor(lat / BUCKET_DEG), math.floor(lon / BUCKET_DEG))
+
+
+# --- 2. INDEX ---
+class HotspotIndex:
+    """
+    Buckets the verified hotspot grid squares into ~1km cells, per species, so radius and
+    nearest-neighbour queries only look at the few cells around the user instead of the
+    whole hotspot table. Counts are updated in place as new sightings are saved.
+    """
+
+    def __init__(self, df=None):
+        # bucket -> species -> {(lat, lon): sighting_count}
+        self.buckets = {}
+        self.arrays = {}
+        self.lock = threading.Lock()
+        if df is not None:
+            self.load(df)
+
+    @metrics.timed('index_build', index='spatial')
+    def load(self, df):
+        buckets = {}
+        keys = zip(np.floor(df['lat'].to_numpy() / BUCKET_DEG).astype(int),
+                   np.floor(df['lon'].to_numpy() / BUCKET_DEG).astype(int))
+        for key, name, lat, lon, n in zip(keys, df['common_name'], df['lat'], df['lon'], df['sighting_count']):
+            buckets.setdefault(key, {}).setdefault(name, {})[(float(lat), float(lon))] = int(n)
+        with self.lock:
+            self.buckets = buckets
+            self.arrays = {}
+
+    def update(self, common_name, lat, lon, sighting_count):
+        # Storage listener: a grid square's count changed (only verified squares are indexed).
+        # Counts only grow, so a count replayed late or twice never lowers a newer one.
+        if sighting_count < hotspots.MIN_SIGHTINGS:
+            return
+        key = bucket_of(lat, lon)
+        with self.lock:
+            cells = self.buckets.setdefault(key, {}).setdefault(common_name, {})
+            cell = (float(lat), float(lon))
+            cells[cell] = max(cells.get(cell, 0), int(sighting_count))
+            self.arrays.pop((key, common_name), None)
+
+    def __len__(self):
+        return sum(len(cells) for species in self.buckets.values() for cells in species.values())
+
+    # --- QUERIES ---
+    def cell_arrays(self, key, name):
+        # (lats, lons, counts) of one bucket + species, converted once and reused until it changes
+        arrays = self.arrays.get((key, name))
+        if arrays is None:
+            cells = self.buckets[key][name]
+            coords = np.array(list(cells.keys()), dtype=float).reshape(-1, 2)
+            arrays = (coords[:, 0], coords[:, 1], np.fromiter(cells.values(), dtype=np.int64, count=len(cells)))
+            self.arrays[(key, name)] = arrays
+        return arrays
+
+    def candidates(self, lat, lon, ring, species=None, radius_m=None):
+        # Grid squares in the (2 * ring + 1)^2 buckets around the point, with their distance
+        bx, by = bucket_of(lat, lon)
+        names, parts = [], []
+        with self.lock:
+            for x in range(bx - ring, bx + ring + 1):
+                for y in range(by - ring, by + ring + 1):
+                    bucket = self.buckets.get((x, y))
+                    if not bucket:
+                        continue
+                    for name in ([species] if species else bucket):
+                        if name in bucket:
+                            names.append(name)
+                            parts.append(self.cell_arrays((x, y), name))
+
+        if not parts:
+            return pd.DataFrame(columns=['common_name', 'lat', 'lon', 'sighting_count', 'distance_m'])
+        lats = np.concatenate([p[0] for p in parts])
+        lons = np.concatenate([p[1] for p in parts])
+        counts = np.concatenate([p[2] for p in parts])
+        labels = np.repeat(np.array(names, dtype=object), [len(p[0]) for p in parts])
+        dist = haversine_m(lat, lon, lats, lons)
+        if radius_m is not None:
+            keep = dist <= radius_m
+            labels, lats, lons, counts, dist = labels[keep], lats[keep], lons[keep], counts[keep], dist[keep]
+        order = np.argsort(dist, kind='stable')
+        return pd.DataFrame({
+            'common_name': labels[order], 'lat': lats[order], 'lon': lons[order],
+            'sighting_count': counts[order], 'distance_m': dist[order],
+        })
+
+    def rings_for(self, lat, radius_m):
+        # Buckets to search either side so the whole radius is covered (longitude shrinks with latitude)
+        deg = radius_m / (M_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+        return int(math.ceil(deg / BUCKET_DEG))
+
+    def within(self, lat, lon, radius_m, species=None):
+        return self.candidates(lat, lon, self.rings_for(lat, radius_m), species, radius_m)
+
+    def nearest(self, lat, lon, k=5, species=None, max_radius_m=50000):
+        # Widen the search ring until k hits are found and nothing closer can lie outside it
+        ring = 1
+        max_ring = self.rings_for(lat, max_radius_m)
+        while True:
+            found = self.candidates(lat, lon, ring, species, max_radius_m).head(k)
+            covered_m = ring * BUCKET_DEG * M_PER_DEG_LAT * math.cos(math.radians(lat))
+            if ring >= max_ring or (len(found) == k and found['distance_m'].iloc[-1] <= covered_m):
+                return found
+            ring *= 2
+
+
+# One index per process, built from the store's hotspots and kept current from the
+# store's change log (sightings saved by this process and the others alike). Counts only
+# grow between rebuilds, so every count since the build is replayed: the highest wins.
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+def build_index():
+    return HotspotIndex(storage.get_store().load_hotspots()), 0
+
+def get_index():
+    global _index, _index_version
+    with _index_lock:
+        if _index is not None:
+            _index_version = storage.follow(_index_version, listener=_index.update)
+        if _index_version is None:
+            _index, _index_version, _ = storage.build_current(build_index, listener='update')
+        return _index
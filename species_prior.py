@@ -0,0 +1,210 @@
+import os
+import pickle
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import storage
+
+# How likely each species is at a place and time of year, for filtering and re-ranking
+# BirdNET detections. BirdNET's location model scores every species for (lat, lon, week
+# of the year); birdnetlib re-runs it for every distinct GPS fix. Here it runs once per
+# (CELL_DEG grid cell, week), cached in memory and in PRIOR_FILE, and is blended with
+# how often each species was sighted in that cell around that week in our own data.
+
+PRIOR_FILE = os.environ.get('TERRANOVA_PRIORS', 'species_priors.pkl')
+CELL_DEG = 0.25            # ~28km cells: the location model barely changes within one
+LOCATION_THRESHOLD = 0.03  # BirdNET's own location filter threshold
+LOCAL_WEIGHT = 0.3         # share of the prior that comes from our sightings
+WEEK_WINDOW = 2            # sightings within +-2 BirdNET weeks (~2 calendar weeks) count for the season
+PRIOR_FLOOR = 0.5          # rank = confidence * (PRIOR_FLOOR + (1 - PRIOR_FLOOR) * prior)
+PRECOMPUTE_BBOX = (1.15, 1.48, 103.60, 104.10)   # south, north, west, east: Singapore
+
+
+def week_48(dates):
+    # BirdNET's week of the year (1-48, birdnetlib's return_week_48_from_datetime) for a
+    # datetime, or for an array of DD/MM/YYYY strings (0 where unparseable)
+    if not isinstance(dates, (pd.Series, np.ndarray, list)):
+        day, days = dates.timetuple().tm_yday, 365 + pd.Timestamp(dates).is_leap_year
+        return int(np.ceil(day / days * 48))
+    parsed = pd.to_datetime(pd.Series(dates, dtype=object), format="%d/%m/%Y", errors='coerce')
+    weeks = np.ceil(parsed.dt.dayofyear / (365 + parsed.dt.is_leap_year) * 48)
+    return weeks.fillna(0).to_numpy(dtype=np.int64)
+
+
+def cell_of(lat, lon):
+    return (round(np.floor(lat / CELL_DEG) * CELL_DEG, 6), round(np.floor(lon / CELL_DEG) * CELL_DEG, 6))
+
+
+def cell_bounds(cell):
+    return [[cell[0], cell[1]], [cell[0] + CELL_DEG, cell[1] + CELL_DEG]]
+
+
+class SpeciesPriors:
+    """
+    prior(lat, lon, date) -> {common_name: 0..1}, blending the location model's score
+    with the species' share of our sightings in the cell around that week (relative to
+    the most sighted species). rerank() applies it to a list of detections.
+
+    location_model: callable returning birdnetlib's SpeciesList (only called on a miss).
+    """
+
+    def __init__(self, location_model, model_version, store=storage.get_store, prior_file=PRIOR_FILE):
+        self.location_model = location_model
+        self.model_version = model_version
+        self.store = store
+        self.prior_file = prior_file
+        self.location = self.read()    # {(cell_lat, cell_lon, week): {common_name: score}}
+        self.local = {}                # {cell: ({common_name: row}, counts (rows, 49))}
+        self.blended = {}              # {(cell, week): prior}
+        self.forgotten = 0             # bumped whenever cells are forgotten
+        self.lock = threading.Lock()
+        self.model_lock = threading.Lock()
+
+    # --- LOCATION MODEL ---
+    def read(self):
+        try:
+            with open(self.prior_file, 'rb') as f:
+                cached = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return {}
+        # Scores from another BirdNET version don't apply
+        return cached['cells'] if cached.get('model') == self.model_version else {}
+
+    def save(self):
+        with self.lock:
+            state = {'model': self.model_version, 'cells': dict(self.location)}
+        tmp_file = f"{self.prior_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, self.prior_file)
+
+    def location_prior(self, cell, week, save=True):
+        key = (*cell, week)
+        found = self.location.get(key)
+        if found is None:
+            centre = (cell[0] + CELL_DEG / 2, cell[1] + CELL_DEG / 2)
+            with self.model_lock, metrics.timer('species_prior_build'):
+                # SpeciesList keeps the query on itself: one caller at a time
+                species = self.location_model().return_list(lat=centre[0], lon=centre[1], week_48=week,
+                                                            threshold=LOCATION_THRESHOLD)
+            found = {s['common_name']: float(s['threshold']) for s in species}
+            with self.lock:
+                self.location[key] = found
+            if save:
+                self.save()
+        return found
+
+    def precompute(self, bbox=PRECOMPUTE_BBOX):
+        # Every cell of bbox x 48 weeks, saved once at the end
+        south, north, west, east = bbox
+        cells = [cell_of(lat, lon) for lat in np.arange(south, north + CELL_DEG, CELL_DEG)
+                 for lon in np.arange(west, east + CELL_DEG, CELL_DEG)]
+        for cell in dict.fromkeys(cells):
+            for week in range(1, 49):
+                self.location_prior(cell, week, save=False)
+        self.save()
+        return len(self.location)
+
+    # --- OUR SIGHTINGS ---
+    def local_counts(self, cell):
+        # Per species x week-of-year sightings in one cell, read once with a bounds filter
+        entry = self.local.get(cell)
+        if entry is None:
+            forgotten = self.forgotten
+            try:
+                df = self.store().load_sightings(['common_name', 'date_observed'], bounds=cell_bounds(cell))
+            except FileNotFoundError:
+                df = pd.DataFrame(columns=['common_name', 'date_observed'])
+            codes, names = pd.factorize(df['common_name'].astype(str))
+            counts = np.zeros((len(names), 49), dtype=np.int64)
+            np.add.at(counts, (codes, week_48(df['date_observed'].to_numpy())), 1)
+            entry = ({name: i for i, name in enumerate(names)}, counts)
+            with self.lock:
+                # Not kept if a sighting made the cell stale while it was being read
+                if self.forgotten == forgotten:
+                    self.local.setdefault(cell, entry)
+        return entry
+
+    def forget_cell(self, common_name, lat, lon, date=None, time=None):
+        # Storage sighting listener: a new sighting's cell is read again when next needed.
+        # (Counting it instead could count it twice: the cell may have been read after
+        # the sighting was saved but before it was replayed.)
+        cell = cell_of(lat, lon)
+        with self.lock:
+            self.forgotten += 1
+            self.local.pop(cell, None)
+            for key in [k for k in self.blended if k[0] == cell]:
+                del self.blended[key]
+
+    def forget_sightings(self):
+        # Counts are read again from the store, cell by cell, as they are needed
+        with self.lock:
+            self.forgotten += 1
+            self.local.clear()
+            self.blended.clear()
+
+    def local_shares(self, cell, week):
+        rows, counts = self.local_counts(cell)
+        window = [(week - 1 + d) % 48 + 1 for d in range(-WEEK_WINDOW, WEEK_WINDOW + 1)]
+        seen = counts[:, window].sum(axis=1)
+        if not seen.any():
+            return {}
+        shares = seen / seen.max()
+        return {name: float(shares[i]) for name, i in rows.items() if seen[i]}
+
+    # --- PRIORS ---
+    def prior(self, lat, lon, date):
+        cell, week = cell_of(lat, lon), week_48(date)
+        found = self.blended.get((cell, week))
+        if found is None:
+            location, local = self.location_prior(cell, week), self.local_shares(cell, week)
+            found = {name: (1 - LOCAL_WEIGHT) * location.get(name, 0.0) + LOCAL_WEIGHT * local.get(name, 0.0)
+                     for name in location.keys() | local.keys()}
+            with self.lock:
+                self.blended[(cell, week)] = found
+        return found
+
+    def rerank(self, matches, lat, lon, date):
+        """
+        Drops detections of species that are neither expected here at this time of year
+        nor ever sighted here (what BirdNET's own location filter did), adds each one's
+        'prior' (%) and sorts by confidence weighted with the prior.
+        """
+        prior = self.prior(lat, lon, date)
+        ranked = [{**m, 'prior': round(prior[m['name']] * 100, 1)} for m in matches if prior.get(m['name'], 0) > 0]
+        ranked.sort(key=lambda m: m['score'] * (PRIOR_FLOOR + (1 - PRIOR_FLOOR) * m['prior'] / 100), reverse=True)
+        return ranked
+
+
+# One table per process. Cells with new sightings in the store's change log (saved by
+# this process or another) are re-read when next needed, every cell after a rebuild.
+_priors = None
+_priors_version = None
+_priors_lock = threading.Lock()
+
+def get_priors(location_model, model_version):
+    global _priors, _priors_version
+    with _priors_lock:
+        if _priors is None:
+            _priors_version = storage.data_version()
+            _priors = SpeciesPriors(location_model, model_version)
+            return _priors
+        _priors_version = storage.follow(_priors_version, sighting_listener=_priors.forget_cell)
+        if _priors_version is None:
+            _priors.forget_sightings()
+            _priors_version = storage.data_version()
+        return _priors
+
+
+# python species_prior.py build   -> precompute the location model for every Singapore cell and week
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'build':
+        import audio_processor
+        count = audio_processor.get_priors().precompute()
+        print(f"✅ {count} cell/week priors saved to {PRIOR_FILE}")
+    else:
+        print("Usage: python species_prior.py build")
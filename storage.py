@@ -0,0 +1,795 @@
+import csv
+import functools
+import glob
+import json
+import operator
+import os
+import sqlite3
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from filelock import FileLock
+
+import hotspots
+import metrics
+
+# --- CONFIG ---
+# Pick the backend with TERRANOVA_STORAGE=sqlite|csv|parquet (SQLite is the default).
+STORAGE_BACKEND = os.environ.get('TERRANOVA_STORAGE', 'sqlite')
+DB_FILE = os.environ.get('TERRANOVA_DB', 'terranova.db')
+PARQUET_DIR = os.environ.get('TERRANOVA_PARQUET_DIR', 'sightings_parquet')
+PARQUET_HOTSPOTS_FILE = os.environ.get('TERRANOVA_PARQUET_HOTSPOTS', 'final_hotspots.parquet')
+# Bumped on every change to sightings/hotspots, so each server process can tell when its
+# in-memory copies (load_data, spatial/activity indexes, pyramid) went stale; what each
+# version changed is appended to CHANGE_LOG_FILE for them to replay
+DATA_VERSION_FILE = os.environ.get('TERRANOVA_DATA_VERSION', 'hotspots.version')
+CHANGE_LOG_FILE = DATA_VERSION_FILE + '.log'
+CHANGE_LOG_MAX_BYTES = 4 * 2**20   # then the log starts over (anything older is rebuilt)
+CHANGE_CACHE = 4096                # log entries each process keeps parsed
+
+SIGHTING_COLUMNS = ['id', 'date_observed', 'time_observed', 'latitude', 'longitude', 'common_name', 'username']
+HOTSPOT_COLUMNS = ['common_name', 'lat', 'lon', 'sighting_count']
+
+
+# Sightings handed to add_sightings(): (date, time, lat, lon, common_name, username) tuples
+SIGHTING_FIELDS = ['date_observed', 'time_observed', 'latitude', 'longitude', 'common_name', 'username']
+
+
+def notify(listeners, *args):
+    # Stores call these after a sighting is committed:
+    #   listeners(common_name, lat_grid, lon_grid, sighting_count)  - new count of its grid square
+    #   sighting_listeners(common_name, lat, lon, date, time)  - the sighting itself, unrounded
+    for listener in listeners:
+        try:
+            listener(*args)
+        except Exception as e:
+            print(f"❌ Listener Error: {e}")
+            metrics.error('storage_listener', e)
+
+
+def notify_sightings(store, rows, keys, counts, ids):
+    # Listener calls for a committed batch, in submission order. Published first, so the
+    # other processes hear of it as soon as possible after the commit.
+    try:
+        bump_data_version({'rows': [list(row[:5]) for row in rows], 'keys': [list(key) for key in keys],
+                           'counts': list(counts), 'ids': [int(i) for i in ids]})
+    except Exception as e:
+        # Committed already: failing here would only make the caller save the batch again
+        print(f"❌ Data Version Error: {e}")
+        metrics.error('data_version', e)
+    for (date, time, lat, lon, common_name, _), key, count in zip(rows, keys, counts):
+        notify(store.listeners, common_name, float(key[1]), float(key[2]), count)
+        notify(store.sighting_listeners, common_name, float(lat), float(lon), date, time)
+
+
+# --- DATA VERSION ---
+# A counter in DATA_VERSION_FILE shared by every process on the same data, and a log of
+# what each version changed: the sightings a batch added (their ids, and the new counts
+# of their grid squares), or that the hotspots were rebuilt. follow() replays the
+# sightings saved since a build, by any process, into whatever was built from the store,
+# so it is only rebuilt after a hotspot rebuild.
+_changes = {}                   # version -> change log entry, the latest CHANGE_CACHE
+_change_log_pos = (None, 0)     # (inode, bytes read) of CHANGE_LOG_FILE
+_changes_lock = threading.Lock()
+
+def data_version():
+    try:
+        with open(DATA_VERSION_FILE) as f:
+            return int(f.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_data_version(change=None):
+    # change: {'rows', 'keys', 'counts', 'ids'} of a batch of new sightings; None = hotspots rebuilt
+    with FileLock(DATA_VERSION_FILE + '.lock'):
+        version = data_version() + 1
+        entry = json.dumps({'version': version, **(change or {'rebuild': True})},
+                           default=lambda value: value.item()) + "\n"   # numpy scalars
+        # Logged before the counter moves, so whoever sees the version finds its entry
+        if os.path.exists(CHANGE_LOG_FILE) and os.path.getsize(CHANGE_LOG_FILE) < CHANGE_LOG_MAX_BYTES:
+            with open(CHANGE_LOG_FILE, 'a', encoding='utf-8') as f:
+                f.write(entry)
+        else:
+            write_atomic(CHANGE_LOG_FILE, entry)
+        write_atomic(DATA_VERSION_FILE, str(version))
+    return version
+
+
+def write_atomic(path, text):
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_file, path)
+
+
+def read_change_log():
+    # Parses what was appended to the change log since the last call (all of it again if
+    # it started over). Caller holds _changes_lock.
+    global _change_log_pos
+    inode, offset = _change_log_pos
+    try:
+        with open(CHANGE_LOG_FILE, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_ino != inode or stat.st_size < offset:
+                offset = 0
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return
+    # A line still being written is read next time
+    end = data.rfind(b'\n') + 1
+    for line in data[:end].splitlines():
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        _changes[entry['version']] = entry
+    _change_log_pos = (stat.st_ino, offset + end)
+    for version in sorted(_changes)[:-CHANGE_CACHE]:
+        del _changes[version]
+
+
+def changes_since(seen, current):
+    """
+    The changes in versions seen+1..current, oldest first, or None if they can't be
+    replayed (the hotspots were rebuilt, or the log no longer goes back that far) and
+    whatever was built from the store has to be rebuilt instead.
+    """
+    if current < seen:
+        return None   # the version stamp was reset: nothing to replay from
+    with _changes_lock:
+        wanted = range(seen + 1, current + 1)
+        if any(version not in _changes for version in wanted):
+            read_change_log()
+        changes = [_changes.get(version) for version in wanted]
+    if any(change is None or 'ids' not in change for change in changes):
+        return None
+    return changes
+
+
+def follow(seen, after_id=0, listener=None, sighting_listener=None):
+    """
+    Brings something built from the store up to date: the sightings saved since data
+    version `seen`, by this process or another, are passed to listener /
+    sighting_listener as the store would have, except those with ids up to after_id
+    (already read by the build). Returns the version it is now current with, or None if
+    it has to be rebuilt.
+    """
+    version = data_version()
+    changes = changes_since(seen, version)
+    if changes is None:
+        return None
+    for change in changes:
+        for (date, time, lat, lon, common_name), (_, lat_grid, lon_grid), count, sighting_id in zip(
+                change['rows'], change['keys'], change['counts'], change['ids']):
+            if sighting_id <= after_id:
+                continue
+            if listener:
+                notify([listener], common_name, lat_grid, lon_grid, count)
+            if sighting_listener:
+                notify([sighting_listener], common_name, lat, lon, date, time)
+    return version
+
+
+def build_current(build, listener=None, sighting_listener=None):
+    """
+    build() -> (built, the highest sighting id it read) from the store, brought up to
+    date with follow(). Every change up to the version read before building is in it;
+    of the later ones, it may have read some sightings (ids <= that highest id, as ids
+    are committed in order) and not the rest, which follow() replays. Listeners are
+    looked up on the built object by name. Returns (built, version, after_id).
+    """
+    while True:
+        version = data_version()
+        built, after_id = build()
+        version = follow(version, after_id, listener and getattr(built, listener),
+                         sighting_listener and getattr(built, sighting_listener))
+        if version is not None:   # None: the hotspots were rebuilt meanwhile
+            return built, version, after_id
+
+
+def last_id(sightings):
+    # Highest id in a frame read with the 'id' column (0 if empty), for follow()
+    return int(sightings['id'].max()) if len(sightings) else 0
+
+
+# --- FILTERS ---
+# Every store's load_sightings(columns, species, bounds, start, end) and
+# load_hotspots(species, bounds) take the same filters: species is a name or a list of
+# names, bounds is the map's [[south, west], [north, east]], start/end are inclusive
+# dates ("2024-01-31", date or Timestamp) on date_observed.
+def species_list(species):
+    return [species] if isinstance(species, str) else list(species)
+
+
+def filter_frame(df, species=None, bounds=None, start=None, end=None, lat='latitude', lon='longitude'):
+    # The filters applied to a frame already in memory (the CSV store reads whole files)
+    mask = np.ones(len(df), dtype=bool)
+    if species is not None:
+        mask &= df['common_name'].isin(species_list(species)).to_numpy()
+    if bounds is not None:
+        (south, west), (north, east) = bounds
+        lats, lons = df[lat].to_numpy(), df[lon].to_numpy()
+        mask &= (lats >= south) & (lats <= north) & (lons >= west) & (lons <= east)
+    if start is not None or end is not None:
+        # Date parsing is the slow part: only parse the rows the other filters kept
+        rows = np.flatnonzero(mask)
+        observed = pd.to_datetime(df['date_observed'].to_numpy()[rows], format="%d/%m/%Y", errors='coerce')
+        keep = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            keep &= observed >= pd.Timestamp(start)
+        if end is not None:
+            keep &= observed <= pd.Timestamp(end)
+        mask[rows[~keep]] = False
+    return df if mask.all() else df[mask]
+
+
+def sql_filter(species=None, bounds=None, start=None, end=None, lat='latitude', lon='longitude'):
+    # The same filters as a WHERE clause + parameters (observed_on is the indexed ISO date)
+    where, params = [], []
+    if species is not None:
+        names = species_list(species)
+        where.append(f"common_name IN ({', '.join('?' * len(names))})")
+        params += names
+    if bounds is not None:
+        (south, west), (north, east) = bounds
+        where.append(f"{lat} BETWEEN ? AND ? AND {lon} BETWEEN ? AND ?")
+        params += [south, north, west, east]
+    if start is not None:
+        where.append("observed_on >= ?")
+        params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+    if end is not None:
+        where.append("observed_on <= ?")
+        params.append(pd.Timestamp(end).strftime("%Y-%m-%d"))
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+
+# --- 1. CSV BACKEND ---
+class CsvStore:
+    """The original flat-file store: sightings.csv is the master copy, final_hotspots.csv the map."""
+
+    def __init__(self, sightings_file=hotspots.SIGHTINGS_FILE, output_file=hotspots.HOTSPOTS_FILE):
+        self.sightings_file = sightings_file
+        self.output_file = output_file
+        self.engine = hotspots.get_engine(sightings_file, output_file)
+        self.listeners = []
+        self.sighting_listeners = []
+        # Serialises id assignment + append across sessions and processes
+        self.lock = FileLock(sightings_file + '.lock')
+        with self.lock:
+            self.engine.sync()
+
+    def file_columns(self):
+        # The header of sightings.csv (None if there is no file yet). The original file has
+        # no username column and starts with a BOM.
+        try:
+            with open(self.sightings_file, encoding='utf-8-sig', newline='') as f:
+                return next(csv.reader(f), None)
+        except FileNotFoundError:
+            return None
+
+    def add_sighting(self, date, time, lat, lon, common_name, username):
+        return self.add_sightings([(date, time, lat, lon, common_name, username)])[0]
+
+    @metrics.timed('storage_write', backend='csv')
+    def add_sightings(self, rows):
+        # One append for the whole batch; the engine then replays it as a single tail
+        with self.lock:
+            first_id = self.engine.next_id()
+            new_data = pd.DataFrame(rows, columns=SIGHTING_FIELDS)
+            new_data.insert(0, 'id', range(first_id, first_id + len(rows)))
+            header = self.file_columns()
+            if header:
+                # Appended rows have to match the header, whatever columns it has
+                new_data.reindex(columns=header).to_csv(self.sightings_file, mode='a', header=False, index=False)
+            else:
+                new_data.to_csv(self.sightings_file, mode='w', header=True, index=False)
+            self.engine.sync()
+            keys = [hotspots.grid_key(name, lat, lon) for _, _, lat, lon, name, _ in rows]
+            counts = [self.engine.counts.get(key, 0) for key in keys]
+        notify_sightings(self, rows, keys, counts, new_data['id'])
+        return new_data['id'].tolist()
+
+    @metrics.timed('storage_read', backend='csv', table='sightings')
+    def load_sightings(self, columns=None, species=None, bounds=None, start=None, end=None):
+        # Text files can't skip rows: only parse the columns needed, then filter in memory
+        usecols = None
+        if columns is not None:
+            filtered = ['common_name'] * (species is not None) + ['latitude', 'longitude'] * (bounds is not None) \
+                + ['date_observed'] * (start is not None or end is not None)
+            header = self.file_columns() or []
+            usecols = [c for c in dict.fromkeys(list(columns) + filtered) if c in header]
+        df = filter_frame(pd.read_csv(self.sightings_file, usecols=usecols), species, bounds, start, end)
+        # e.g. username, which the original file doesn't have
+        df = df.assign(**{column: None for column in SIGHTING_COLUMNS if column not in df.columns})
+        return df if columns is None else df[list(columns)]
+
+    @metrics.timed('storage_read', backend='csv', table='hotspots')
+    def load_hotspots(self, species=None, bounds=None):
+        return filter_frame(hotspots.read_hotspots(self.output_file), species, bounds, lat='lat', lon='lon')
+
+    @metrics.timed('hotspot_rebuild', backend='csv')
+    def rebuild_hotspots(self):
+        with self.lock:
+            verified_count = self.engine.rebuild()
+        bump_data_version()
+        return verified_count
+
+
+# --- 2. SQLITE BACKEND ---
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sightings (
+    id INTEGER PRIMARY KEY,
+    date_observed TEXT,
+    time_observed TEXT,
+    latitude REAL,
+    longitude REAL,
+    common_name TEXT,
+    username TEXT,
+    observed_on TEXT,   -- ISO yyyy-mm-dd copy of date_observed, so date ranges can use the index
+    lat_grid REAL,
+    lon_grid REAL
+);
+CREATE INDEX IF NOT EXISTS idx_sightings_species ON sightings (common_name);
+CREATE INDEX IF NOT EXISTS idx_sightings_grid ON sightings (lat_grid, lon_grid);
+CREATE INDEX IF NOT EXISTS idx_sightings_date ON sightings (observed_on);
+
+CREATE TABLE IF NOT EXISTS hotspot_cells (
+    common_name TEXT NOT NULL,
+    lat_grid REAL NOT NULL,
+    lon_grid REAL NOT NULL,
+    sighting_count INTEGER NOT NULL,
+    PRIMARY KEY (common_name, lat_grid, lon_grid)
+) WITHOUT ROWID;
+"""
+
+
+def iso_date(date):
+    # Sightings use the DD/MM/YYYY format throughout the app
+    try:
+        return datetime.strptime(str(date), "%d/%m/%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+class SqliteStore:
+    """
+    Sightings and per grid square counts in one SQLite file (WAL mode).
+
+    Each insert runs in a single write transaction that assigns the id and bumps the
+    affected grid square, so concurrent sessions can neither reuse an id nor see a
+    half-applied sighting. Readers are never blocked by the writer in WAL mode.
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self.local = threading.local()
+        # SQLite's own busy handler backs off in steps of up to 100ms, which starves
+        # writers under contention; queueing on a file lock first keeps hand-offs fast.
+        # Thread-local, so it also queues this process's session threads (each holds its
+        # own descriptor) rather than letting them all share one acquisition.
+        self.write_lock = FileLock(db_file + '.lock')
+        self.listeners = []
+        self.sighting_listeners = []
+        conn = self.connect()
+        conn.executescript(SCHEMA)
+
+    def connect(self):
+        # sqlite3 connections cannot be shared between Streamlit's session threads
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def add_sighting(self, date, time, lat, lon, common_name, username):
+        return self.add_sightings([(date, time, lat, lon, common_name, username)])[0]
+
+    @metrics.timed('storage_write', backend='sqlite')
+    def add_sightings(self, rows):
+        # The whole batch is one write transaction
+        keys = [hotspots.grid_key(name, lat, lon) for _, _, lat, lon, name, _ in rows]
+        ids, counts = [], []
+        with self.transaction() as conn:
+            for (date, time, lat, lon, common_name, username), (_, lat_grid, lon_grid) in zip(rows, keys):
+                ids.append(conn.execute(
+                    "INSERT INTO sightings (date_observed, time_observed, latitude, longitude, common_name, username,"
+                    " observed_on, lat_grid, lon_grid) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (date, time, float(lat), float(lon), common_name, username, iso_date(date),
+                     float(lat_grid), float(lon_grid)),
+                ).lastrowid)
+                counts.append(conn.execute(
+                    "INSERT INTO hotspot_cells VALUES (?, ?, ?, 1)"
+                    " ON CONFLICT DO UPDATE SET sighting_count = sighting_count + 1 RETURNING sighting_count",
+                    (common_name, float(lat_grid), float(lon_grid)),
+                ).fetchone()[0])
+        notify_sightings(self, rows, keys, counts, ids)
+        return ids
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connect()
+        with self.write_lock.acquire(poll_interval=0.001):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    @metrics.timed('storage_read', backend='sqlite', table='sightings')
+    def load_sightings(self, columns=None, species=None, bounds=None, start=None, end=None):
+        where, params = sql_filter(species, bounds, start, end)
+        return pd.read_sql_query(
+            f"SELECT {', '.join(columns or SIGHTING_COLUMNS)} FROM sightings{where} ORDER BY id",
+            self.connect(), params=params,
+        )
+
+    @metrics.timed('storage_read', backend='sqlite', table='hotspots')
+    def load_hotspots(self, species=None, bounds=None):
+        where, params = sql_filter(species, bounds, lat='lat_grid', lon='lon_grid')
+        where = (where + " AND" if where else " WHERE") + " sighting_count >= ?"
+        return pd.read_sql_query(
+            "SELECT common_name, lat_grid AS lat, lon_grid AS lon, sighting_count FROM hotspot_cells"
+            f"{where} ORDER BY common_name, lat_grid, lon_grid",
+            self.connect(), params=params + [hotspots.MIN_SIGHTINGS],
+        )
+
+    @metrics.timed('hotspot_rebuild', backend='sqlite')
+    def rebuild_hotspots(self):
+        # Full recount from the sightings table, same grouping as the CSV pipeline. Read in
+        # the write transaction: a sighting committed in between would lose its increment.
+        with self.transaction() as conn:
+            df = pd.read_sql_query("SELECT latitude, longitude, common_name FROM sightings", conn)
+            print(f"   - Found {len(df)} raw sightings.")
+            cells = hotspots.aggregate_sightings(df)
+            conn.execute("DELETE FROM hotspot_cells")
+            conn.executemany(
+                "INSERT INTO hotspot_cells VALUES (?, ?, ?, ?)",
+                cells[['common_name', 'lat_grid', 'lon_grid', 'sighting_count']].itertuples(index=False, name=None),
+            )
+        bump_data_version()
+        return int((cells['sighting_count'] >= hotspots.MIN_SIGHTINGS).sum())
+
+    def is_empty(self):
+        return self.connect().execute("SELECT NOT EXISTS (SELECT 1 FROM sightings)").fetchone()[0] == 1
+
+    def seed(self, csv_file=hotspots.SIGHTINGS_FILE):
+        # First run: import the CSV history into an empty database. Checked under the write
+        # lock, so of several processes starting together only the first one imports.
+        with self.write_lock:
+            if self.is_empty() and os.path.exists(csv_file):
+                self.import_csv(csv_file)
+
+    # --- IMPORT / EXPORT ---
+    def import_csv(self, csv_file=hotspots.SIGHTINGS_FILE):
+        # One-shot import of the legacy sightings.csv, keeping the original ids
+        df = pd.read_csv(csv_file)
+        if 'username' not in df.columns:
+            df['username'] = None
+        df = df[SIGHTING_COLUMNS]
+        df['observed_on'] = pd.to_datetime(df['date_observed'], format="%d/%m/%Y", errors='coerce').dt.strftime("%Y-%m-%d")
+        df['lat_grid'] = df['latitude'].round(hotspots.GRID_DECIMALS)
+        df['lon_grid'] = df['longitude'].round(hotspots.GRID_DECIMALS)
+        df = df.astype(object).where(df.notna(), None)
+
+        with self.transaction() as conn:
+            conn.executemany(
+                f"INSERT INTO sightings ({', '.join(df.columns)}) VALUES ({', '.join('?' * len(df.columns))})",
+                df.itertuples(index=False, name=None),
+            )
+        self.rebuild_hotspots()
+        return len(df)
+
+    def export_csv(self, sightings_file=hotspots.SIGHTINGS_FILE, output_file=hotspots.HOTSPOTS_FILE):
+        self.load_sightings().to_csv(sightings_file, index=False)
+        self.load_hotspots().to_csv(output_file, index=False)
+
+
+# --- 3. PARQUET BACKEND ---
+# Columnar files under PARQUET_DIR, one directory per species and year
+# (common_name=Asian%20Koel/year=2024/). Species and year filters skip whole
+# directories; within a file, rows are sorted by latitude in row groups of
+# ROW_GROUP_ROWS, so a bounding box only decodes the row groups it overlaps.
+ROW_GROUP_ROWS = 64 * 1024
+COMPACT_EVERY = 64   # single-sighting files in a partition before they're merged
+# pyarrow is only imported by this backend, so the CSV and SQLite stores start without it
+
+
+@functools.lru_cache(maxsize=None)
+def arrow_schemas():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partition = pa.schema([('common_name', pa.string()), ('year', pa.int16())])
+    return {
+        'partition': partition,
+        'write_partitioning': ds.partitioning(partition, flavor='hive'),
+        # Read back with common_name dictionary-encoded (a pandas category): one copy of each name
+        'read_partitioning': ds.partitioning(
+            pa.schema([('common_name', pa.dictionary(pa.int32(), pa.string())), ('year', pa.int16())]),
+            flavor='hive', dictionaries='infer',
+        ),
+        'file': pa.schema([
+            ('id', pa.int64()), ('date_observed', pa.string()), ('time_observed', pa.string()),
+            ('latitude', pa.float64()), ('longitude', pa.float64()), ('username', pa.string()),
+            ('observed_on', pa.date32()),   # parsed date_observed, for date range filters
+        ]),
+    }
+
+
+def arrow_filter(species=None, bounds=None, start=None, end=None, lat='latitude', lon='longitude', dated=True):
+    # The shared filters as a pyarrow expression, pushed down to partitions and row groups
+    import pyarrow.dataset as ds
+
+    parts = []
+    if species is not None:
+        parts.append(ds.field('common_name').isin(species_list(species)))
+    if bounds is not None:
+        (south, west), (north, east) = bounds
+        parts += [ds.field(lat) >= south, ds.field(lat) <= north, ds.field(lon) >= west, ds.field(lon) <= east]
+    if dated and start is not None:
+        start = pd.Timestamp(start)
+        parts += [ds.field('year') >= start.year, ds.field('observed_on') >= start.date()]
+    if dated and end is not None:
+        end = pd.Timestamp(end)
+        parts += [ds.field('year') <= end.year, ds.field('observed_on') <= end.date()]
+    return functools.reduce(operator.and_, parts) if parts else None
+
+
+def sightings_table(df):
+    # Sightings frame (SIGHTING_COLUMNS) -> Arrow table with the partition columns, sorted for writing
+    import pyarrow as pa
+
+    file_schema, partition_schema = arrow_schemas()['file'], arrow_schemas()['partition']
+    observed = pd.to_datetime(df['date_observed'], format="%d/%m/%Y", errors='coerce')
+    table = pa.Table.from_pandas(df.assign(
+        common_name=df['common_name'].astype(str),
+        username=df['username'].astype(object).where(df['username'].notna(), None),
+        observed_on=observed.dt.date.astype(object).where(observed.notna(), None),
+        year=observed.dt.year.astype('Int16'),
+    )[file_schema.names + partition_schema.names], schema=pa.schema(list(file_schema) + list(partition_schema)),
+        preserve_index=False)
+    return table.sort_by([('common_name', 'ascending'), ('year', 'ascending'), ('latitude', 'ascending')])
+
+
+class ParquetStore:
+    """
+    Sightings as a species/year partitioned Parquet dataset plus the verified hotspots in
+    final_hotspots.parquet. Loads read only the columns asked for and push species,
+    bounding box and date filters down to the files.
+
+    A new sighting is written as its own small file in its partition; once a partition
+    holds COMPACT_EVERY of them they are merged into one sorted file. Ids come from
+    _meta.json. Writers and readers share a file lock, so a read never sees a partition
+    half-way through a merge.
+    """
+
+    def __init__(self, directory=PARQUET_DIR, hotspots_file=PARQUET_HOTSPOTS_FILE):
+        self.directory = directory
+        self.hotspots_file = hotspots_file
+        self.meta_file = os.path.join(directory, '_meta.json')   # '_' files are not part of the dataset
+        self.lock = FileLock(directory + '.lock')
+        self.listeners = []
+        self.sighting_listeners = []
+
+    # --- FILES ---
+    def files(self, partition=None, pattern='*.parquet'):
+        return glob.glob(os.path.join(partition or os.path.join(self.directory, '*', '*'), pattern))
+
+    def is_empty(self):
+        return not self.files()
+
+    def seed(self, csv_file=hotspots.SIGHTINGS_FILE):
+        # First run: convert the CSV history, once across processes (see SqliteStore.seed)
+        with self.lock:
+            if self.is_empty() and os.path.exists(csv_file):
+                self.import_csv(csv_file)
+
+    def write(self, df, basename):
+        # Writes sightings into their partitions; returns the files written
+        import pyarrow.dataset as ds
+
+        written = []
+        ds.write_dataset(
+            sightings_table(df), self.directory, format='parquet', partitioning=arrow_schemas()['write_partitioning'],
+            basename_template=basename + '-{i}.parquet', existing_data_behavior='overwrite_or_ignore',
+            max_rows_per_group=ROW_GROUP_ROWS, min_rows_per_group=min(len(df), ROW_GROUP_ROWS),
+            file_visitor=lambda f: written.append(f.path),
+        )
+        return written
+
+    def compact(self, partition):
+        # Merge a partition's files into one sorted by latitude (new file first, then the old ones go)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        files = self.files(partition)
+        if len(files) < 2:
+            return
+        table = pa.concat_tables(pq.ParquetFile(f).read() for f in files)
+        tmp_file = os.path.join(partition, '_compact.tmp')
+        pq.write_table(table.sort_by('latitude'), tmp_file, row_group_size=ROW_GROUP_ROWS)
+        os.replace(tmp_file, os.path.join(partition, f"part-{uuid.uuid4().hex}.parquet"))
+        for f in files:
+            os.remove(f)
+
+    def max_id(self):
+        try:
+            with open(self.meta_file) as f:
+                return json.load(f)['max_id']
+        except FileNotFoundError:
+            if self.is_empty():
+                return 0
+            import pyarrow.compute as pc
+            import pyarrow.dataset as ds
+
+            ids = ds.dataset(self.files(), format='parquet').to_table(columns=['id'])['id']
+            return int(pc.max(ids).as_py() or 0)
+
+    def save_max_id(self, max_id):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_file = self.meta_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'max_id': int(max_id)}, f)
+        os.replace(tmp_file, self.meta_file)
+
+    # --- WRITES ---
+    def add_sighting(self, date, time, lat, lon, common_name, username):
+        return self.add_sightings([(date, time, lat, lon, common_name, username)])[0]
+
+    @metrics.timed('storage_write', backend='parquet')
+    def add_sightings(self, rows):
+        keys = [hotspots.grid_key(name, lat, lon) for _, _, lat, lon, name, _ in rows]
+        with self.lock:
+            # Ids are recorded first: a crash in between leaves a gap, never a reused id
+            first_id = self.max_id() + 1
+            self.save_max_id(first_id + len(rows) - 1)
+            new_data = pd.DataFrame(rows, columns=SIGHTING_FIELDS).astype({'latitude': float, 'longitude': float})
+            new_data.insert(0, 'id', range(first_id, first_id + len(rows)))
+            for partition in {os.path.dirname(f) for f in self.write(new_data, f"delta-{first_id}")}:
+                if len(self.files(partition, 'delta-*.parquet')) >= COMPACT_EVERY:
+                    self.compact(partition)
+            cells = {key: self.cell_count(*key) for key in dict.fromkeys(keys)}
+            self.update_hotspots({key: n for key, n in cells.items() if n >= hotspots.MIN_SIGHTINGS})
+        notify_sightings(self, rows, keys, [cells[key] for key in keys], new_data['id'])
+        return new_data['id'].tolist()
+
+    def cell_count(self, common_name, lat_grid, lon_grid):
+        # Sightings in one grid square: reads only that species' rows near the square
+        half = 0.5 * 10 ** -hotspots.GRID_DECIMALS * 1.001
+        df = self.load_sightings(['latitude', 'longitude'], species=common_name,
+                                 bounds=[[lat_grid - half, lon_grid - half], [lat_grid + half, lon_grid + half]])
+        return int(((df['latitude'].round(hotspots.GRID_DECIMALS) == lat_grid)
+                    & (df['longitude'].round(hotspots.GRID_DECIMALS) == lon_grid)).sum())
+
+    def update_hotspots(self, cells):
+        # Sets the counts of verified squares {(common_name, lat_grid, lon_grid): count} in one rewrite
+        if not cells:
+            return
+        import pyarrow.parquet as pq
+
+        try:
+            table = pq.read_table(self.hotspots_file).to_pandas()
+        except FileNotFoundError:
+            table = pd.DataFrame(columns=HOTSPOT_COLUMNS)
+        table = table.astype({'common_name': object}).set_index(['common_name', 'lat', 'lon'])['sighting_count']
+        new = pd.Series(cells, dtype='int64', name='sighting_count')
+        new.index.names = table.index.names
+        kept = table[~table.index.isin(new.index)]
+        table = (pd.concat([kept, new]) if len(kept) else new).sort_index()
+        self.write_hotspots(table.reset_index())
+
+    def write_hotspots(self, verified):
+        # verified: HOTSPOT_COLUMNS rows sorted by common_name, lat, lon
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        verified = verified[HOTSPOT_COLUMNS].astype({'common_name': 'category', 'sighting_count': 'int64'})
+        tmp_file = self.hotspots_file + '.tmp'
+        pq.write_table(pa.Table.from_pandas(verified, preserve_index=False), tmp_file)
+        os.replace(tmp_file, self.hotspots_file)
+
+    @metrics.timed('hotspot_rebuild', backend='parquet')
+    def rebuild_hotspots(self):
+        with self.lock:
+            for partition in {os.path.dirname(f) for f in self.files(pattern='delta-*.parquet')}:
+                self.compact(partition)
+            df = self.load_sightings(['latitude', 'longitude', 'common_name'])
+            print(f"   - Found {len(df)} raw sightings.")
+            verified = hotspots.verified_hotspots(hotspots.aggregate_sightings(df)).astype({'common_name': str})
+            self.write_hotspots(verified.sort_values(['common_name', 'lat', 'lon']))
+        bump_data_version()
+        return len(verified)
+
+    # --- READS ---
+    @metrics.timed('storage_read', backend='parquet', table='sightings')
+    def load_sightings(self, columns=None, species=None, bounds=None, start=None, end=None):
+        columns = list(columns or SIGHTING_COLUMNS)
+        with self.lock:
+            if not os.path.isdir(self.directory):
+                raise FileNotFoundError(self.directory)
+            if self.is_empty():
+                return pd.DataFrame(columns=columns)
+            import pyarrow.dataset as ds
+
+            dataset = ds.dataset(self.directory, format='parquet', partitioning=arrow_schemas()['read_partitioning'])
+            table = dataset.to_table(columns=columns, filter=arrow_filter(species, bounds, start, end))
+        return table.to_pandas()
+
+    @metrics.timed('storage_read', backend='parquet', table='hotspots')
+    def load_hotspots(self, species=None, bounds=None):
+        if not os.path.exists(self.hotspots_file):
+            raise FileNotFoundError(self.hotspots_file)
+        import pyarrow.parquet as pq
+
+        return pq.read_table(self.hotspots_file, filters=arrow_filter(species, bounds, lat='lat', lon='lon',
+                                                                      dated=False)).to_pandas()
+
+    # --- IMPORT ---
+    def import_csv(self, csv_file=hotspots.SIGHTINGS_FILE, chunk_rows=1_000_000):
+        # One-shot conversion of sightings.csv, keeping the original ids. Read in chunks so
+        # a large history never sits in memory whole; each partition is merged at the end.
+        rows = 0
+        with self.lock:
+            max_id = self.max_id()
+            for df in pd.read_csv(csv_file, chunksize=chunk_rows):
+                if 'username' not in df.columns:
+                    df['username'] = None
+                df = df[SIGHTING_COLUMNS].dropna(subset=['common_name'])
+                if len(df):
+                    self.write(df, f"part-{uuid.uuid4().hex}")
+                    max_id = max(max_id, int(df['id'].max()))
+                    rows += len(df)
+            self.save_max_id(max_id)
+            for partition in {os.path.dirname(f) for f in self.files()}:
+                self.compact(partition)
+        self.rebuild_hotspots()
+        return rows
+
+
+# --- 4. BACKEND SELECTION ---
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(backend=None):
+    backend = backend or STORAGE_BACKEND
+    with _stores_lock:
+        if backend not in _stores:
+            if backend == 'csv':
+                _stores[backend] = CsvStore()
+            elif backend in ('sqlite', 'parquet'):
+                store = SqliteStore() if backend == 'sqlite' else ParquetStore()
+                # First run: seed the database / dataset from the existing CSV history
+                store.seed()
+                _stores[backend] = store
+            else:
+                raise ValueError(f"Unknown storage backend: {backend}")
+        return _stores[backend]
+
+
+# python storage.py import [sightings.csv]   -> load a CSV into the SQLite database
+# python storage.py export                   -> write sightings.csv + final_hotspots.csv from SQLite
+# python storage.py parquet [sightings.csv]  -> convert a CSV into the Parquet dataset
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'import':
+        csv_file = sys.argv[2] if len(sys.argv) > 2 else hotspots.SIGHTINGS_FILE
+        print(f"✅ Imported {SqliteStore().import_csv(csv_file)} sightings into {DB_FILE}")
+    elif command == 'parquet':
+        csv_file = sys.argv[2] if len(sys.argv) > 2 else hotspots.SIGHTINGS_FILE
+        print(f"✅ Converted {ParquetStore().import_csv(csv_file)} sightings into {PARQUET_DIR}/")
+    elif command == 'export':
+        SqliteStore().export_csv()
+        print(f"✅ Exported {DB_FILE} to {hotspots.SIGHTINGS_FILE} and {hotspots.HOTSPOTS_FILE}")
+    else:
+        print("Usage: python storage.py [import [file.csv] | export | parquet [file.csv]]")
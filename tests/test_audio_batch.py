@@ -0,0 +1,58 @@
+import os
+
+import pandas as pd
+
+import audio_batch
+
+
+def detections(path, n):
+    return [{'date_observed': '14/01/2025', 'time_observed': f'05:30:{i:02d}', 'latitude': 1.35, 'longitude': 103.82,
+             'common_name': 'Asian Koel', 'username': audio_batch.DEFAULT_USERNAME, 'score': 0.9,
+             'start_s': i * 3.0, 'end_s': i * 3.0 + 3, 'file': path} for i in range(n)]
+
+
+def killed_run(output, recorded, unrecorded):
+    # Writes every recording's detections but dies before the last ones reach the manifest
+    with open(audio_batch.manifest_path(output), 'a') as manifest:
+        for part, (path, n) in enumerate(recorded + unrecorded):
+            audio_batch.write_detections(output, detections(path, n), part)
+            if (path, n) in recorded:
+                audio_batch.record_done(manifest, output, path)
+
+
+def resume(output):
+    done = audio_batch.read_manifest(output)
+    audio_batch.discard_unrecorded(output, done)
+    return done
+
+
+def test_csv_resume_drops_detections_not_in_the_manifest(tmp_path):
+    output = str(tmp_path / 'detections.csv')
+    killed_run(output, [('a.wav', 3), ('b.wav', 0)], [('c.wav', 4)])
+    assert list(resume(output)) == ['a.wav', 'b.wav']
+    killed_run(output, [('c.wav', 4)], [])
+    assert pd.read_csv(output)['file'].value_counts().to_dict() == {'a.wav': 3, 'c.wav': 4}
+
+
+def test_csv_resume_before_anything_was_recorded_starts_over(tmp_path):
+    output = str(tmp_path / 'detections.csv')
+    killed_run(output, [], [('a.wav', 2)])
+    assert resume(output) == {}
+    killed_run(output, [('a.wav', 2)], [])
+    assert len(pd.read_csv(output)) == 2
+
+
+def test_parquet_resume_drops_parts_not_in_the_manifest(tmp_path):
+    output = str(tmp_path / 'detections.parquet')
+    killed_run(output, [('a.wav', 3)], [('b.wav', 2)])
+    assert list(resume(output)) == ['a.wav']
+    assert os.listdir(output) == ['part-000000.parquet']
+
+
+def test_manifests_without_sizes_are_still_read(tmp_path):
+    output = str(tmp_path / 'detections.csv')
+    with open(audio_batch.manifest_path(output), 'w') as f:
+        f.write('old/a.wav\nold/b.wav\n')
+    pd.DataFrame(detections('old/a.wav', 2)).to_csv(output, index=False)
+    assert resume(output) == {'old/a.wav': None, 'old/b.wav': None}
+    assert len(pd.read_csv(output)) == 2
@@ -0,0 +1,117 @@
+import csv
+
+import pytest
+import requests
+
+import image_scrape
+
+OBSERVATIONS = {
+    'Common Myna': [{'id': i, 'photos': [{'url': f'https://photos.test/{i}/square.jpg'}]} for i in range(120, 100, -1)],
+    'Asian Koel': [{'id': 7, 'photos': []}] + [{'id': i, 'photos': [{'url': f'https://photos.test/{i}/square.jpg'}]}
+                                               for i in (6, 5, 4)],
+}
+
+
+class FakeResponse:
+    def __init__(self, status=200, payload=None, body=b''):
+        self.status, self.payload, self.body = status, payload, body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise requests.HTTPError(f"{self.status} error")
+
+    def json(self):
+        return self.payload
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+
+class FakeSession:
+    # Stands in for iNaturalist: observations paged by id_below, photos served by id
+    def __init__(self, broken=()):
+        self.broken = set(broken)
+        self.photo_requests = []
+        self.searches = []
+
+    def get(self, url, params=None, timeout=None, stream=False):
+        if url.endswith('/observations'):
+            self.searches.append((params['taxon_name'], params.get('id_below')))
+            found = [obs for obs in OBSERVATIONS.get(params['taxon_name'], [])
+                     if obs['id'] < params.get('id_below', float('inf'))]
+            return FakeResponse(payload={'results': found[:params['per_page']]})
+        obs_id = int(url.split('/')[-2])
+        self.photo_requests.append(obs_id)
+        assert url.endswith('/large.jpg')
+        return FakeResponse(503 if obs_id in self.broken else 200, body=f'jpeg {obs_id}'.encode())
+
+
+def manifest_rows(output_dir):
+    with open(output_dir / image_scrape.MANIFEST_FILE, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    return tmp_path / 'dataset'
+
+
+def test_downloads_up_to_max_images_and_records_them(output_dir):
+    session = FakeSession()
+    counts = image_scrape.download_birds(['Common Myna', 'Asian Koel'], str(output_dir), max_images=5,
+                                         concurrency=2, session=session)
+    assert counts == {'Common Myna': 5, 'Asian Koel': 3}
+    rows = manifest_rows(output_dir)
+    assert sorted(int(row['obs_id']) for row in rows) == [4, 5, 6, 116, 117, 118, 119, 120]
+    for row in rows:
+        assert (output_dir / row['file']).read_bytes() == f"jpeg {row['obs_id']}".encode()
+    assert not list(output_dir.rglob('*.part'))
+
+
+def test_rerun_resumes_from_the_manifest(output_dir):
+    image_scrape.download_birds(['Common Myna'], str(output_dir), max_images=3, session=FakeSession())
+
+    session = FakeSession()
+    assert image_scrape.download_birds(['Common Myna'], str(output_dir), max_images=3, session=session) == \
+        {'Common Myna': 0}
+    assert session.photo_requests == [] and session.searches == []
+
+    # A higher limit only fetches the observations not already on disk
+    assert image_scrape.download_birds(['Common Myna'], str(output_dir), max_images=5, session=session) == \
+        {'Common Myna': 2}
+    assert sorted(session.photo_requests) == [116, 117]
+    rows = manifest_rows(output_dir)
+    assert len(rows) == 5 and len({row['obs_id'] for row in rows}) == 5
+
+
+def test_failed_photo_is_retried_on_the_next_run(output_dir):
+    counts = image_scrape.download_birds(['Asian Koel'], str(output_dir), max_images=5,
+                                         session=FakeSession(broken={5}))
+    assert counts == {'Asian Koel': 2}
+    assert sorted(int(row['obs_id']) for row in manifest_rows(output_dir)) == [4, 6]
+
+    session = FakeSession()
+    assert image_scrape.download_birds(['Asian Koel'], str(output_dir), max_images=5, session=session) == \
+        {'Asian Koel': 1}
+    assert session.photo_requests == [5]
+    assert sorted(int(row['obs_id']) for row in manifest_rows(output_dir)) == [4, 5, 6]
+
+
+def test_failed_photo_is_replaced_by_the_next_observation(output_dir):
+    session = FakeSession(broken={119})
+    counts = image_scrape.download_birds(['Common Myna'], str(output_dir), max_images=5, concurrency=2,
+                                         session=session)
+    assert counts == {'Common Myna': 5}
+    assert sorted(int(row['obs_id']) for row in manifest_rows(output_dir)) == [115, 116, 117, 118, 120]
+
+
+def test_paging_stops_once_enough_photos_are_saved(output_dir):
+    session = FakeSession()
+    image_scrape.download_birds(['Common Myna'], str(output_dir), max_images=5, session=session)
+    assert session.searches == [('Common Myna', None)]   # the first page held all five
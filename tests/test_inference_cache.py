@@ -0,0 +1,66 @@
+import io
+
+from inference_cache import InferenceCache, make_key, read_bytes
+
+
+def test_key_depends_on_bytes_model_and_params():
+    key = make_key(b'clip', 'BirdNET', min_conf=0.5)
+    assert key == make_key(b'clip', 'BirdNET', min_conf=0.5)
+    assert key != make_key(b'clip2', 'BirdNET', min_conf=0.5)
+    assert key != make_key(b'clip', 'ViT', min_conf=0.5)
+    assert key != make_key(b'clip', 'BirdNET', min_conf=0.25)
+
+
+def test_read_bytes_leaves_uploads_rewound():
+    upload = io.BufferedReader(io.BytesIO(b'photo'))
+    assert read_bytes(upload) == b'photo'
+    assert upload.read() == b'photo'
+
+
+def test_hit_skips_compute_and_returns_a_copy():
+    cache = InferenceCache(max_items=8, disk_dir=None)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [{'name': 'Common Myna', 'score': 90.0}]
+
+    first = cache.get_or_compute(b'photo', 'ViT', compute, top_k=3)
+    first[0]['score'] = 0
+    second = cache.get_or_compute(io.BytesIO(b'photo'), 'ViT', compute, top_k=3)
+    assert calls == [1]
+    assert second == [{'name': 'Common Myna', 'score': 90.0}]
+    cache.get_or_compute(b'photo', 'ViT', compute, top_k=5)
+    assert calls == [1, 1]
+    assert cache.metrics()['memory_hits'] == 1 and cache.metrics()['misses'] == 2
+
+
+def test_memory_tier_is_lru():
+    cache = InferenceCache(max_items=2, disk_dir=None)
+    for name in ('a', 'b'):
+        cache.put(name, name)
+    cache.get('a')
+    cache.put('c', 'c')
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 'a') and cache.get('c') == (True, 'c')
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    key = make_key(b'clip', 'BirdNET', min_conf=0.5)
+    InferenceCache(disk_dir=str(tmp_path)).put(key, ['Asian Koel'])
+
+    restarted = InferenceCache(disk_dir=str(tmp_path))
+    assert restarted.get(key) == (True, ['Asian Koel'])
+    assert restarted.metrics()['disk_hits'] == 1
+    assert restarted.get(key) == (True, ['Asian Koel'])
+    assert restarted.metrics()['memory_hits'] == 1
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = InferenceCache(max_items=1, disk_dir=str(tmp_path), max_disk_mb=2000 / 2**20)
+    for i in range(10):
+        cache.put(f'key{i}', b'x' * 300)
+    assert cache.disk_bytes <= 2000
+    assert cache.metrics()['disk_evictions'] > 0
+    assert cache.get('key9') == (True, b'x' * 300)
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+    monkeypatch.setattr(metrics.registry, 'collectors', {})
+    metrics.registry.reset()
+    yield metrics.registry
+    metrics.registry.reset()
+
+
+def series_names(text):
+    # Metric names of the sample lines, without labels or values
+    return {line.split('{')[0].split(' ')[0] for line in text.splitlines() if not line.startswith('#')}
+
+
+def test_timed_records_seconds_histogram(registry):
+    @metrics.timed('identify', kind='image')
+    def identify():
+        return 'Common Myna'
+
+    assert identify() == 'Common Myna'
+    text = registry.prometheus()
+    assert '# TYPE terranova_identify_seconds histogram' in text
+    assert series_names(text) == {'terranova_identify_seconds_bucket', 'terranova_identify_seconds_sum',
+                                  'terranova_identify_seconds_count'}
+    assert 'terranova_identify_seconds_bucket{kind="image",le="+Inf"} 1' in text
+    assert 'terranova_identify_seconds_count{kind="image"} 1' in text
+
+
+def test_timer_labels_and_errors(registry):
+    with pytest.raises(ValueError):
+        with metrics.timer('map_build', mode='cluster'):
+            raise ValueError("no tiles")
+    text = registry.prometheus()
+    assert 'terranova_map_build_seconds_count{mode="cluster"} 1' in text
+    assert '# TYPE terranova_errors_total counter' in text
+    assert 'terranova_errors_total{where="map_build"} 1' in text
+    assert registry.snapshot()['errors'][0]['error'] == "ValueError: no tiles"
+
+
+def test_counters_observations_and_gauges(registry):
+    metrics.count('sightings_saved', 2, backend='sqlite')
+    metrics.count('sightings_saved', backend='sqlite')
+    metrics.observe('sighting_batch', 40, buckets=metrics.COUNT_BUCKETS)
+    metrics.register_collector('inference_cache', lambda: {'hit_rate': 0.5, 'misses': 3})
+    text = registry.prometheus()
+    assert 'terranova_sightings_saved_total{backend="sqlite"} 3' in text
+    assert 'terranova_sighting_batch_bucket{le="100"} 1' in text
+    assert 'terranova_sighting_batch_bucket{le="10"} 0' in text
+    assert '# TYPE terranova_inference_cache_hit_rate gauge' in text
+    assert 'terranova_inference_cache_misses 3' in text
+
+
+def test_label_values_are_escaped(registry):
+    metrics.count('inference_requests', model='BirdNET "v2.4"\n')
+    assert 'terranova_inference_requests_total{model="BirdNET \\"v2.4\\"\\n"} 1' in registry.prometheus()
+
+
+def test_disabled_records_nothing(registry, monkeypatch):
+    monkeypatch.setattr(metrics, 'ENABLED', False)
+    metrics.count('sightings_saved')
+    with metrics.timer('map_build'):
+        pass
+    assert registry.snapshot() == {'counters': [], 'histograms': [], 'gauges': {}, 'errors': []}
+
+
+def test_log_lines_use_the_same_names(registry, tmp_path):
+    metrics.count('sightings_saved', backend='csv')
+    log = tmp_path / 'metrics.jsonl'
+    metrics.write_log(str(log))
+    snapshot = json.loads(log.read_text())
+    assert snapshot['counters'] == [{'name': 'sightings_saved', 'labels': {'backend': 'csv'}, 'value': 1}]
@@ -0,0 +1,164 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from filelock import FileLock
+
+import sighting_queue
+
+COLUMNS = ['date_observed', 'time_observed', 'latitude', 'longitude', 'common_name', 'username']
+
+
+class FakeStore:
+    # The parts of a store the queue uses; fails the next `failures` writes
+    def __init__(self, rows=(), failures=0):
+        self.rows = [list(row) for row in rows]
+        self.failures = failures
+
+    def add_sightings(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("database is locked")
+        self.rows += [list(row) for row in rows]
+
+    def load_sightings(self, columns, species=None, bounds=None, start=None, end=None):
+        df = pd.DataFrame(self.rows, columns=COLUMNS)
+        (south, west), (north, east) = bounds
+        keep = ((df['common_name'] == species) & df['latitude'].between(south, north)
+                & df['longitude'].between(west, east)
+                & (pd.to_datetime(df['date_observed'], format="%d/%m/%Y") == start))
+        df = df.loc[keep, columns]
+        # Like the CSV backend, a missing username reads back as NaN
+        df['username'] = df['username'].where(df['username'].notna(), np.nan)
+        return df
+
+
+def row(i, username='alice'):
+    return ['01/03/2025', f'08:{i:02d}:00', 1.35 + i / 1000, 103.82, 'Common Myna', username]
+
+
+def write_journal(path, *entries, torn=False):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(''.join(json.dumps(entry) + "\n" for entry in entries))
+        if torn:
+            f.write('{"op": "add", "key": "k9", "ro')
+
+
+def start_queue(store, journal):
+    return sighting_queue.SightingQueue(store=lambda: store, journal_file=str(journal), flush_secs=0.01)
+
+
+def wait_saved(queue, n, timeout=10):
+    deadline = time.monotonic() + timeout
+    while queue.status()['saved'] < n:
+        assert time.monotonic() < deadline, f"only {queue.status()['saved']} of {n} saved"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / 'journal.jsonl'
+
+
+def test_every_submission_is_saved_once(journal):
+    store = FakeStore()
+    queue = start_queue(store, journal)
+    for i in range(50):
+        queue.submit(*row(i))
+    queue.close()
+    assert sorted(map(tuple, store.rows)) == sorted(tuple(row(i)) for i in range(50))
+    assert sighting_queue.read_journal(queue.journal_file) == ([], set())
+
+
+def test_store_failure_is_retried_without_duplicates(journal):
+    store = FakeStore(failures=2)
+    queue = start_queue(store, journal)
+    for i in range(5):
+        queue.submit(*row(i))
+    wait_saved(queue, 5)
+    queue.close()
+    assert sorted(map(tuple, store.rows)) == sorted(tuple(row(i)) for i in range(5))
+
+
+def test_failure_before_the_batch_begins_is_not_uncertain(journal):
+    # The store didn't open, so nothing can have been written: an identical sighting
+    # already in the store must not be mistaken for this one on the retry
+    store = FakeStore([row(1)])
+    opened = []
+
+    def open_store():
+        opened.append(True)
+        if len(opened) == 1:
+            raise OSError("unable to open database file")
+        return store
+
+    queue = sighting_queue.SightingQueue(store=open_store, journal_file=str(journal), flush_secs=0.01)
+    queue.submit(*row(1))
+    wait_saved(queue, 1)
+    queue.close()
+    assert store.rows == [row(1), row(1)]
+
+
+def test_restart_replays_journal_without_loss_or_duplicates(journal):
+    # Killed mid-batch: k1 was saved, k2 and k3 began but only k2 reached the store, k4
+    # was only queued, and the line being written for k9 was torn (never acknowledged)
+    own = f"{journal}.{os.getpid()}"
+    write_journal(own,
+                  {'op': 'add', 'key': 'k1', 'row': row(1)},
+                  {'op': 'begin', 'keys': ['k1']},
+                  {'op': 'done', 'keys': ['k1']},
+                  {'op': 'add', 'key': 'k2', 'row': row(2, username=None)},
+                  {'op': 'add', 'key': 'k3', 'row': row(3)},
+                  {'op': 'begin', 'keys': ['k2', 'k3']},
+                  {'op': 'add', 'key': 'k4', 'row': row(4)},
+                  torn=True)
+    store = FakeStore([row(1), row(2, username=None)])
+    queue = start_queue(store, journal)
+    queue.close()
+    assert sorted(map(tuple, store.rows)) == sorted(tuple(row(i, None if i == 2 else 'alice')) for i in (1, 2, 3, 4))
+
+
+def test_dead_process_journals_are_adopted_once(journal):
+    write_journal(f"{journal}.99999", {'op': 'add', 'key': 'a1', 'row': row(1)},
+                  {'op': 'add', 'key': 'a2', 'row': row(2)})
+    write_journal(journal, {'op': 'add', 'key': 'b1', 'row': row(3)})   # from before per-process journals
+    store = FakeStore()
+    queue = start_queue(store, journal)
+    assert not os.path.exists(f"{journal}.99999") and not os.path.exists(journal)
+    queue.close()
+    assert sorted(map(tuple, store.rows)) == sorted(tuple(row(i)) for i in (1, 2, 3))
+
+    # Nothing is left over for the next queue to replay again
+    again = FakeStore()
+    start_queue(again, journal).close()
+    assert again.rows == []
+
+
+def test_live_process_journal_is_left_alone(journal):
+    other = f"{journal}.88888"
+    write_journal(other, {'op': 'add', 'key': 'c1', 'row': row(1)})
+    held = FileLock(other + '.lock', thread_local=False)
+    held.acquire()
+    try:
+        store = FakeStore()
+        start_queue(store, journal).close()
+        assert store.rows == []
+        assert os.path.exists(other)
+    finally:
+        held.release()
+
+    store = FakeStore()
+    start_queue(store, journal).close()
+    assert store.rows == [row(1)]
+
+
+def test_already_stored_treats_missing_usernames_alike():
+    store = FakeStore([row(1, username=None)])
+    assert sighting_queue.already_stored(store, row(1, username=None))
+    assert sighting_queue.already_stored(store, row(1, username=''))
+    assert not sighting_queue.already_stored(store, row(1, username='alice'))
+    assert not sighting_queue.already_stored(store, row(2, username=None))
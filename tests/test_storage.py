@@ -0,0 +1,143 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import activity
+import hotspot_pyramid
+import hotspots
+import spatial_index
+import storage
+
+SPECIES = ["Red Junglefowl", "Common Myna", "Asian Koel"]
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # A fresh store and change log for every test
+    monkeypatch.setattr(storage, '_stores', {})
+    monkeypatch.setattr(storage, '_changes', {})
+    monkeypatch.setattr(storage, '_change_log_pos', (None, 0))
+    for module, name in ((activity, '_index'), (hotspot_pyramid, '_pyramid'), (spatial_index, '_index')):
+        monkeypatch.setattr(module, name, None)
+        monkeypatch.setattr(module, name + '_version', None)
+    return tmp_path
+
+
+def save_koel(store):
+    return store.add_sighting("01/03/2025", "07:15:00", 1.3501, 103.8201, "Asian Koel", "alice")
+
+
+def koel_counts():
+    # The Asian Koel's grid square as each index sees it
+    active = activity.get_index().query("Asian Koel", verified_only=False)[2].sum()
+    pyramid = hotspot_pyramid.get_pyramid().query(hotspots.GRID_DECIMALS)
+    nearby = spatial_index.get_index().nearest(1.35, 103.82, k=1, species="Asian Koel", max_radius_m=500)
+    return (int(active), int(pyramid.loc[pyramid['common_name'] == "Asian Koel", 'sighting_count'].sum()),
+            int(nearby['sighting_count'].sum()))
+
+
+def test_sqlite_write_lock_excludes_threads():
+    store = storage.SqliteStore()
+    inside, most, lock = 0, 0, threading.Lock()
+
+    def hold(_):
+        nonlocal inside, most
+        with store.write_lock:
+            with lock:
+                inside += 1
+                most = max(most, inside)
+            threading.Event().wait(0.01)
+            with lock:
+                inside -= 1
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(hold, range(32)))
+    assert most == 1
+
+
+def test_sqlite_concurrent_thread_writes():
+    store = storage.SqliteStore()
+    barrier = threading.Barrier(8)
+
+    def write(t):
+        barrier.wait()
+        return [store.add_sighting("01/03/2025", "08:00:00", 1.35 + i / 1000, 103.82, SPECIES[(t + i) % 3], f"user{t}")
+                for i in range(25)]
+
+    with ThreadPoolExecutor(8) as pool:
+        ids = [i for found in pool.map(write, range(8)) for i in found]
+    assert sorted(ids) == list(range(1, 201))
+    assert sorted(store.load_sightings()['id']) == list(range(1, 201))
+    incremental = store.load_hotspots()
+    store.rebuild_hotspots()
+    assert incremental.equals(store.load_hotspots())
+
+
+def test_sqlite_seed_imports_once_across_threads(data_dir):
+    with open(data_dir / 'history.csv', 'w') as f:
+        f.write("id,date_observed,time_observed,latitude,longitude,common_name\n")
+        f.writelines(f"{i},01/01/2024,07:30:00,1.3{i},103.8{i},Asian Koel\n" for i in range(1, 6))
+
+    def seed(_):
+        storage.SqliteStore().seed(str(data_dir / 'history.csv'))
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(seed, range(4)))
+    assert storage.SqliteStore().load_sightings()['id'].tolist() == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.parametrize('module, build', [(activity, 'build_index'), (hotspot_pyramid, 'build_pyramid'),
+                                           (spatial_index, 'build_index')])
+def test_sightings_saved_during_a_build_are_counted_once(monkeypatch, module, build):
+    store = storage.get_store('sqlite')
+    for _ in range(3):
+        save_koel(store)
+    real_build = getattr(module, build)
+
+    def build_while_saving():
+        save_koel(store)       # committed before the build reads: already in it
+        built = real_build()
+        save_koel(store)       # committed after: only in the change log
+        return built
+
+    monkeypatch.setattr(module, build, build_while_saving)
+    koel_counts()   # builds every index (the others catch up with these saves next time)
+    assert koel_counts() == (5, 5, 5)
+    monkeypatch.setattr(module, build, real_build)
+
+    built = (activity.get_index(), hotspot_pyramid.get_pyramid(), spatial_index.get_index())
+    save_koel(store)
+    assert koel_counts() == (6, 6, 6)
+    assert (activity.get_index(), hotspot_pyramid.get_pyramid(), spatial_index.get_index()) == built
+
+
+def test_other_process_sightings_are_replayed_and_rebuilds_rebuild():
+    store = storage.get_store('sqlite')
+    for _ in range(3):
+        save_koel(store)
+    built = (activity.get_index(), hotspot_pyramid.get_pyramid(), spatial_index.get_index())
+
+    # Another process's save: in the store and the change log, never through this store object
+    other = storage.SqliteStore()
+    save_koel(other)
+    assert koel_counts() == (4, 4, 4)
+    assert (activity.get_index(), hotspot_pyramid.get_pyramid(), spatial_index.get_index()) == built
+
+    store.rebuild_hotspots()
+    assert activity.get_index() is not built[0] and hotspot_pyramid.get_pyramid() is not built[1]
+    assert koel_counts() == (4, 4, 4)
+
+
+def test_csv_hotspots_patched_per_save_match_a_rebuild(data_dir):
+    store = storage.CsvStore()
+    for i in range(300):
+        store.add_sighting("01/03/2025", "08:00:00", 1.35 + i % 4 / 100, 103.82, SPECIES[i % 3], "alice")
+    lines = (data_dir / hotspots.HOTSPOTS_FILE).read_text().count('\n')
+    assert lines <= 1 + 2 * 12   # appended rows are compacted away once they double the file
+
+    incremental = store.load_hotspots()
+    assert len(incremental) == 12 and incremental['sighting_count'].sum() == 300
+    store.rebuild_hotspots()
+    assert incremental.equals(store.load_hotspots())
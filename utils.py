@@ -1,34 +1,19 @@
 import streamlit as st
 import pandas as pd
-import os
+
+import inference_service
+import metrics
+import storage
 
 # --- 1. DATA PIPELINE (Formerly mapping_hotspots.py) ---
+@metrics.timed('update_hotspots')
 def update_hotspots():
-    # This runs the logic to aggregate raw sightings into grid squares
+    # Full rebuild: aggregates every raw sighting into grid squares (see hotspots.py)
+    # and resets the store's incremental counts to match.
     print("🔄 Processing raw data...")
     try:
-        df = pd.read_csv('sightings.csv') 
-        print(f"   - Found {len(df)} raw sightings.")
-
-        # GRID ALGORITHM: Rounding to 3 decimal places (approx 110m)
-        df['lat_grid'] = df['latitude'].round(3)
-        df['lon_grid'] = df['longitude'].round(3)
-
-        # AGGREGATE: Group by Species + Grid
-        hotspots = df.groupby(
-            ['common_name', 'lat_grid', 'lon_grid']
-        ).size().reset_index(name='sighting_count')
-
-        # FILTER: Only keep verified hotspots (>= 3 sightings)
-        verified_hotspots = hotspots[hotspots['sighting_count'] >= 3].copy()
-        
-        # FORMAT: Rename back to lat/lon for the map
-        verified_hotspots.rename(columns={'lat_grid': 'lat', 'lon_grid': 'lon'}, inplace=True)
-
-        # SAVE
-        output_file = 'final_hotspots.csv'
-        verified_hotspots.to_csv(output_file, index=False)  
-        print(f"✅ Hotspots updated! ({len(verified_hotspots)} verified locations)")
+        verified_count = storage.get_store().rebuild_hotspots()
+        print(f"✅ Hotspots updated! ({verified_count} verified locations)")
         return True
         
     except FileNotFoundError:
@@ -36,6 +21,7 @@ def update_hotspots():
         return False
     except Exception as e:
         print(f"❌ Pipeline Error: {e}")
+        metrics.error('update_hotspots', e)
         return False
 
 # --- 2. CSS STYLING ---
@@ -51,40 +37,15 @@ def make_map_responsive():
 
 # --- 3. DATABASE MANAGEMENT ---
 def save_new_sighting(date, time, lat, lon, common_name,username):
-    master_db_file = 'sightings.csv'
-    new_id = 1
-    
-    # Check existing ID to increment
-    if os.path.exists(master_db_file):
-        try:
-            existing_df = pd.read_csv(master_db_file)
-            if not existing_df.empty:
-                new_id = existing_df['id'].max() + 1
-        except:
-            pass
-
-    # Prepare new row
-    new_data = pd.DataFrame({
-        'id': [new_id], 'date_observed': [date], 'time_observed': [time],
-        'latitude': [lat], 'longitude': [lon], 'common_name': [common_name], 'username':[username]
-    })
-
-    # Append to CSV
-    if os.path.exists(master_db_file):
-        new_data.to_csv(master_db_file, mode='a', header=False, index=False)
-    else:
-        new_data.to_csv(master_db_file, mode='w', header=True, index=False)
-
-    # TRIGGER THE PIPELINE IMMEDIATELY
-    st.toast("Processing new hotspot data...")
+    # Queued in a local journal and acknowledged at once; the queue's worker writes it to
+    # the store and updates the hotspots within a couple of seconds (see sighting_queue.py).
+    # With an inference service, its queue is the one writer for every server process.
     try:
-        success = update_hotspots() # Calling the function directly
-        if success:
-            st.success("Map Updated!")
-        else:
-            st.warning("Data saved, but map update skipped (no data yet).")
+        inference_service.submit_sighting(date, time, lat, lon, common_name, username)
+        st.success("Sighting saved! It will appear on the map in a few seconds.")
     except Exception as e:
         st.error(f"Pipeline Error: {e}")
+        metrics.error('save_sighting', e)
 
 # --- 4. LOGIN LOGIC ---
 def check_login(username, password):